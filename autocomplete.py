@@ -0,0 +1,156 @@
+import csv
+import heapq
+import time
+from array import array
+from bisect import bisect_left
+from binaryIndex import BinaryLexicon, BinaryInvertedIndex
+from postings import posting_count
+from tokenizer import lemmatize
+
+# Prefix autocomplete for the search box: a prefix is answered with the lexicon
+# words that start with it, most frequent first (by document frequency, ties by
+# word). Surface forms share the WordID of their root, so one word per WordID is
+# offered (see read_document_frequencies).
+#
+# The words are kept in one sorted array, so the words sharing a prefix form a
+# contiguous range found with two binary searches. Ranking a large range at every
+# keystroke would be too slow ("a" matches a good part of the lexicon), so the top
+# completions of every prefix that matches more than SCAN_LIMIT words are
+# precomputed when the structure is built. These prefixes are the upper nodes of
+# the trie over the sorted words; any other prefix matches at most SCAN_LIMIT
+# words, which are ranked at lookup time.
+
+# Completions returned by default and precomputed per prefix (the most a lookup can return)
+DEFAULT_COMPLETIONS = 10
+MAX_COMPLETIONS = 10
+
+# Prefixes matching at most this many words are ranked at lookup time
+SCAN_LIMIT = 256
+
+# Sorts after every character a word can contain, so prefix + LAST_CHAR bounds the prefix range
+LAST_CHAR = '\U0010ffff'
+
+csv.field_size_limit(10000000)
+
+
+# Function to pick the word offered for a WordID among its lexicon words. A root is
+# added to the lexicon along with its first inflection even if it never occurs
+# itself, while the other forms are only added when they occur; so a form that is
+# not the root is preferred (the shortest, then the first alphabetically), and the
+# root is kept only when it is the WordID's only word.
+def representative_form(forms):
+    if len(forms) == 1:
+        return forms[0]
+    roots = {lemmatize(form) for form in forms}
+    occurring = [form for form in forms if form not in roots]
+    return min(occurring or forms, key=lambda form: (len(form), form))
+
+
+# Function to read the document frequency of the words offered as suggestions: one
+# word per WordID with postings (see representative_form), as every word of a WordID
+# has the same document frequency
+def read_document_frequencies(lexicon_file, inverted_index_file):
+    frequency_by_id = {}
+    if inverted_index_file.endswith('.bin'):
+        with BinaryInvertedIndex(inverted_index_file) as inverted_index:
+            for word_id in inverted_index:
+                frequency_by_id[word_id] = posting_count(inverted_index[word_id])
+    else:
+        with open(inverted_index_file, 'r', encoding='utf-8', errors='ignore') as f:
+            reader = csv.reader(f)
+            next(reader)  # Skip header row
+            for row in reader:
+                if len(row) == 3 and row[2]:
+                    # Postings are "DocID:Weight" pairs separated by commas
+                    frequency_by_id[int(row[0])] = row[2].count(',') + 1
+
+    frequencies = {}
+    if lexicon_file.endswith('.bin'):
+        with BinaryLexicon(lexicon_file) as lexicon:
+            words = list(lexicon.items())
+    else:
+        with open(lexicon_file, 'r', encoding='utf-8', errors='ignore') as f:
+            reader = csv.reader(f)
+            next(reader)  # Skip header row
+            words = [(row[0], int(row[1])) for row in reader if len(row) == 2 and row[1].isdigit()]
+    forms = {}  # WordID -> its lexicon words
+    for word, word_id in words:
+        if word_id in frequency_by_id:
+            forms.setdefault(word_id, []).append(word)
+    for word_id, words in forms.items():
+        frequencies[representative_form(words)] = frequency_by_id[word_id]
+    return frequencies
+
+
+class Autocomplete:
+    """Top completions of a prefix by document frequency over a sorted word array."""
+
+    def __init__(self, frequencies, max_completions=MAX_COMPLETIONS, scan_limit=SCAN_LIMIT):
+        entries = sorted(frequencies.items())
+        self._words = [word for word, _ in entries]
+        self._frequencies = array('I', (frequency for _, frequency in entries))
+        self.max_completions = max_completions
+        self.scan_limit = scan_limit
+        self._top = {}  # prefix -> [(word, frequency)] for prefixes matching more than scan_limit words
+        self._precompute()
+
+    def __len__(self):
+        return len(self._words)
+
+    # Function to rank the words of a range of the sorted array
+    def _rank(self, lo, hi, n):
+        best = heapq.nlargest(n, range(lo, hi), key=self._frequencies.__getitem__)  # Ties keep word order
+        return [(self._words[i], self._frequencies[i]) for i in best]
+
+    # Function to precompute the completions of every prefix that matches more than
+    # scan_limit words, walking the trie of the sorted words top-down
+    def _precompute(self):
+        words = self._words
+        stack = [(0, len(words), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= self.scan_limit:
+                continue
+            prefix = words[lo][:depth]
+            self._top[prefix] = self._rank(lo, hi, self.max_completions)
+
+            # Children: the runs of words sharing the next character (the prefix itself sorts first)
+            i = lo + 1 if len(words[lo]) == depth else lo
+            while i < hi:
+                child = prefix + words[i][depth]
+                j = bisect_left(words, child + LAST_CHAR, i, hi)
+                stack.append((i, j, depth + 1))
+                i = j
+
+    # Function to return up to n (word, document frequency) completions of a prefix
+    def complete(self, prefix, n=DEFAULT_COMPLETIONS):
+        prefix = prefix.strip().lower()
+        n = max(0, min(n, self.max_completions))
+        top = self._top.get(prefix)
+        if top is not None:
+            return top[:n]
+        lo = bisect_left(self._words, prefix)
+        hi = bisect_left(self._words, prefix + LAST_CHAR, lo)
+        return self._rank(lo, hi, n)
+
+
+# Function to build the autocomplete structure from the lexicon and inverted index files
+def load_autocomplete(lexicon_file, inverted_index_file):
+    print("Building autocomplete...")
+    start = time.perf_counter()
+    autocomplete = Autocomplete(read_document_frequencies(lexicon_file, inverted_index_file))
+    print(f"Autocomplete ready: {len(autocomplete)} words, {len(autocomplete._top)} precomputed prefixes "
+          f"in {time.perf_counter() - start:.2f}s.")
+    return autocomplete
+
+
+lexicon_file = 'Lexicon.csv'
+inverted_index_file = 'InvertedIndex.csv'
+if __name__ == "__main__":
+    autocomplete = load_autocomplete(lexicon_file, inverted_index_file)
+    while True:
+        prefix = input("\nEnter a prefix (type 'exit' to quit): ")
+        if prefix.strip().lower() == "exit":
+            break
+        for word, frequency in autocomplete.complete(prefix):
+            print(f"{word} ({frequency} documents)")
@@ -1,101 +1,280 @@
-# this logic is not part if the project yet
-# this logic can reduce the query time
-
+import csv
 import os
-import pandas as pd
-import json
-from collections import defaultdict
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+from postings import Postings
+from invertedIndex import write_index_stats
+
+# Barrels split the inverted index by WordID range so the query side only loads
+# the parts of the index its query terms fall in.
+#
+# Barrels/BarrelDirectory.csv  one row per barrel: BarrelID, FirstWordID,
+#                              LastWordID, Terms, Postings, File
+# Barrels/barrel_<id>.csv      WordID, MaxWeight, Postings (DocID:Weight,...),
+#                              FieldFreqs (title:authors:tags:text,... aligned
+#                              with Postings)
+# Barrels/IndexStats.csv       document count for IDF
+
+# Number of consecutive WordIDs stored in one barrel
+BARREL_SIZE = 5000
+
+# Approximate memory create_barrels may fill with postings in one pass over the
+# forward index (bytes), and the estimated cost of one buffered posting
+BUILD_MEMORY_LIMIT = 512 * 1024 * 1024
+BUILD_POSTING_BYTES = 200
+
+# Default memory budget for loaded barrels (bytes)
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Rough per-term bookkeeping cost of a loaded barrel (dict slot, tuple, array headers)
+TERM_OVERHEAD_BYTES = 300
+
+csv.field_size_limit(10000000)
+
+
+# Function to stream the forward index as (DocID, [(WordID, Weight, field counts)])
+def read_forward_index(forward_index_file):
+    with open(forward_index_file, 'r', encoding='utf-8', errors='ignore') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header row
+        for row in reader:
+            if len(row) != 3:
+                continue
+            doc_id, details, field_freqs = row
+            entries = []
+            if details:
+                for pair, counts in zip(details.split(','), field_freqs.split(',')):
+                    word_id, weight = pair.split(':')
+                    entries.append((int(word_id), int(weight), tuple(map(int, counts.split(':')))))
+            yield int(doc_id), entries
+
 
-def create_barrels_with_metadata(lexicon_dir, inverted_index_dir, dataset_dir, output_file):
-    # Track progress
+# Function to group consecutive barrels into passes whose postings fit in memory_limit;
+# returns [(first BarrelID, last BarrelID)]
+def plan_passes(barrel_postings, memory_limit, posting_bytes=BUILD_POSTING_BYTES):
+    passes = []
+    pass_size = 0
+    for barrel_id in sorted(barrel_postings):
+        size = barrel_postings[barrel_id] * posting_bytes
+        if passes and pass_size + size <= memory_limit:
+            passes[-1] = (passes[-1][0], barrel_id)
+            pass_size += size
+        else:
+            # A barrel larger than the limit still gets a pass of its own
+            passes.append((barrel_id, barrel_id))
+            pass_size = size
+    return passes
+
+
+# Function to write one barrel file; returns its number of postings
+def write_barrel(barrel_file, terms):
+    num_postings = 0
+    with open(barrel_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["WordID", "MaxWeight", "Postings", "FieldFreqs"])  # Header
+        for word_id in sorted(terms):
+            postings = terms[word_id]
+            num_postings += len(postings)
+            writer.writerow([
+                word_id,
+                max(weight for _, weight, _ in postings),
+                ",".join(f"{doc_id}:{weight}" for doc_id, weight, _ in postings),
+                ",".join(":".join(map(str, counts)) for _, _, counts in postings),
+            ])
+    return num_postings
+
+
+# Function to build the barrels from the forward index. Only the postings of a range
+# of barrels are held at a time: a first pass counts the postings per barrel, then
+# the forward index is read once per range of barrels that fits in memory_limit.
+def create_barrels(forward_index_file, output_dir, barrel_size=BARREL_SIZE, memory_limit=BUILD_MEMORY_LIMIT):
     print("Starting barrel creation...")
 
-    # Initialize the barrel data
-    barrel_data = []
-
-    # Step 1: Iterate through each chunk of the inverted index
-    inverted_files = sorted([f for f in os.listdir(inverted_index_dir) if f.endswith('_inverted.csv')])
-    lexicon_files = sorted([f for f in os.listdir(lexicon_dir) if f.endswith('_lexicon.csv')])
-
-    for inv_file, lex_file in zip(inverted_files, lexicon_files):
-        print(f"Processing inverted index chunk: {inv_file} with lexicon: {lex_file}...")
-
-        # Load inverted index and lexicon
-        inv_path = os.path.join(inverted_index_dir, inv_file)
-        lex_path = os.path.join(lexicon_dir, lex_file)
-        inverted_df = pd.read_csv(inv_path)
-        lexicon_df = pd.read_csv(lex_path)
-
-        # Create a dictionary to map WordID to words
-        word_map = dict(zip(lexicon_df["Word ID"], lexicon_df["Word"]))
-
-        # Step 2: Process each WordID in the inverted index
-        for _, row in inverted_df.iterrows():
-            word_id = row["Word ID"]
-            doc_ids = eval(row["Document IDs"])
-
-            word = word_map.get(word_id, "Unknown")
-
-            # Collect document-specific metadata for this WordID
-            document_info = []
-
-            for doc_id in doc_ids:
-                # Locate the dataset chunk containing this DocID
-                dataset_chunk_file = f"dataset_chunk_{doc_id // 1000}.csv"  # Adjust based on chunk naming
-                dataset_chunk_path = os.path.join(dataset_dir, dataset_chunk_file)
-
-                if os.path.exists(dataset_chunk_path):
-                    dataset_df = pd.read_csv(dataset_chunk_path)
-
-                    # Find the row corresponding to the DocID
-                    doc_row = dataset_df[dataset_df["DocID"] == doc_id]
-
-                    if not doc_row.empty:
-                        doc_row = doc_row.iloc[0]
-                        text = doc_row["Text"]
-                        author = doc_row["Author"]
-                        title = doc_row["Title"]
-                        url = doc_row["URL"]
-                        tags = doc_row["Tags"]
-
-                        # Calculate frequencies
-                        text_freq = text.lower().split().count(word) if pd.notna(text) else 0
-                        author_freq = author.lower().split().count(word) if pd.notna(author) else 0
-                        title_freq = title.lower().split().count(word) if pd.notna(title) else 0
-                        url_freq = url.lower().split().count(word) if pd.notna(url) else 0
-                        tags_freq = tags.lower().split().count(word) if pd.notna(tags) else 0
-
-                        # Add document info
-                        document_info.append({
-                            "DocID": doc_id,
-                            "Positions": [],  # Assuming position extraction happens elsewhere
-                            "TextFreq": text_freq,
-                            "AuthorFreq": author_freq,
-                            "TitleFreq": title_freq,
-                            "URLFreq": url_freq,
-                            "TagsFreq": tags_freq
-                        })
-
-            # Step 3: Append the aggregated data to the barrel
-            barrel_data.append({
-                "Word": word,
-                "WordID": word_id,
-                "DocumentInfo": json.dumps(document_info)
-            })
-
-        print(f"Finished processing {inv_file}.")
-
-    # Step 4: Save the barrel to a CSV file
-    print("Saving the barrel to CSV...")
-    barrel_df = pd.DataFrame(barrel_data)
-    barrel_df.to_csv(output_file, index=False)
-    print(f"Barrel saved to {output_file}.")
+    # Step 1: Count the documents and the postings of each barrel
+    barrel_postings = defaultdict(int)
+    total_documents = 0
+    for doc_id, entries in read_forward_index(forward_index_file):
+        total_documents += 1
+        for word_id, _, _ in entries:
+            barrel_postings[(word_id - 1) // barrel_size] += 1
+    passes = plan_passes(barrel_postings, memory_limit)
+    print(f"Counted {total_documents} documents, writing {len(barrel_postings)} barrels in {len(passes)} passes...")
+
+    # Step 2: For each range of barrels, transpose the forward index into their posting
+    # lists and write them. The forward index is in DocID order, so every posting
+    # list comes out sorted by DocID.
+    os.makedirs(output_dir, exist_ok=True)
+    directory = []
+    for first_barrel, last_barrel in passes:
+        first_word_id = first_barrel * barrel_size + 1
+        last_word_id = (last_barrel + 1) * barrel_size
+        barrels = defaultdict(lambda: defaultdict(list))
+        for doc_id, entries in read_forward_index(forward_index_file):
+            for word_id, weight, counts in entries:
+                if first_word_id <= word_id <= last_word_id:
+                    barrels[(word_id - 1) // barrel_size][word_id].append((doc_id, weight, counts))
+
+        for barrel_id in sorted(barrels):
+            terms = barrels.pop(barrel_id)
+            file_name = f"barrel_{barrel_id}.csv"
+            num_postings = write_barrel(os.path.join(output_dir, file_name), terms)
+            directory.append([barrel_id, barrel_id * barrel_size + 1, (barrel_id + 1) * barrel_size, len(terms),
+                              num_postings, file_name])
+            print(f"Finished barrel {barrel_id} ({len(terms)} words, {num_postings} postings).")
+
+    # Step 3: Save the barrel directory and the collection statistics
+    with open(os.path.join(output_dir, 'BarrelDirectory.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["BarrelID", "FirstWordID", "LastWordID", "Terms", "Postings", "File"])  # Header
+        writer.writerows(directory)
+    write_index_stats(total_documents, os.path.join(output_dir, 'IndexStats.csv'))
+    print(f"{len(directory)} barrels saved to {output_dir}.")
+
+
+# Function to parse one barrel file into WordID -> (Postings, field counts)
+def read_barrel(barrel_file):
+    barrel = {}
+    with open(barrel_file, 'r', encoding='utf-8', errors='ignore') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header row
+        for row in reader:
+            if len(row) != 4:
+                continue
+            word_id, max_weight, postings, field_freqs = row
+            doc_ids = array('I')
+            weights = array('I')
+            for posting in postings.split(','):
+                doc_id, weight = posting.split(':')
+                doc_ids.append(int(doc_id))
+                weights.append(int(weight))
+            # Title, authors, tags and text counts of posting i live at [4 * i, 4 * i + 4)
+            field_counts = array('I', (int(count) for counts in field_freqs.split(',') for count in counts.split(':')))
+            barrel[int(word_id)] = (Postings(doc_ids, weights, int(max_weight)), field_counts)
+    return barrel
+
+
+# Function to estimate how much memory a loaded barrel holds
+def barrel_size_in_bytes(barrel):
+    size = 0
+    for postings, field_counts in barrel.values():
+        size += TERM_OVERHEAD_BYTES
+        size += postings.doc_ids.itemsize * len(postings.doc_ids)
+        size += postings.weights.itemsize * len(postings.weights)
+        size += field_counts.itemsize * len(field_counts)
+    return size
+
+
+class BarrelIndex:
+    """Inverted index mapping WordID -> Postings that loads barrels on demand.
+
+    Only the barrel directory is read up front. Barrels are parsed the first time
+    one of their words is looked up and kept in an LRU cache whose estimated size
+    stays within memory_budget bytes (the most recently used barrel is always kept).
+    """
+
+    def __init__(self, barrel_dir, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.barrel_dir = barrel_dir
+        self.memory_budget = memory_budget
+        self._first_word_ids = []
+        self._last_word_ids = []
+        self._files = []
+        with open(os.path.join(barrel_dir, 'BarrelDirectory.csv'), 'r', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)  # Skip header row
+            for row in reader:
+                if len(row) == 6:
+                    _, first_word_id, last_word_id, _, _, file_name = row
+                    self._first_word_ids.append(int(first_word_id))
+                    self._last_word_ids.append(int(last_word_id))
+                    self._files.append(file_name)
+
+        with open(os.path.join(barrel_dir, 'IndexStats.csv'), 'r', encoding='utf-8') as f:
+            stats = {row[0]: row[1] for row in csv.reader(f) if len(row) == 2}
+        self.num_documents = int(stats['Documents'])
+
+        self._cache = OrderedDict()  # barrel position -> (barrel, size in bytes)
+        self._cache_bytes = 0
+        self._cache_lock = threading.Lock()  # query.py warms barrels in a background thread
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Function to find the position of the barrel whose range holds the WordID
+    def _locate(self, word_id):
+        i = bisect_right(self._first_word_ids, word_id) - 1
+        if i < 0 or word_id > self._last_word_ids[i]:
+            return -1
+        return i
+
+    # Function to return a loaded barrel, reading it and evicting old ones if needed.
+    # The file is read outside the lock so lookups in loaded barrels are not held up
+    # by a slow read; if two threads read the same barrel, the first one stored wins.
+    def _barrel(self, i):
+        with self._cache_lock:
+            if i in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(i)
+                return self._cache[i][0]
+            self.misses += 1
+
+        barrel = read_barrel(os.path.join(self.barrel_dir, self._files[i]))
+        size = barrel_size_in_bytes(barrel)
+        with self._cache_lock:
+            if i in self._cache:
+                self._cache.move_to_end(i)
+                return self._cache[i][0]
+            self._cache[i] = (barrel, size)
+            self._cache_bytes += size
+            while self._cache_bytes > self.memory_budget and len(self._cache) > 1:
+                _, (_, evicted_size) = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted_size
+                self.evictions += 1
+            return barrel
+
+    def _entry(self, word_id):
+        i = self._locate(word_id)
+        if i < 0:
+            return None
+        return self._barrel(i).get(word_id)
+
+    def __contains__(self, word_id):
+        return self._entry(word_id) is not None
+
+    def __getitem__(self, word_id):
+        entry = self._entry(word_id)
+        if entry is None:
+            raise KeyError(word_id)
+        return entry[0]
+
+    def get(self, word_id, default=None):
+        entry = self._entry(word_id)
+        return entry[0] if entry is not None else default
+
+    # Function to return the title/authors/tags/text counts of a word, 4 per posting
+    def field_frequencies(self, word_id):
+        entry = self._entry(word_id)
+        if entry is None:
+            raise KeyError(word_id)
+        return entry[1]
+
+    # Function to report how the barrel cache is doing
+    def cache_info(self):
+        return {
+            'barrels': len(self._files),
+            'loaded': len(self._cache),
+            'bytes': self._cache_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
 
 # Directory paths
-lexicon_directory = "E:/dsapro/Lexicon"
-inverted_index_directory = "E:/dsapro/InvertedIndex"
-dataset_directory = "E:/dsapro/DatasetChunks"
-output_file_path = "E:/dsapro/Barrel.csv"
+forward_index_file = "ForwardIndex.csv"
+barrel_directory = "Barrels"
 
 # Run the function
-create_barrels_with_metadata(lexicon_directory, inverted_index_directory, dataset_directory, output_file_path)
+if __name__ == "__main__":
+    create_barrels(forward_index_file, barrel_directory)
@@ -0,0 +1,147 @@
+import csv
+import numpy as np
+from scipy.sparse import csr_matrix
+from forwardIndex import read_lexicon
+from binaryIndex import BinaryForwardIndex
+from query import TOP_K
+from tokenizer import query_words
+
+# Batch scoring for offline relevance evaluation and bulk re-ranking. Instead of
+# walking posting lists query by query, the forward index is loaded once as a
+# sparse term-document weight matrix and a block of queries is scored with one
+# sparse matrix product:
+#
+#   scores (queries x documents) = Q (queries x words) . diag(idf) . W^T (words x documents)
+#
+# W holds the field-weighted term frequencies of the forward index, Q counts how
+# often each word occurs in a query and idf[w] = log10(N / df[w]). The k best
+# documents of every query are then picked from its sparse score row with
+# argpartition. Scores equal the TF-IDF scores of query.fetch_top_documents up to
+# floating point rounding, and ties are broken by the lower DocID in the same way.
+
+# Number of queries scored by one matrix product (bounds the size of the score matrix)
+QUERY_BATCH_SIZE = 1000
+
+csv.field_size_limit(10000000)
+
+
+# Function to read the forward index as CSR arrays (indptr, WordIDs, weights)
+def read_forward_matrix(forward_index_file):
+    indptr = [0]
+    word_ids = []
+    weights = []
+    if forward_index_file.endswith('.bin'):
+        with BinaryForwardIndex(forward_index_file) as forward_index:
+            for doc_id in range(len(forward_index)):
+                doc_word_ids, doc_weights = forward_index[doc_id]
+                word_ids.extend(doc_word_ids)
+                weights.extend(doc_weights)
+                indptr.append(len(word_ids))
+    else:
+        with open(forward_index_file, 'r', encoding='utf-8', errors='ignore') as f:
+            reader = csv.reader(f)
+            next(reader)  # Skip header row
+            for row in reader:
+                if len(row) >= 2 and row[1]:
+                    for pair in row[1].split(','):
+                        word_id, weight = pair.split(':')
+                        word_ids.append(int(word_id))
+                        weights.append(int(weight))
+                indptr.append(len(word_ids))
+    return (np.array(indptr, dtype=np.int64), np.array(word_ids, dtype=np.int64),
+            np.array(weights, dtype=np.float64))
+
+
+class BatchScorer:
+    """TF-IDF scorer that ranks many queries at once with sparse matrix products."""
+
+    def __init__(self, forward_index_file, lexicon):
+        self.lexicon = lexicon
+        indptr, word_ids, weights = read_forward_matrix(forward_index_file)
+        self.num_documents = len(indptr) - 1
+        self.num_words = max(max(lexicon.values(), default=0), int(word_ids.max(initial=0))) + 1
+
+        # Word x document matrix (the inverted index), built from the document x word rows
+        documents = csr_matrix((weights, word_ids, indptr), shape=(self.num_documents, self.num_words))
+        self.matrix = documents.T.tocsr()
+        self.matrix.sort_indices()
+
+        # IDF of every word, computed once; words without postings get 0 and are never used
+        document_frequency = np.diff(self.matrix.indptr)
+        self.idf = np.zeros(self.num_words)
+        present = document_frequency > 0
+        self.idf[present] = np.log10(self.num_documents / document_frequency[present])
+        print(f"Score matrix built: {self.num_documents} documents, {self.matrix.nnz} postings.")
+
+    # Function to turn a query into the WordIDs of its terms (repeats kept), like fetch_top_documents
+    def query_word_ids(self, query):
+        word_ids = []
+        for word in query_words(query):
+            word_id = self.lexicon.get(word)
+            if word_id is None:
+                continue
+            if word_id < self.num_words and self.matrix.indptr[word_id + 1] > self.matrix.indptr[word_id]:
+                word_ids.append(word_id)
+        return word_ids
+
+    # Function to pick the k best (DocID, score) pairs of one sparse score row
+    def _top_k(self, doc_ids, scores, word_ids, k):
+        if len(doc_ids) < k:
+            # Documents whose terms all have IDF 0 score exactly 0 and are dropped from
+            # the sparse product, but fetch_top_documents still ranks them last
+            union = np.unique(np.concatenate([self.matrix.indices[self.matrix.indptr[w]:self.matrix.indptr[w + 1]]
+                                              for w in set(word_ids)]))
+            missing = np.setdiff1d(union, doc_ids, assume_unique=True)
+            doc_ids = np.concatenate([doc_ids, missing])
+            scores = np.concatenate([scores, np.zeros(len(missing))])
+        if len(doc_ids) > k:
+            # Keep everything tied with the k-th score so the DocID tie-break stays exact
+            kth = -np.partition(-scores, k - 1)[k - 1]
+            keep = scores >= kth
+            doc_ids, scores = doc_ids[keep], scores[keep]
+        order = np.lexsort((doc_ids, -scores))[:k]
+        return [(int(doc_ids[i]), float(scores[i])) for i in order]
+
+    # Function to rank a list of queries; returns one [(DocID, score)] list per query
+    def score(self, queries, k=TOP_K, batch_size=QUERY_BATCH_SIZE):
+        results = []
+        for start in range(0, len(queries), batch_size):
+            batch = [self.query_word_ids(query) for query in queries[start:start + batch_size]]
+
+            # Query matrix: IDF of each term times the number of times it occurs in the query
+            rows = [row for row, word_ids in enumerate(batch) for _ in word_ids]
+            cols = [word_id for word_ids in batch for word_id in word_ids]
+            query_matrix = csr_matrix((self.idf[cols], (rows, cols)), shape=(len(batch), self.num_words))
+            scores = (query_matrix @ self.matrix).tocsr()  # Duplicate (row, col) entries are summed
+
+            for row, word_ids in enumerate(batch):
+                if not word_ids or k <= 0:
+                    results.append([])
+                    continue
+                lo, hi = scores.indptr[row], scores.indptr[row + 1]
+                results.append(self._top_k(scores.indices[lo:hi], scores.data[lo:hi], word_ids, k))
+            print(f"Scored {len(results)}/{len(queries)} queries...")
+        return results
+
+
+# Function to score every query in a file (one per line) and save the rankings
+def score_query_file(queries_file, output_file, forward_index_file, lexicon_file, k=TOP_K):
+    with open(queries_file, 'r', encoding='utf-8') as f:
+        queries = [line.strip() for line in f if line.strip()]
+    scorer = BatchScorer(forward_index_file, read_lexicon(lexicon_file))
+    results = scorer.score(queries, k)
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["QueryID", "Query", "Rank", "DocID", "Score"])  # Header
+        for query_id, (query, ranking) in enumerate(zip(queries, results)):
+            for rank, (doc_id, score) in enumerate(ranking, start=1):
+                writer.writerow([query_id, query, rank, doc_id, f"{score:.6f}"])
+    print(f"Rankings of {len(queries)} queries saved to {output_file}.")
+
+
+queries_file = 'Queries.txt'
+output_file = 'BatchResults.csv'
+forward_index_file = 'ForwardIndex.csv'
+lexicon_file = 'Lexicon.csv'
+if __name__ == "__main__":
+    score_query_file(queries_file, output_file, forward_index_file, lexicon_file)
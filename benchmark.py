@@ -0,0 +1,265 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from syntheticCorpus import generate_corpus
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module; peak RSS is then not reported
+    resource = None
+
+# End-to-end benchmark of the build stages and query latency on a synthetic corpus.
+#
+# Every build stage runs in its own child process, so its wall time and peak RSS
+# are measured in isolation (RSS is reported in KiB, where the platform allows).
+# The streaming pipeline and the parallel build are then timed the same way in
+# their own sub-directories and compared with the serial stages they replace.
+# Queries are timed against the finished index in three workloads built from the
+# document frequencies of the corpus: head terms (the most common words), torso
+# terms and tail terms (words in one or two documents), once with every top-k
+# strategy so the default can follow whichever is faster.
+#
+# Results are written as JSON with sorted keys, so two runs can be diffed or
+# compared with compare_benchmarks() to spot a regression between commits.
+
+# Build stages in pipeline order: (name, module, function, arguments)
+STAGES = [
+    ('clean', 'clean', 'clean_dataset', ('Dataset.csv', 'CleanedDataset.parquet')),
+    ('lexicon', 'lexicon', 'build_lexicon', ('CleanedDataset.parquet', 'Lexicon.csv', 'csv')),
+    ('forwardIndex', 'forwardIndex', 'main', ('Lexicon.csv', 'CleanedDataset.parquet', 'ForwardIndex.csv')),
+    ('invertedIndex', 'invertedIndex', 'main',
+     ('Lexicon.csv', 'CleanedDataset.parquet', 'InvertedIndex.csv', 'IndexStats.csv')),
+    ('docStore', 'docStore', 'build_document_store', ('CleanedDataset.parquet', 'DocStore.csv', 'DocStore.offsets')),
+]
+
+# Alternative builds, each run in a sub-directory of the work directory named after it:
+# (name, module, function, arguments, serial stages it replaces)
+BUILD_MODES = [
+    ('streaming', 'pipeline', 'build_index_streaming',
+     (os.path.join('..', 'Dataset.csv'), 'Lexicon.csv', 'ForwardIndex.csv', 'InvertedIndex.csv', 'IndexStats.csv',
+      'DocStore.csv', 'DocStore.offsets'),
+     ('clean', 'lexicon', 'forwardIndex', 'invertedIndex', 'docStore')),
+    ('parallel', 'parallelBuild', 'build_index_parallel',
+     (os.path.join('..', 'CleanedDataset.parquet'), 'Lexicon.csv', 'ForwardIndex.csv', 'InvertedIndex.csv',
+      'IndexStats.csv'),
+     ('lexicon', 'forwardIndex', 'invertedIndex')),
+]
+
+# Index files whose size on disk is reported
+INDEX_FILES = ['Lexicon.csv', 'ForwardIndex.csv', 'InvertedIndex.csv', 'DocStore.csv', 'DocStore.offsets']
+
+# Default benchmark size
+NUM_DOCUMENTS = 10000
+QUERIES_PER_WORKLOAD = 500
+
+# Relative change reported as a regression by compare_benchmarks
+REGRESSION_THRESHOLD = 0.10
+
+
+# Function to return the peak resident set size of this process in KiB
+def peak_rss_kb():
+    if resource is None:
+        return None
+    # The largest finished child counts too, so a build's pool workers are included
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # macOS reports bytes, Linux reports KiB
+    return rss // 1024 if platform.system() == 'Darwin' else rss
+
+
+# Function to run one build stage in a child process and report its timing
+def _run_stage(work_dir, module_name, function_name, args, results):
+    os.chdir(work_dir)
+    module = __import__(module_name)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        getattr(module, function_name)(*args)
+    results.put({'seconds': time.perf_counter() - start, 'peak_rss_kb': peak_rss_kb()})
+
+
+# Function to time one build stage in a child process running in work_dir
+def time_stage(work_dir, name, module_name, function_name, args, num_documents):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_stage, args=(work_dir, module_name, function_name, args, results))
+    process.start()
+    stage = None
+    # A stage that raises exits without putting a result, so stop waiting once it is gone
+    while stage is None and (process.is_alive() or not results.empty()):
+        try:
+            stage = results.get(timeout=1)
+        except queue.Empty:
+            pass
+    process.join()
+    if stage is None:
+        raise RuntimeError(f"Build stage {name} failed (exit code {process.exitcode})")
+    stage['docs_per_sec'] = num_documents / stage['seconds'] if stage['seconds'] else None
+    print(f"{name}: {stage['seconds']:.2f}s, {stage['docs_per_sec']:.0f} docs/sec, peak RSS {stage['peak_rss_kb']} KiB")
+    return stage
+
+
+# Function to time every build stage on the corpus in work_dir
+def benchmark_build(work_dir, num_documents):
+    return {name: time_stage(work_dir, name, module_name, function_name, args, num_documents)
+            for name, module_name, function_name, args in STAGES}
+
+
+# Function to time every alternative build against the serial stages it replaces
+def benchmark_build_modes(work_dir, num_documents, build):
+    modes = {}
+    for name, module_name, function_name, args, replaced in BUILD_MODES:
+        mode_dir = os.path.join(work_dir, name)
+        os.makedirs(mode_dir, exist_ok=True)
+        mode = time_stage(mode_dir, name, module_name, function_name, args, num_documents)
+        mode['serial_seconds'] = sum(build[stage]['seconds'] for stage in replaced)
+        mode['speedup'] = mode['serial_seconds'] / mode['seconds'] if mode['seconds'] else None
+        modes[name] = mode
+        print(f"{name}: {mode['speedup']:.2f}x the serial {', '.join(replaced)} stages "
+              f"({mode['serial_seconds']:.2f}s)")
+    return modes
+
+
+# Function to return the p-th percentile (0-100) of sorted values
+def percentile(values, p):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+# Function to build head, torso and tail query workloads from the index's document frequencies
+def make_workloads(lexicon, inverted_index, queries_per_workload, seed=42):
+    word_for_id = {word_id: word for word, word_id in lexicon.items()}
+    ranked = sorted((word_for_id[word_id] for word_id in inverted_index if word_id in word_for_id),
+                    key=lambda word: (-len(inverted_index[lexicon[word]].doc_ids), word))
+    tail = [word for word in ranked if len(inverted_index[lexicon[word]].doc_ids) <= 2]
+    classes = {
+        'head': ranked[:100],
+        'torso': ranked[len(ranked) // 10:len(ranked) // 2],
+        'tail': tail or ranked[-100:],
+    }
+
+    rng = random.Random(seed)
+    workloads = {}
+    for name, words in classes.items():
+        if words:
+            workloads[name] = [" ".join(rng.choices(words, k=rng.randint(1, 3))) for _ in range(queries_per_workload)]
+    return workloads
+
+
+# Function to time fetch_top_documents over every query workload, once per top-k strategy
+def benchmark_queries(work_dir, queries_per_workload):
+    import query
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            lexicon, inverted_index, total_documents, doc_store = query.load_index('csv')
+            load_seconds = time.perf_counter() - start
+        results = {'load_seconds': load_seconds}
+        print(f"Index loaded in {load_seconds:.2f}s")
+
+        for name, queries in make_workloads(lexicon, inverted_index, queries_per_workload).items():
+            results[name] = {}
+            for strategy in query.STRATEGIES:
+                latencies = []
+                for text in queries:
+                    start = time.perf_counter()
+                    query.fetch_top_documents(text, lexicon, inverted_index, total_documents, doc_store,
+                                              strategy=strategy, verbose=False)
+                    latencies.append(time.perf_counter() - start)
+                total = sum(latencies)
+                latencies.sort()
+                stats = results[name][strategy] = {
+                    'queries': len(latencies),
+                    'qps': len(latencies) / total if total else None,
+                    'p50_ms': percentile(latencies, 50) * 1000,
+                    'p95_ms': percentile(latencies, 95) * 1000,
+                    'p99_ms': percentile(latencies, 99) * 1000,
+                }
+                print(f"{name} ({strategy}): {stats['qps']:.0f} QPS, p50 {stats['p50_ms']:.3f} ms, "
+                      f"p99 {stats['p99_ms']:.3f} ms")
+        doc_store.close()
+        return results
+    finally:
+        os.chdir(previous_dir)
+
+
+# Function to return the current git commit, if the code runs from a checkout
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Function to run the whole benchmark and save the results as JSON
+def run_benchmark(work_dir='benchmark_run', output_file='benchmark_results.json', num_documents=NUM_DOCUMENTS,
+                  queries_per_workload=QUERIES_PER_WORKLOAD, seed=42):
+    os.makedirs(work_dir, exist_ok=True)
+    work_dir = os.path.abspath(work_dir)
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        generate_corpus(os.path.join(work_dir, 'Dataset.csv'), num_documents, seed=seed)
+    print(f"Generated {num_documents} synthetic documents in {time.perf_counter() - start:.2f}s")
+
+    build = benchmark_build(work_dir, num_documents)
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'documents': num_documents, 'queries_per_workload': queries_per_workload, 'seed': seed},
+        'build': build,
+        'build_modes': benchmark_build_modes(work_dir, num_documents, build),
+        'index_size_bytes': {name: os.path.getsize(os.path.join(work_dir, name))
+                             for name in INDEX_FILES if os.path.exists(os.path.join(work_dir, name))},
+        'query': benchmark_queries(work_dir, queries_per_workload),
+    }
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Benchmark results saved to {output_file}.")
+    return results
+
+
+# Function to flatten nested results into {"build.lexicon.seconds": value, ...}
+def _flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+
+# Function to print the metrics that changed by more than threshold between two result files
+def compare_benchmarks(baseline_file, current_file, threshold=REGRESSION_THRESHOLD):
+    with open(baseline_file) as f:
+        baseline = _flatten(json.load(f))
+    with open(current_file) as f:
+        current = _flatten(json.load(f))
+
+    changes = []
+    for metric in sorted(baseline.keys() & current.keys()):
+        if metric.startswith('config.') or not baseline[metric]:
+            continue
+        change = (current[metric] - baseline[metric]) / baseline[metric]
+        if abs(change) > threshold:
+            changes.append((metric, baseline[metric], current[metric], change))
+            print(f"{metric}: {baseline[metric]:.4g} -> {current[metric]:.4g} ({change:+.1%})")
+    if not changes:
+        print(f"No metric changed by more than {threshold:.0%}.")
+    return changes
+
+
+if __name__ == "__main__":
+    run_benchmark()
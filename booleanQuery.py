@@ -0,0 +1,210 @@
+import re
+from postings import Postings, open_cursor, posting_count, END_OF_POSTINGS
+from tokenizer import query_words
+
+# Boolean queries: AND, OR and NOT (upper case) with parentheses for grouping, e.g.
+#
+#     (neural OR deep) AND learning NOT python
+#
+# A query that contains an upper-case operator is parsed into a tree (parentheses
+# group only inside such queries, elsewhere they are punctuation); adjacent words
+# without an operator are ANDed, NOT binds to the word or group that follows it,
+# and AND binds tighter than OR. Words are normalized like any query
+# word and stop words are dropped. Quotes inside a boolean query are ignored.
+#
+# Conjunctions are evaluated by intersecting posting lists smallest first: the
+# rarest list drives and every other list is probed with a galloping (or, for
+# compressed lists, block-skipping) seek, so "rare AND frequent" costs about the
+# size of the rare list. Negated lists are probed the same way. The surviving
+# documents are then ranked by the usual TF-IDF (or BM25F) score.
+
+QUERY_TOKEN = re.compile(r'[()]|[^\s()"]+')
+BOOLEAN_SYNTAX = re.compile(r'\b(?:AND|OR|NOT)\b')
+
+
+# Function to tell whether a query uses the boolean syntax, i.e. has an upper-case operator
+def is_boolean_query(query):
+    return BOOLEAN_SYNTAX.search(query) is not None
+
+
+class _Parser:
+    """Recursive descent parser producing ('term', word), ('and', [nodes]),
+    ('or', [nodes]) and ('not', node) trees; None stands for an empty clause."""
+
+    def __init__(self, query):
+        self.tokens = QUERY_TOKEN.findall(query)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        # Skip unbalanced closing parentheses and keep parsing what follows them
+        while self.peek() is not None:
+            self.take()
+            node = _combine('and', [node, self.parse_or()])
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.take()
+            nodes.append(self.parse_and())
+        return _combine('or', nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_unary()]
+        while self.peek() not in ('OR', ')', None):
+            if self.peek() == 'AND':
+                self.take()
+            nodes.append(self.parse_unary())
+        return _combine('and', nodes)
+
+    def parse_unary(self):
+        token = self.take()
+        if token is None or token in (')', 'AND', 'OR'):
+            return None
+        if token == 'NOT':
+            node = self.parse_unary()
+            return None if node is None else ('not', node)
+        if token == '(':
+            node = self.parse_or()
+            if self.peek() == ')':
+                self.take()
+            return node
+        # A token can hold several words after cleaning ("state-of-the-art")
+        return _combine('and', [('term', word) for word in query_words(token)])
+
+
+# Function to join clauses with an operator, dropping empty ones and flattening
+# nested clauses of the same operator
+def _combine(operator, nodes):
+    children = []
+    for node in nodes:
+        if node is None:
+            continue
+        if node[0] == operator:
+            children.extend(node[1])
+        else:
+            children.append(node)
+    if not children:
+        return None
+    if len(children) == 1:
+        return children[0]
+    return (operator, children)
+
+
+# Function to parse a boolean query into its tree (None if nothing is left of it)
+def parse_boolean_query(query):
+    return _Parser(query).parse()
+
+
+# Function to write a tree back as a canonical string (used as a cache key)
+def format_boolean_query(node):
+    if node is None:
+        return ''
+    if node[0] == 'term':
+        return node[1]
+    if node[0] == 'not':
+        return f"NOT {format_boolean_query(node[1])}"
+    return '(' + f" {node[0].upper()} ".join(format_boolean_query(child) for child in node[1]) + ')'
+
+
+# Function to replace words of a tree by the OR of their spellings ({word: [spellings]},
+# e.g. the corrections of spelling.py)
+def expand_words(node, spellings):
+    if node is None:
+        return None
+    if node[0] == 'term':
+        return _combine('or', [('term', word) for word in spellings.get(node[1], [node[1]])])
+    if node[0] == 'not':
+        return ('not', expand_words(node[1], spellings))
+    return _combine(node[0], [expand_words(child, spellings) for child in node[1]])
+
+
+# Function to list the words of a tree that are not negated, i.e. the words that rank
+def positive_words(node):
+    if node is None or node[0] == 'not':
+        return []
+    if node[0] == 'term':
+        return [node[1]]
+    return [word for child in node[1] for word in positive_words(child)]
+
+
+# Function to wrap an evaluated DocID list so it can be intersected like postings
+def _list_postings(doc_ids):
+    return Postings(doc_ids, None, 0)
+
+
+# Function to raise ValueError if a tree cannot be evaluated: NOT clauses need
+# positive clauses of the same AND to be subtracted from
+def validate_boolean_query(node):
+    if node is None or node[0] == 'term':
+        return
+    if node[0] == 'not':
+        raise ValueError("a query cannot consist of NOT clauses only")
+    if node[0] == 'or':
+        for child in node[1]:
+            if child[0] == 'not':
+                raise ValueError("NOT cannot be used on its own inside an OR")
+            validate_boolean_query(child)
+        return
+    if all(child[0] == 'not' for child in node[1]):
+        raise ValueError("a query cannot consist of NOT clauses only")
+    for child in node[1]:
+        validate_boolean_query(child[1] if child[0] == 'not' else child)
+
+
+# Function to evaluate a validated clause into postings; postings_by_word maps each
+# resolved word to its postings (words without postings match nothing)
+def _evaluate(node, postings_by_word):
+    kind = node[0]
+    if kind == 'term':
+        return postings_by_word.get(node[1], _list_postings([]))
+    if kind == 'or':
+        doc_ids = set()
+        for child in node[1]:
+            doc_ids.update(_evaluate(child, postings_by_word).doc_ids)
+        return _list_postings(sorted(doc_ids))
+
+    # AND: intersect the positive clauses smallest first and probe the negated ones
+    positives = [_evaluate(child, postings_by_word) for child in node[1] if child[0] != 'not']
+    negatives = [_evaluate(child[1], postings_by_word) for child in node[1] if child[0] == 'not']
+    positives.sort(key=posting_count)
+    return _list_postings(intersect(positives, negatives))
+
+
+# Function to intersect posting lists (sorted smallest first) while excluding the
+# documents of the negated lists; the smallest list leads and the others seek
+def intersect(positives, negatives=()):
+    lead, *others = [open_cursor(postings) for postings in positives]
+    excluded = [open_cursor(postings) for postings in negatives]
+    matches = []
+    doc_id = lead.doc
+    while doc_id != END_OF_POSTINGS:
+        for cursor in others:
+            found = cursor.seek(doc_id)
+            if found != doc_id:
+                # Leapfrog: the lead jumps to the first document the other list has
+                doc_id = lead.seek(found)
+                break
+        else:
+            if all(cursor.seek(doc_id) != doc_id for cursor in excluded):
+                matches.append(doc_id)
+            doc_id = lead.next()
+    return matches
+
+
+# Function to return the sorted DocIDs matching a boolean query tree (an empty
+# tree matches nothing); raises ValueError for an invalid tree
+def evaluate_boolean_query(node, postings_by_word):
+    validate_boolean_query(node)
+    if node is None:
+        return []
+    return list(_evaluate(node, postings_by_word).doc_ids)
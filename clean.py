@@ -1,5 +1,33 @@
+import csv
+import os
+from collections import deque
+from multiprocessing import Pool
 import pandas as pd
-import re
+from tokenizer import clean_text, clean_list, NON_WORD, LIST_MARKUP
+from instrumentation import stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed for the Parquet output
+    pa = pq = None
+
+# Cleaning writes one cleaned copy of the dataset, by default a zstd-compressed
+# Parquet file: the index builders read only the columns they need from it (the
+# lexicon and index builders skip url and timestamp, the document store skips
+# text), and it is a fraction of the size of the CSV. A .csv output file is
+# written as CSV instead.
+#
+# The raw CSV is streamed in chunks and every chunk is cleaned by a worker process
+# with vectorized pandas string operations; at most a few chunks per worker are in
+# flight, so memory stays flat however large the dataset is.
+
+# Columns the lexicon and index builders read
+INDEX_COLUMNS = ['title', 'tags', 'authors', 'text']
+
+# Rows read and cleaned at a time, and the Parquet compression codec
+CHUNK_SIZE = 10000
+PARQUET_COMPRESSION = 'zstd'
 
 def clean_text_column(text):
     """
@@ -14,7 +42,7 @@ def clean_text_column(text):
     if pd.isnull(text):
         return text
     # Replace punctuation with spaces and convert to lowercase
-    return re.sub(r'[\W_]+', ' ', text).lower()
+    return clean_text(text)
 
 def clean_list_column(column):
     """
@@ -29,49 +57,183 @@ def clean_list_column(column):
     if pd.isnull(column):
         return column
     # Remove brackets, clean individual elements, and convert to lowercase
-    column = re.sub(r'[\[\]\'"\s]+', ' ', column)
-    return re.sub(r'[\W_]+', ' ', column).lower()
+    return clean_list(column)
 
-def clean_and_extract_columns(input_file, output_file, extracted_file):
+def clean_chunk(df):
     """
-    Load a CSV file, clean specific columns, save the cleaned dataset, and extract cleaned columns to a separate file.
+    Clean the title, tags, authors and text columns of a DataFrame in place, with
+    vectorized string operations (same result as clean_text_column and clean_list_column).
 
     Parameters:
-    input_file (str): Path to the input CSV file.
-    output_file (str): Path to save the cleaned CSV file.
-    extracted_file (str): Path to save the extracted cleaned columns.
+    df (pd.DataFrame): The rows to clean.
 
     Returns:
-    pd.DataFrame: The cleaned and extracted DataFrame.
+    pd.DataFrame: The same DataFrame with cleaned columns.
     """
-    # Load the first 50,000 rows
-    df = pd.read_csv(input_file, nrows=50000)
+    for col in ('title', 'text'):
+        if col in df.columns:
+            df[col] = df[col].astype(object).str.replace(NON_WORD, ' ', regex=True).str.lower()
 
-    # Clean specific columns
-    if 'title' in df.columns:
-        df['title'] = df['title'].apply(clean_text_column)
+    for col in ('tags', 'authors'):
+        if col in df.columns:
+            values = df[col].astype(object).str.replace(LIST_MARKUP, ' ', regex=True)
+            df[col] = values.str.replace(NON_WORD, ' ', regex=True).str.lower()
 
-    if 'tags' in df.columns:
-        df['tags'] = df['tags'].apply(clean_list_column)
+    return df
 
-    if 'authors' in df.columns:
-        df['authors'] = df['authors'].apply(clean_list_column)
+def clean_dataset(input_file, output_file, nrows=None, chunk_size=CHUNK_SIZE, workers=None):
+    """
+    Stream a CSV file in chunks, clean them in a process pool and write the cleaned
+    rows (all columns) to a single Parquet file, or to a CSV file if output_file ends with .csv.
+
+    Parameters:
+    input_file (str): Path to the raw CSV file.
+    output_file (str): Path to save the cleaned dataset.
+    nrows (int): Number of rows to read, or None for the whole file.
+    chunk_size (int): Number of rows cleaned at a time.
+    workers (int): Number of worker processes, or None for one per CPU core.
+
+    Returns:
+    int: The number of rows cleaned.
+    """
+    if not output_file.endswith('.csv') and pq is None:
+        raise ImportError("Writing the cleaned dataset as Parquet requires pyarrow (pip install pyarrow)")
+    workers = workers or os.cpu_count()
+
+    total_rows = 0
+    writer = None
+    with stage('clean') as trace:
+        # Read every column as text, so the cleaned copy keeps the values exactly
+        chunks = pd.read_csv(input_file, nrows=nrows, chunksize=chunk_size, dtype=str)
+        pool = Pool(workers) if workers > 1 else None
+        try:
+            cleaned = clean_in_pool(chunks, pool, 2 * workers) if pool else map(clean_chunk, chunks)
+            while True:
+                with trace.timer('clean'):
+                    chunk = next(cleaned, None)
+                if chunk is None:
+                    break
+                with trace.timer('write'):
+                    writer = write_chunk(chunk, output_file, writer, total_rows == 0)
+                total_rows += len(chunk)
+                print(f"Cleaned {total_rows} rows...")
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+            if writer is not None:
+                writer.close()
+        trace.count('documents', total_rows)
+        if os.path.exists(output_file):
+            trace.count('bytes_written', os.path.getsize(output_file))
+
+    print(f"Cleaned dataset saved to '{output_file}'.")
+    return total_rows
+
+def clean_in_pool(chunks, pool, window):
+    """
+    Clean chunks in a process pool, keeping at most window chunks in flight.
+
+    Parameters:
+    chunks (iterable): The raw chunks, in order.
+    pool (multiprocessing.Pool): The worker processes.
+    window (int): Number of chunks submitted ahead of the one being returned.
+
+    Yields:
+    pd.DataFrame: The cleaned chunks, in input order.
+    """
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(clean_chunk, (chunk,)))
+        if len(pending) > window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def write_chunk(chunk, output_file, writer, first_chunk):
+    """
+    Append one cleaned chunk to the output file, creating it with the first chunk.
+
+    Parameters:
+    chunk (pd.DataFrame): The cleaned rows.
+    output_file (str): Path of the cleaned dataset (.csv for CSV, else Parquet).
+    writer (pq.ParquetWriter): The open Parquet writer, or None before the first chunk.
+    first_chunk (bool): Whether this is the first chunk.
+
+    Returns:
+    pq.ParquetWriter: The writer to pass with the next chunk (None for CSV).
+    """
+    if output_file.endswith('.csv'):
+        chunk.to_csv(output_file, index=False, mode='w' if first_chunk else 'a', header=first_chunk)
+        return None
+    # Every column is stored as text, so chunks where a column is empty keep the same schema
+    schema = pa.schema([(col, pa.string()) for col in chunk.columns])
+    if writer is None:
+        writer = pq.ParquetWriter(output_file, schema, compression=PARQUET_COMPRESSION)
+    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    return writer
+
+def dataset_columns(dataset_file):
+    """
+    List the columns of a cleaned dataset without reading its rows.
 
-    if 'text' in df.columns:
-        df['text'] = df['text'].apply(clean_text_column)
+    Parameters:
+    dataset_file (str): Path of the cleaned dataset (.parquet or .csv).
 
-    # Save the cleaned dataset
-    df.to_csv(output_file, index=False)
+    Returns:
+    list: The column names.
+    """
+    if dataset_file.endswith('.parquet'):
+        return pq.read_schema(dataset_file).names
+    return list(pd.read_csv(dataset_file, nrows=0).columns)
 
-    # Extract and save cleaned columns
-    extracted_df = df[['title', 'tags', 'authors', 'text']]
-    extracted_df.to_csv(extracted_file, index=False)
+def read_cleaned_dataset(dataset_file, columns=INDEX_COLUMNS):
+    """
+    Read the given columns of a cleaned dataset (those it has), from Parquet or CSV.
 
-    return extracted_df
+    Parameters:
+    dataset_file (str): Path of the cleaned dataset (.parquet or .csv).
+    columns (list): The columns to read, or None for all of them.
 
-# Example usage
-input_csv = "Dataset50Krows.csv"  
-output_csv = "CleanedSubDataset.csv"  
-extracted_csv = "ExtractedCleanedColumns.csv"  
-# Clean the dataset and extract columns
-extracted_data = clean_and_extract_columns(input_csv, output_csv, extracted_csv)
\ No newline at end of file
+    Returns:
+    pd.DataFrame: The rows, with missing values as None (Parquet) or NaN (CSV).
+    """
+    if columns is not None:
+        available = set(dataset_columns(dataset_file))
+        columns = [col for col in columns if col in available]
+    if dataset_file.endswith('.parquet'):
+        return pd.read_parquet(dataset_file, columns=columns)
+    return pd.read_csv(dataset_file, usecols=columns)
+
+def iter_cleaned_records(dataset_file, columns, batch_size=CHUNK_SIZE):
+    """
+    Stream the rows of a cleaned dataset as dicts of the given columns (those it has).
+
+    Parameters:
+    dataset_file (str): Path of the cleaned dataset (.parquet or .csv).
+    columns (list): The columns to read.
+    batch_size (int): Number of rows decoded at a time (Parquet).
+
+    Yields:
+    dict: One row, with missing values as None (Parquet) or "" (CSV).
+    """
+    available = set(dataset_columns(dataset_file))
+    columns = [col for col in columns if col in available]
+    if dataset_file.endswith('.parquet'):
+        for batch in pq.ParquetFile(dataset_file).iter_batches(batch_size=batch_size, columns=columns):
+            yield from batch.to_pylist()
+        return
+    # Article text can be far longer than the default CSV field size limit
+    csv.field_size_limit(10000000)
+    with open(dataset_file, 'r', encoding='utf-8', errors='ignore') as f:
+        for record in csv.DictReader(f):
+            yield {col: record[col] for col in columns}
+
+# Input is the raw dataset; set row_limit to clean only its first rows (e.g. 50000
+# for a quick subset)
+input_csv = "Dataset.csv"
+output_file = "CleanedDataset.parquet"  # Use a .csv name to write CSV instead
+row_limit = None
+# Clean the dataset
+if __name__ == "__main__":
+    cleaned_rows = clean_dataset(input_csv, output_file, nrows=row_limit)
@@ -0,0 +1,127 @@
+import csv
+import io
+from array import array
+from binaryIndex import LITTLE_ENDIAN
+from instrumentation import stage
+from clean import dataset_columns, iter_cleaned_records
+
+# Document store: a side table with the display fields of every document (no
+# article text) plus an offsets file holding the byte offset of each DocID's row,
+# so the query side can fetch the metadata of its top results with one seek each.
+#
+# DocStore.csv      header row + one CSV row per DocID, in DocID order
+# DocStore.offsets  uint64 offsets[documents + 1] (little-endian), row i spans
+#                   offsets[i]..offsets[i + 1]
+
+# Columns kept for result display; 'text' is deliberately left out
+STORE_FIELDS = ['url', 'title', 'authors', 'tags', 'timestamp']
+
+
+class DocumentStoreWriter:
+    """Appends one row per document and records where each row starts."""
+
+    def __init__(self, store_file, offsets_file, fields, append=False):
+        self.store_file = store_file
+        self.offsets_file = offsets_file
+        self.fields = list(fields)
+        if append:
+            # Continue an existing store: keep its columns and DocIDs
+            with DocumentStore(store_file, offsets_file) as store:
+                self.fields = store.fields
+                self._offsets = array('Q', store._offsets)
+            self._file = open(store_file, 'r+b')
+            self._file.seek(self._offsets[-1])
+            self._file.truncate()
+        else:
+            self._file = open(store_file, 'wb')
+            self._offsets = array('Q')
+            self._write_row(self.fields)
+            self._offsets.append(self._file.tell())
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _write_row(self, values):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        self._file.write(buffer.getvalue().encode('utf-8'))
+
+    # Function to append a document (a dict of field values) with the next DocID
+    def add(self, record):
+        values = []
+        for field in self.fields:
+            value = record.get(field)
+            values.append(value if isinstance(value, str) else "")
+        self._write_row(values)
+        self._offsets.append(self._file.tell())
+
+    def close(self):
+        self._file.close()
+        offsets = array('Q', self._offsets)
+        if not LITTLE_ENDIAN:
+            offsets.byteswap()
+        with open(self.offsets_file, 'wb') as f:
+            offsets.tofile(f)
+        print(f"Document store saved to {self.store_file} ({len(self)} documents).")
+
+
+class DocumentStore:
+    """Random access to the stored fields of a document by DocID."""
+
+    def __init__(self, store_file, offsets_file):
+        self._offsets = array('Q')
+        with open(offsets_file, 'rb') as f:
+            self._offsets.frombytes(f.read())
+        if not LITTLE_ENDIAN:
+            self._offsets.byteswap()
+        self._file = open(store_file, 'rb')
+        self.fields = next(csv.reader([self._file.readline().decode('utf-8')]))
+        self.bytes_read = 0
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    # Function to fetch the requested fields (all stored fields by default) of one document
+    def get(self, doc_id, fields=None):
+        if not 0 <= doc_id < len(self):
+            return None
+        start, end = self._offsets[doc_id], self._offsets[doc_id + 1]
+        self._file.seek(start)
+        self.bytes_read += end - start
+        row = next(csv.reader(io.StringIO(self._file.read(end - start).decode('utf-8'))))
+        record = dict(zip(self.fields, row))
+        if fields is not None:
+            record = {field: record.get(field, "") for field in fields}
+        return record
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Function to build the document store from the cleaned dataset in one streaming pass
+def build_document_store(dataset_file, store_file, offsets_file):
+    print(f"Reading dataset from {dataset_file}...")
+    with stage('docStore') as trace:
+        # Only the stored fields are read (not the article text)
+        fields = [field for field in STORE_FIELDS if field in dataset_columns(dataset_file)]
+        writer = DocumentStoreWriter(store_file, offsets_file, fields)
+        for record in iter_cleaned_records(dataset_file, fields):
+            writer.add(record)
+            if len(writer) % 10000 == 0:
+                print(f"Stored {len(writer)} documents...")
+        writer.close()
+        trace.count('documents', len(writer))
+        trace.count('bytes_written', writer._offsets[-1])
+
+
+dataset_file = 'CleanedDataset.parquet'
+store_file = 'DocStore.csv'
+offsets_file = 'DocStore.offsets'
+if __name__ == "__main__":
+    build_document_store(dataset_file, store_file, offsets_file)
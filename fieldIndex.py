@@ -0,0 +1,229 @@
+from array import array
+from bisect import bisect_left
+from math import log
+from forwardIndex import read_lexicon, read_dataset, count_field_frequencies
+from binaryIndex import HEADER, MAGIC_FIELDS, FORMAT_VERSION, FLAG_TERM_BOUNDS, MappedFile, _write_array
+from postings import Postings
+from topK import QueryTerm
+from instrumentation import stage
+
+# Per-field statistics for BM25F ranking (FieldIndex.bin), built next to the
+# inverted index. For every term it stores its posting list with the number of
+# occurrences in each field, and for every document the length of each field (its
+# number of indexed words), all as fixed-width arrays:
+#
+#   score(d) = sum over query terms of  idf * tf * (K1 + 1) / (K1 + tf)
+#   tf       = sum over fields f of  boost_f * tf_f / (1 - b_f + b_f * length_f(d) / average length_f)
+#   idf      = ln(1 + (N - df + 0.5) / (df + 0.5))
+#
+# The field length normalization is folded into one factor per document and field
+# when the file is loaded, so scoring a posting is a few multiplications on arrays.
+# For MaxScore, every term also stores the largest count and the shortest length of
+# each field over its postings; they bound its score under any boosts and b, so the
+# upper bound of a term costs a few operations instead of a pass over its postings.
+# query.py ranks with it when RANKING = 'bm25f'; TF-IDF stays the default.
+
+FIELDS = ('title', 'authors', 'tags', 'text')
+NUM_FIELDS = len(FIELDS)
+
+# Largest per-field count stored (counts are uint16)
+MAX_FIELD_FREQUENCY = 65535
+
+# Default BM25F parameters: field boosts (the forward index weights 4/3/2/1),
+# length normalization per field and term frequency saturation
+FIELD_BOOSTS = {'title': 4.0, 'authors': 3.0, 'tags': 2.0, 'text': 1.0}
+FIELD_B = {'title': 0.75, 'authors': 0.75, 'tags': 0.75, 'text': 0.75}
+K1 = 1.2
+
+
+# Function to build FieldIndex.bin from the cleaned dataset (DocIDs are row numbers,
+# as in the forward and inverted index)
+def build_field_index(dataset_file, lexicon_file, output_file):
+    with stage('fieldIndex') as trace:
+        with trace.timer('read'):
+            lexicon = read_lexicon(lexicon_file)
+            dataset = read_dataset(dataset_file)
+        print("Generating field index...")
+
+        # WordID -> (DocIDs, per-field counts of each posting)
+        terms = {}
+        field_lengths = array('I')
+        with trace.timer('index'):
+            for doc_id, row in dataset.iterrows():
+                lengths = [0] * NUM_FIELDS
+                for word_id, counts in count_field_frequencies(row['title'], row['tags'], row['authors'], row['text'],
+                                                               lexicon):
+                    term = terms.get(word_id)
+                    if term is None:
+                        term = terms[word_id] = (array('I'), array('H'))
+                    term[0].append(doc_id)
+                    term[1].extend(min(count, MAX_FIELD_FREQUENCY) for count in counts)
+                    for field, count in enumerate(counts):
+                        lengths[field] += count
+                field_lengths.extend(lengths)
+                if doc_id % 1000 == 0:
+                    print(f"Processed {doc_id} documents...")
+        trace.count('documents', len(dataset))
+        trace.count('terms', len(terms))
+
+        with trace.timer('write'):
+            write_field_index(terms, field_lengths, len(dataset), output_file)
+
+
+# Function to compute the score bounds of one term: the largest count of each field
+# over its postings and the shortest length of that field among the postings that
+# contain it (0 for a field the term never occurs in)
+def term_bounds(doc_ids, field_counts, field_lengths):
+    max_counts = [0] * NUM_FIELDS
+    min_lengths = [0] * NUM_FIELDS
+    for posting, doc_id in enumerate(doc_ids):
+        for field in range(NUM_FIELDS):
+            count = field_counts[posting * NUM_FIELDS + field]
+            if count:
+                length = field_lengths[doc_id * NUM_FIELDS + field]
+                max_counts[field] = max(max_counts[field], count)
+                if not min_lengths[field] or length < min_lengths[field]:
+                    min_lengths[field] = length
+    return max_counts, min_lengths
+
+
+# Function to write the field index in the binary format (see binaryIndex.py)
+def write_field_index(terms, field_lengths, total_documents, output_file):
+    word_ids = sorted(terms)
+    offsets = [0]
+    for word_id in word_ids:
+        offsets.append(offsets[-1] + len(terms[word_id][0]))
+    bounds = [term_bounds(*terms[word_id], field_lengths) for word_id in word_ids]
+
+    with open(output_file, 'wb') as f:
+        f.write(HEADER.pack(MAGIC_FIELDS, FORMAT_VERSION, FLAG_TERM_BOUNDS, NUM_FIELDS, len(word_ids), offsets[-1],
+                            total_documents))
+        _write_array(f, 'I', word_ids)
+        _write_array(f, 'Q', offsets)
+        _write_array(f, 'I', (doc_id for word_id in word_ids for doc_id in terms[word_id][0]))
+        _write_array(f, 'H', (count for word_id in word_ids for count in terms[word_id][1]))
+        _write_array(f, 'I', field_lengths)
+        _write_array(f, 'H', (count for max_counts, _ in bounds for count in max_counts))
+        _write_array(f, 'I', (length for _, min_lengths in bounds for length in min_lengths))
+    print(f"Field index saved to {output_file}.")
+
+
+class FieldTerm(QueryTerm):
+    """Query term scored with BM25F. Its postings carry posting numbers instead of
+    weights, so the top-k strategies pass them back to score()."""
+
+    def __init__(self, word_id, postings, idf, field_index):
+        super().__init__(word_id, postings, idf)
+        self._index = field_index
+
+    def score(self, posting):
+        return self.idf * self._index.saturation(posting)
+
+    def upper_bound(self):
+        return self.idf * self._index.max_saturation(self.word_id)
+
+
+class FieldIndex:
+    """BM25F statistics over a memory-mapped FieldIndex.bin.
+
+    get(word_id) returns Postings whose weights are the posting numbers (a range),
+    and term() wraps them into a FieldTerm for topK.py.
+    """
+
+    def __init__(self, path, boosts=FIELD_BOOSTS, b=FIELD_B, k1=K1):
+        self._file = MappedFile(path, MAGIC_FIELDS)
+        num_terms, num_postings, self.num_documents = self._file.counts
+        if self._file.reserved != NUM_FIELDS:
+            self._file.close()
+            raise ValueError(f"{path} has {self._file.reserved} fields, expected {NUM_FIELDS}")
+        if not self._file.flags & FLAG_TERM_BOUNDS:
+            self._file.close()
+            raise ValueError(f"{path} has no term score bounds, rebuild it with fieldIndex.py")
+        self._word_ids = self._file.next_array('I', num_terms)
+        self._offsets = self._file.next_array('Q', num_terms + 1)
+        self._doc_ids = self._file.next_array('I', num_postings)
+        self._field_counts = self._file.next_array('H', num_postings * NUM_FIELDS)
+        field_lengths = self._file.next_array('I', self.num_documents * NUM_FIELDS)
+        self._max_counts = self._file.next_array('H', num_terms * NUM_FIELDS)
+        self._min_lengths = self._file.next_array('I', num_terms * NUM_FIELDS)
+        self._num_terms = num_terms
+        self.k1 = k1
+
+        # Fold boost and length normalization into one factor per (document, field);
+        # the same normalization of a field length is kept for the term bounds
+        factors = []
+        self._normalizations = []  # (boost, b, average length) per field
+        for field, name in enumerate(FIELDS):
+            lengths = field_lengths[field::NUM_FIELDS]
+            average = sum(lengths) / len(lengths) if len(lengths) else 0
+            boost, slope = boosts[name], b[name]
+            self._normalizations.append((boost, slope, average))
+            if average == 0:
+                factors.append([boost] * len(lengths))
+            else:
+                # An empty field has no counts to weigh (and with b = 1 no defined factor)
+                factors.append([boost / (1 - slope + slope * length / average) if length else boost
+                                for length in lengths])
+        self._factors = array('d', (factor[doc] for doc in range(self.num_documents) for factor in factors))
+
+    def _find(self, word_id):
+        i = bisect_left(self._word_ids, word_id)
+        if i < self._num_terms and self._word_ids[i] == word_id:
+            return i
+        return -1
+
+    def get(self, word_id, default=None):
+        i = self._find(word_id)
+        if i < 0:
+            return default
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return Postings(self._doc_ids[start:end], range(start, end), 0)
+
+    def __contains__(self, word_id):
+        return self._find(word_id) >= 0
+
+    # Function to turn the postings of a word into a BM25F query term
+    def term(self, word_id, postings, total_documents):
+        df = len(postings.doc_ids)
+        idf = log(1 + (total_documents - df + 0.5) / (df + 0.5))
+        return FieldTerm(word_id, postings, idf, self)
+
+    # Function to compute the saturated, field-weighted term frequency of one posting
+    def saturation(self, posting):
+        counts = self._field_counts
+        factors = self._factors
+        i = posting * NUM_FIELDS
+        j = self._doc_ids[posting] * NUM_FIELDS
+        tf = (counts[i] * factors[j] + counts[i + 1] * factors[j + 1]
+              + counts[i + 2] * factors[j + 2] + counts[i + 3] * factors[j + 3])
+        return tf * (self.k1 + 1) / (self.k1 + tf)
+
+    # Function to bound the saturation of a word's postings: each field counts at most
+    # its largest count, normalized by its shortest length (a shorter field weighs more)
+    def max_saturation(self, word_id):
+        i = self._find(word_id)
+        if i < 0:
+            return 0.0
+        tf = 0.0
+        for field, (boost, slope, average) in enumerate(self._normalizations):
+            count = self._max_counts[i * NUM_FIELDS + field]
+            if count:
+                length = self._min_lengths[i * NUM_FIELDS + field]
+                tf += boost * count if average == 0 else boost * count / (1 - slope + slope * length / average)
+        return tf * (self.k1 + 1) / (self.k1 + tf)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+dataset_file = 'CleanedDataset.parquet'
+lexicon_file = 'Lexicon.csv'
+output_file = 'FieldIndex.bin'
+if __name__ == "__main__":
+    build_field_index(dataset_file, lexicon_file, output_file)
@@ -1,26 +1,71 @@
 import csv
-import pandas as pd
 from collections import defaultdict
+from binaryIndex import read_compact_lexicon, write_binary_forward_index
+from tokenizer import index_terms
+from instrumentation import stage
+from clean import read_cleaned_dataset
 
-# Function to read lexicon from a file and create a dictionary (Word -> WordID)
+# Function to read the lexicon (Word -> WordID) from Lexicon.csv or Lexicon.bin into
+# a compact lexicon (see binaryIndex.py)
 def read_lexicon(lexicon_file):
-    lexicon = {}
-    with open(lexicon_file, 'r', encoding='utf-8') as f:  # Set encoding to utf-8
-        reader = csv.reader(f)
-        next(reader)  # Skip the header row (if present)
-        for row in reader:
-            if len(row) == 2:
-                word, word_id = row
-                try:
-                    # Try to convert WordID to an integer
-                    lexicon[word] = int(word_id)
-                except ValueError:
-                    print(f"Skipping invalid row: {row}")  # Handle invalid rows gracefully
-    return lexicon
-
-# Function to read the dataset from a CSV file
+    return read_compact_lexicon(lexicon_file)
+
+# Function to read the indexed columns of the cleaned dataset (Parquet or CSV)
 def read_dataset(dataset_file):
-    return pd.read_csv(dataset_file)
+    return read_cleaned_dataset(dataset_file)
+
+# Function to count how often each lexicon word occurs in the title, authors, tags and text of one document
+def count_field_frequencies(title, tags, authors, text, lexicon):
+    # Create a dictionary to store word frequencies in each section, by WordID so the
+    # surface forms of a root (which share its WordID) are counted together
+    word_count = defaultdict(lambda: {'n': 0, 'o': 0, 'p': 0, 'm': 0})
+
+    # Count occurrences in title (index_terms tokenizes the same way as the lexicon
+    # and skips stop words and non-string values)
+    for word in index_terms(title):
+        word_id = lexicon.get(word)
+        if word_id is not None:
+            word_count[word_id]['n'] += 1
+
+    # Count occurrences in authors
+    for word in index_terms(authors):
+        word_id = lexicon.get(word)
+        if word_id is not None:
+            word_count[word_id]['o'] += 1
+
+    # Count occurrences in tags
+    for word in index_terms(tags):
+        word_id = lexicon.get(word)
+        if word_id is not None:
+            word_count[word_id]['p'] += 1
+
+    # Count occurrences in text
+    for word in index_terms(text):
+        word_id = lexicon.get(word)
+        if word_id is not None:
+            word_count[word_id]['m'] += 1
+
+    # Collect (WordID, (title, authors, tags, text) counts) in the order the words were first seen
+    frequencies = []
+    for word_id, counts in word_count.items():
+        frequencies.append((word_id, (counts['n'], counts['o'], counts['p'], counts['m'])))
+
+    return frequencies
+
+# Function to combine the per-field counts of a word into its weight
+def field_weight(counts):
+    title, authors, tags, text = counts
+    return 4 * title + 3 * authors + 2 * tags + text
+
+# Function to count the field-weighted frequency of each lexicon word in one document
+def compute_word_weights(title, tags, authors, text, lexicon):
+    weights = []
+    for word_id, counts in count_field_frequencies(title, tags, authors, text, lexicon):
+        # Calculate the weight
+        weight = field_weight(counts)
+        if weight > 0:  # Only include words with a non-zero weight
+            weights.append((word_id, weight))
+    return weights
 
 # Function to generate the forward index
 def generate_forward_index(dataset, lexicon):
@@ -29,73 +74,59 @@ def generate_forward_index(dataset, lexicon):
     # Iterate through the dataset and process each document
     for doc_id, row in dataset.iterrows():
         title, tags, authors, text = row['title'], row['tags'], row['authors'], row['text']
-        
-        # Ensure all columns are treated as strings (convert if necessary)
-        title = str(title) if isinstance(title, str) else ""
-        tags = str(tags) if isinstance(tags, str) else ""
-        authors = str(authors) if isinstance(authors, str) else ""
-        text = str(text) if isinstance(text, str) else ""
-
-        # Create a dictionary to store word frequencies in each section
-        word_count = defaultdict(lambda: {'n': 0, 'o': 0, 'p': 0, 'm': 0})
-        
-        # Count occurrences in title
-        for word in title.split():
-            if word in lexicon:
-                word_count[word]['n'] += 1
-        
-        # Count occurrences in authors
-        for word in authors.split():
-            if word in lexicon:
-                word_count[word]['o'] += 1
-        
-        # Count occurrences in tags
-        for word in tags.split():
-            if word in lexicon:
-                word_count[word]['p'] += 1
-        
-        # Count occurrences in text
-        for word in text.split():
-            if word in lexicon:
-                word_count[word]['m'] += 1
-        
-        # Create the details string with WordID:Weight pairs
-        details = []
-        for word, counts in word_count.items():
-            # Calculate the weight
-            weight = 4 * counts['n'] + 3 * counts['o'] + 2 * counts['p'] + counts['m']
-            if weight > 0:  # Only include words with a non-zero weight
-                if word in lexicon:  # Ensure the word is in lexicon before adding
-                    word_id = lexicon[word]  # Get the word ID from the lexicon
-                    details.append(f"{word_id}:{weight}")
+
+        # Count the words per field and derive the WordID:Weight pairs of the document
+        frequencies = count_field_frequencies(title, tags, authors, text, lexicon)
+        weights = [(word_id, field_weight(counts)) for word_id, counts in frequencies]
+        field_counts = [counts for _, counts in frequencies]
         
         # Add the row to the forward index
-        forward_index.append([doc_id, ",".join(details)])
+        forward_index.append([doc_id, weights, field_counts])
 
     return forward_index
 
+# Function to format one forward index row for the CSV file
+def forward_index_row(doc_id, weights, field_counts):
+    # Create the details string with WordID:Weight pairs, and alongside it the
+    # title:authors:tags:text counts of each word in the same order
+    details = [f"{word_id}:{weight}" for word_id, weight in weights]
+    field_freqs = [":".join(map(str, counts)) for counts in field_counts]
+    return [doc_id, ",".join(details), ",".join(field_freqs)]
+
 # Function to write the forward index to a CSV file
 def write_forward_index(forward_index, output_file):
     with open(output_file, 'w', newline='') as f:
         writer = csv.writer(f)
-        writer.writerow(["DocID", "Details"])  # Header
-        writer.writerows(forward_index)
+        writer.writerow(["DocID", "Details", "FieldFreqs"])  # Header
+        for doc_id, weights, field_counts in forward_index:
+            writer.writerow(forward_index_row(doc_id, weights, field_counts))
 
 # Main function to read files and process them
-def main(lexicon_file, dataset_file, output_file):
-    # Read the lexicon and dataset
-    lexicon = read_lexicon(lexicon_file)
-    dataset = read_dataset(dataset_file)
+def main(lexicon_file, dataset_file, output_file, output_format='csv'):
+    with stage('forwardIndex') as trace:
+        # Read the lexicon and dataset
+        with trace.timer('read'):
+            lexicon = read_lexicon(lexicon_file)
+            dataset = read_dataset(dataset_file)
 
-    # Generate the forward index
-    forward_index = generate_forward_index(dataset, lexicon)
+        # Generate the forward index
+        with trace.timer('index'):
+            forward_index = generate_forward_index(dataset, lexicon)
+        trace.count('documents', len(forward_index))
+        trace.count('entries', sum(len(row[1]) for row in forward_index))
 
-    # Write the forward index to the output CSV
-    write_forward_index(forward_index, output_file)
+        # Write the forward index to the output CSV (or the binary format)
+        with trace.timer('write'):
+            if output_format == 'binary':
+                write_binary_forward_index(forward_index, output_file)
+            else:
+                write_forward_index(forward_index, output_file)
     print(f"Forward index generated and saved to {output_file}")
 
 # Example usage:
 lexicon_file = 'Lexicon.csv'  
-dataset_file = 'ExtractedCleanedColumns.csv'  
-output_file = 'ForwardIndex.csv'
-main(lexicon_file, dataset_file, output_file) 
+dataset_file = 'CleanedDataset.parquet'
+output_format = 'csv'  # Use 'binary' to write ForwardIndex.bin for memory-mapped loading
+output_file = 'ForwardIndex.csv' if output_format == 'csv' else 'ForwardIndex.bin'
+if __name__ == "__main__":
+    main(lexicon_file, dataset_file, output_file, output_format)
@@ -0,0 +1,214 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+# Lightweight timers and counters for the build stages and the query path.
+#
+# Code under measurement asks for a trace and records into it:
+#
+#     trace = start_trace('query', query=text)
+#     with trace.timer('lexicon'):
+#         ...
+#     trace.count('postings', n)
+#     finish_trace(trace)
+#
+# A finished trace is added to the aggregate metrics (instrumentation.metrics) and,
+# if TRACE_FILE is set, appended to it as one JSON line. While instrumentation is
+# off, start_trace hands out a shared do-nothing trace, so the cost at each call
+# site is a method call on an empty object. Counters inside hot loops are kept in
+# local variables and recorded once at the end.
+#
+# Switch it on with enable() or the SEARCH_INSTRUMENTATION=1 environment variable.
+# With profiling on as well (enable(profile=True) or SEARCH_PROFILE=1), every
+# stage() block also runs under cProfile and its stats are saved to PROFILE_DIR.
+
+ENABLED = os.environ.get('SEARCH_INSTRUMENTATION') == '1'
+PROFILE = os.environ.get('SEARCH_PROFILE') == '1'
+TRACE_FILE = os.environ.get('SEARCH_TRACE_FILE')
+PROFILE_DIR = 'profiles'
+
+# Number of functions listed when a profile is printed
+PROFILE_TOP_FUNCTIONS = 20
+
+
+class _Timer:
+    __slots__ = ('trace', 'stage', 'start')
+
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        timers = self.trace.timers
+        timers[self.stage] = timers.get(self.stage, 0.0) + elapsed
+
+
+class Trace:
+    """Timers (seconds per stage) and counters recorded for one query or build stage."""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.timers = {}
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.total_seconds = None
+
+    def timer(self, stage):
+        return _Timer(self, stage)
+
+    def count(self, counter, n=1):
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def as_dict(self):
+        return {'name': self.name, **self.fields, 'total_seconds': self.total_seconds,
+                'timers': self.timers, 'counters': self.counters}
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _NullTrace:
+    """Trace handed out while instrumentation is off; records nothing."""
+
+    __slots__ = ()
+    name = None
+
+    def timer(self, stage):
+        return _NULL_TIMER
+
+    def count(self, counter, n=1):
+        pass
+
+    def as_dict(self):
+        return {}
+
+
+_NULL_TIMER = _NullTimer()
+NULL_TRACE = _NullTrace()
+
+
+class Metrics:
+    """Aggregate of every finished trace, grouped by trace name."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._groups = {}
+
+    # Function to add a finished trace to the aggregate
+    def record(self, trace):
+        group = self._groups.get(trace.name)
+        if group is None:
+            group = self._groups[trace.name] = {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+                                                'timers': {}, 'counters': {}}
+        group['count'] += 1
+        group['total_seconds'] += trace.total_seconds
+        group['max_seconds'] = max(group['max_seconds'], trace.total_seconds)
+        for stage, seconds in trace.timers.items():
+            timer = group['timers'].setdefault(stage, {'total_seconds': 0.0, 'max_seconds': 0.0})
+            timer['total_seconds'] += seconds
+            timer['max_seconds'] = max(timer['max_seconds'], seconds)
+        for counter, n in trace.counters.items():
+            group['counters'][counter] = group['counters'].get(counter, 0) + n
+
+    # Function to return the aggregate metrics, with mean times per trace
+    def snapshot(self):
+        snapshot = {}
+        for name, group in self._groups.items():
+            count = group['count']
+            snapshot[name] = {
+                'count': count,
+                'mean_seconds': group['total_seconds'] / count,
+                'max_seconds': group['max_seconds'],
+                'timers': {stage: dict(timer, mean_seconds=timer['total_seconds'] / count)
+                           for stage, timer in group['timers'].items()},
+                'counters': dict(group['counters']),
+            }
+        return snapshot
+
+
+metrics = Metrics()
+
+
+# Function to switch instrumentation on (optionally with cProfile and a trace log)
+def enable(profile=False, trace_file=None):
+    global ENABLED, PROFILE, TRACE_FILE
+    ENABLED = True
+    PROFILE = profile
+    TRACE_FILE = trace_file
+
+
+def disable():
+    global ENABLED, PROFILE
+    ENABLED = False
+    PROFILE = False
+
+
+# Function to start a trace; extra fields (e.g. the query text) are kept in its record
+def start_trace(name, **fields):
+    if not ENABLED:
+        return NULL_TRACE
+    return Trace(name, fields)
+
+
+# Function to close a trace and add it to the metrics and the trace file
+def finish_trace(trace):
+    if trace is NULL_TRACE:
+        return
+    trace.total_seconds = time.perf_counter() - trace.start
+    metrics.record(trace)
+    if TRACE_FILE:
+        with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(trace.as_dict()) + '\n')
+
+
+# Function to run a block under cProfile when profiling is on, saving the stats
+# to PROFILE_DIR/<name>.prof and printing the most expensive functions
+@contextmanager
+def profiled(name):
+    if not PROFILE:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_file = os.path.join(PROFILE_DIR, f"{name}.prof")
+        profiler.dump_stats(profile_file)
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        print(f"Profile of {name} saved to {profile_file}:\n{output.getvalue()}")
+
+
+# Function to trace (and optionally profile) a whole build stage
+@contextmanager
+def stage(name, **fields):
+    trace = start_trace(name, **fields)
+    with profiled(name):
+        try:
+            yield trace
+        finally:
+            finish_trace(trace)
+            if trace is not NULL_TRACE:
+                print(f"{name}: {trace.total_seconds:.2f}s, timers {trace.timers}, counters {trace.counters}")
@@ -1,30 +1,23 @@
 import csv
-import pandas as pd
-import re
 from collections import defaultdict
+from forwardIndex import compute_word_weights
+from binaryIndex import read_compact_lexicon, write_binary_inverted_index
+from instrumentation import stage
+from clean import read_cleaned_dataset
+from snapshot import build_snapshot, snapshot_dir_of
 
-# Function to read lexicon from a file and create a dictionary (Word -> WordID)
+# Function to read the lexicon (Word -> WordID) from Lexicon.csv or Lexicon.bin into
+# a compact lexicon (see binaryIndex.py)
 def read_lexicon(lexicon_file):
-    lexicon = {}
-    with open(lexicon_file, 'r', encoding='utf-8', errors='ignore') as f:  # Specify encoding and error handling
-        reader = csv.reader(f)
-        next(reader)  # Skip the header row (if present)
-        print("Reading lexicon file...")
-        for row in reader:
-            if len(row) == 2:
-                word, word_id = row
-                try:
-                    # Try to convert WordID to an integer
-                    lexicon[word] = int(word_id)
-                except ValueError:
-                    print(f"Skipping invalid row: {row}")  # Handle invalid rows gracefully
-        print(f"Lexicon loaded with {len(lexicon)} words.")
+    print("Reading lexicon file...")
+    lexicon = read_compact_lexicon(lexicon_file)
+    print(f"Lexicon loaded with {len(lexicon)} words.")
     return lexicon
 
-# Function to read the dataset from a CSV file
+# Function to read the indexed columns of the cleaned dataset (Parquet or CSV)
 def read_dataset(dataset_file):
     print(f"Reading dataset from {dataset_file}...")
-    dataset = pd.read_csv(dataset_file)
+    dataset = read_cleaned_dataset(dataset_file)
     print(f"Dataset loaded with {len(dataset)} documents.")
     return dataset
 
@@ -40,22 +33,11 @@ def generate_inverted_index(dataset, lexicon):
 
         title, tags, authors, text = row['title'], row['tags'], row['authors'], row['text']
         
-        # Combine all fields to process the entire document text
-        full_text = f"{title} {tags} {authors} {text}"
-        
-        # Split the text into words and clean each word
-        words = full_text.split()
-        
-        # Normalize words by removing non-alphabetic characters
-        for word in words:
-            # Clean the word by removing non-alphabetical characters
-            cleaned_word = re.sub(r'[^a-zA-Z]', '', word).lower()  # Remove non-alphabetical chars and lower the case
-            
-            # If the cleaned word exists in the lexicon, add the document ID to the inverted index
-            if cleaned_word in lexicon:
-                word_id = lexicon[cleaned_word]
-                if doc_id not in inverted_index[word_id]:
-                    inverted_index[word_id].append(doc_id)
+        # Use the same field-weighted term frequencies as the forward index, so the
+        # query side can score a posting list without looking the document up again.
+        # Each word appears once per document here, so no duplicate check is needed.
+        for word_id, weight in compute_word_weights(title, tags, authors, text, lexicon):
+            inverted_index[word_id].append((doc_id, weight))
     
     print(f"Inverted index generated with {len(inverted_index)} unique words.")
     return inverted_index
@@ -65,26 +47,56 @@ def write_inverted_index(inverted_index, output_file):
     print(f"Saving inverted index to {output_file}...")
     with open(output_file, 'w', newline='') as f:
         writer = csv.writer(f)
-        writer.writerow(["WordID", "DocIDs"])  # Header
-        for word_id, doc_ids in inverted_index.items():
-            # Convert doc_ids list to a comma-separated string
-            writer.writerow([word_id, ",".join(map(str, doc_ids))])
+        writer.writerow(["WordID", "MaxWeight", "Postings"])  # Header
+        for word_id, postings in inverted_index.items():
+            # Store the largest weight so queries can bound the term's score, and
+            # convert the postings to a comma-separated string of DocID:Weight pairs
+            max_weight = max(weight for _, weight in postings)
+            writer.writerow([word_id, max_weight, ",".join(f"{doc_id}:{weight}" for doc_id, weight in postings)])
     print(f"Inverted index saved to {output_file}.")
 
+# Function to save the collection statistics the query side needs for IDF
+def write_index_stats(total_documents, stats_file):
+    with open(stats_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Stat", "Value"])  # Header
+        writer.writerow(["Documents", total_documents])
+    print(f"Index statistics saved to {stats_file}.")
+
 # Main function to read files and process them
-def main(lexicon_file, dataset_file, output_file):
-    # Read the lexicon and dataset
-    lexicon = read_lexicon(lexicon_file)
-    dataset = read_dataset(dataset_file)
+def main(lexicon_file, dataset_file, output_file, stats_file, output_format='csv', compress=False):
+    with stage('invertedIndex') as trace:
+        # Read the lexicon and dataset
+        with trace.timer('read'):
+            lexicon = read_lexicon(lexicon_file)
+            dataset = read_dataset(dataset_file)
 
-    # Generate the inverted index
-    inverted_index = generate_inverted_index(dataset, lexicon)
+        # Generate the inverted index
+        with trace.timer('index'):
+            inverted_index = generate_inverted_index(dataset, lexicon)
+        trace.count('documents', len(dataset))
+        trace.count('terms', len(inverted_index))
+        trace.count('postings', sum(len(postings) for postings in inverted_index.values()))
 
-    # Write the inverted index to the output CSV
-    write_inverted_index(inverted_index, output_file)
+        # Write the inverted index to the output CSV, or to the binary format whose
+        # header already carries the document count
+        with trace.timer('write'):
+            if output_format == 'binary':
+                write_binary_inverted_index(inverted_index, len(dataset), output_file, compress)
+            else:
+                write_inverted_index(inverted_index, output_file)
+                write_index_stats(len(dataset), stats_file)
+        # The startup snapshot of the 'lazy' format (see snapshot.py)
+        if output_format != 'binary' and not lexicon_file.endswith('.bin'):
+            with trace.timer('snapshot'):
+                build_snapshot(lexicon_file, output_file, stats_file, snapshot_dir_of(output_file))
 
 
 lexicon_file = 'Lexicon.csv'  
-dataset_file = 'ExtractedCleanedColumns.csv'  
-output_file = 'InvertedIndex.csv'  
-main(lexicon_file, dataset_file, output_file)
+dataset_file = 'CleanedDataset.parquet'
+output_format = 'csv'  # Use 'binary' to write InvertedIndex.bin for memory-mapped loading
+compress = False  # With 'binary', store the posting lists delta + variable-byte compressed
+output_file = 'InvertedIndex.csv' if output_format == 'csv' else 'InvertedIndex.bin'
+stats_file = 'IndexStats.csv'
+if __name__ == "__main__":
+    main(lexicon_file, dataset_file, output_file, stats_file, output_format, compress)
@@ -1,75 +1,87 @@
 import pandas as pd
-import re
-from nltk.stem import WordNetLemmatizer
-from nltk.corpus import stopwords
+from binaryIndex import write_binary_lexicon
+from tokenizer import index_terms, lemmatize
+from instrumentation import stage
+from clean import read_cleaned_dataset
 
 # Define input and output file paths
-input_file = "ExtractedCleanedColumns.csv"  # Replace with your input file path
-output_file = "Lexicon.csv"  # Replace with your desired output file path
-
-# Initialize lemmatizer and stop words
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('english'))
-
-# Function to clean and tokenize text
-def clean_and_tokenize(text):
-    if pd.isnull(text):
-        return []
-    # Remove punctuation except dots between words
-    text = re.sub(r'(?<!\S)\.(?!\S)', ' ', text)
-    text = re.sub(r'["!?,;:\[\]{}()<>]', '', text)
-    text = text.lower()  # Convert to lowercase
-    tokens = text.split()  # Split into words
-    return tokens
+input_file = "CleanedDataset.parquet"  # Replace with your input file path
+output_format = "csv"  # Use "binary" to write Lexicon.bin for memory-mapped loading
+output_file = "Lexicon.csv" if output_format == "csv" else "Lexicon.bin"  # Replace with your desired output file path
+
+# Function to add a word and its root to the lexicon, giving new roots the next IDs
+def add_to_lexicon(word_dict, word, current_id):
+    # A known word already had its root added the first time it was seen
+    if word in word_dict:
+        return current_id
+    root_word = lemmatize(word)
+
+    # Add root word if not already added
+    if root_word not in word_dict:
+        word_dict[root_word] = current_id
+        current_id += 1
+
+    # The actual word maps to the WordID of its root, so every surface form of a
+    # word shares the root's postings
+    word_dict[word] = word_dict[root_word]
+
+    return current_id
+
+# Function to save the lexicon sorted by word, as CSV or in the binary format
+def write_lexicon(word_dict, output_file, output_format="csv"):
+    if output_format == "binary":
+        write_binary_lexicon(word_dict, output_file)
+        return
+
+    # Convert the dictionary to a DataFrame and sort it
+    lexicon_df = pd.DataFrame(word_dict.items(), columns=['Word', 'Word ID'])
+    lexicon_df.sort_values(by='Word', inplace=True)
+
+    # Save to CSV
+    lexicon_df.to_csv(output_file, index=False)
+    print(f"Lexicon successfully saved to '{output_file}'.")
 
 # Process the dataset and build the lexicon
-def build_lexicon(input_file, output_file):
+def build_lexicon(input_file, output_file, output_format="csv"):
     try:
-        # Read the input CSV
-        df = pd.read_csv(input_file)
-        total_rows = len(df)
-
-        # Columns to process
-        columns_to_process = ['title', 'tags', 'authors', 'text']
-
-        # Dictionary to store unique words and their IDs
-        word_dict = {}
-        current_id = 1
-        processed_rows = 0
-
-        for col in columns_to_process:
-            if col in df.columns:
-                for text in df[col]:
-                    words = clean_and_tokenize(text)
-                    for word in words:
-                        if word not in stop_words:
-                            root_word = lemmatizer.lemmatize(word)
-
-                            # Add root word if not already added
-                            if root_word not in word_dict:
-                                word_dict[root_word] = current_id
-                                current_id += 1
-
-                            # Add the actual word if not already added
-                            if word not in word_dict:
-                                word_dict[word] = current_id
-                                current_id += 1
-                    
-                    # Track progress
-                    processed_rows += 1
-                    if processed_rows % 100 == 0:
-                        print(f"Processed {processed_rows}/{total_rows} rows...")
-
-        # Convert the dictionary to a DataFrame and sort it
-        lexicon_df = pd.DataFrame(word_dict.items(), columns=['Word', 'Word ID'])
-        lexicon_df.sort_values(by='Word', inplace=True)
-
-        # Save to CSV
-        lexicon_df.to_csv(output_file, index=False)
-        print(f"Lexicon successfully saved to '{output_file}'.")
+        with stage('lexicon') as trace:
+            # Columns to process
+            columns_to_process = ['title', 'tags', 'authors', 'text']
+
+            # Read only these columns of the cleaned dataset
+            with trace.timer('read'):
+                df = read_cleaned_dataset(input_file, columns_to_process)
+            total_rows = len(df)
+
+            # Dictionary to store unique words and their IDs
+            word_dict = {}
+            current_id = 1
+            processed_rows = 0
+            tokens = 0
+
+            with trace.timer('tokenize'):
+                for col in columns_to_process:
+                    if col in df.columns:
+                        for text in df[col]:
+                            words = index_terms(text)
+                            tokens += len(words)
+                            for word in words:
+                                current_id = add_to_lexicon(word_dict, word, current_id)
+
+                            # Track progress
+                            processed_rows += 1
+                            if processed_rows % 100 == 0:
+                                print(f"Processed {processed_rows}/{total_rows} rows...")
+            trace.count('documents', total_rows)
+            trace.count('tokens', tokens)
+            trace.count('words', len(word_dict))
+
+            with trace.timer('write'):
+                write_lexicon(word_dict, output_file, output_format)
 
     except Exception as e:
         print(f"An error occurred: {e}")
 
 # Execute the lexicon building
-build_lexicon(input_file, output_file)
+if __name__ == "__main__":
+    build_lexicon(input_file, output_file, output_format)
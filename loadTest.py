@@ -0,0 +1,122 @@
+import asyncio
+import json
+import random
+import time
+from urllib.parse import quote
+from autocomplete import read_document_frequencies
+from queryServer import autocomplete_files
+import query
+
+# Load-test client for queryServer.py. Opens a number of keep-alive connections
+# that send /search requests back to back and reports throughput and latency
+# percentiles. Queries come from a file (one per line) or are drawn from the
+# lexicon with probability proportional to each word's document frequency, so
+# frequent words dominate and the result cache sees head and tail queries as real
+# traffic would.
+
+HOST = '127.0.0.1'
+PORT = 8080
+CONNECTIONS = 32
+REQUESTS = 5000
+QUERIES_FILE = None  # Text file with one query per line; None samples the lexicon
+INDEX_FORMAT = query.INDEX_FORMAT  # Format the server runs; picks the files the lexicon is sampled from
+
+
+# Function to build the list of test queries
+def make_queries(queries_file=None, index_format=INDEX_FORMAT, count=1000, seed=42):
+    if queries_file:
+        with open(queries_file, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+    # The lexicon and inverted index the server's autocomplete reads for this format
+    frequencies = read_document_frequencies(*autocomplete_files(index_format))
+    words = sorted(frequencies)
+    weights = [frequencies[word] for word in words]
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(words, weights, k=rng.randint(1, 3))) for _ in range(count)]
+
+
+# Function to send one GET request on an open connection and return (status, body)
+async def fetch(reader, writer, path, host):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+# Function to run one client connection until the shared request budget is used up
+async def client(host, port, queries, budget, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while budget:
+            budget.pop()
+            path = "/search?q=" + quote(random.choice(queries))
+            start = time.perf_counter()
+            status, _ = await fetch(reader, writer, path, host)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+# Function to wait until the server reports that the index is loaded
+async def wait_until_ready(host, port, timeout=600):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            status, body = await fetch(reader, writer, "/ready", host)
+            writer.close()
+            if status == 200:
+                return json.loads(body)
+        except OSError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"server at {host}:{port} did not become ready")
+
+
+# Function to return the p-th percentile (0-100) of sorted values
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+# Function to run the load test and print/return its summary
+async def run_load_test(host=HOST, port=PORT, connections=CONNECTIONS, requests=REQUESTS, queries_file=QUERIES_FILE):
+    queries = make_queries(queries_file)
+    info = await wait_until_ready(host, port)
+    print(f"Server ready: {info}")
+
+    budget = list(range(requests))
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, queries, budget, latencies, errors) for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    summary = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+    print(json.dumps(summary, indent=2))
+    return summary
+
+
+if __name__ == "__main__":
+    asyncio.run(run_load_test())
@@ -0,0 +1,152 @@
+import os
+from collections import defaultdict
+from multiprocessing import Pool
+from lexicon import add_to_lexicon, write_lexicon
+from tokenizer import index_terms
+from forwardIndex import count_field_frequencies, field_weight, write_forward_index
+from invertedIndex import write_inverted_index, write_index_stats
+from binaryIndex import write_binary_forward_index, write_binary_inverted_index
+from clean import read_cleaned_dataset
+from snapshot import build_snapshot, snapshot_dir_of
+
+# Parallel index build. The cleaned corpus is split into chunks of consecutive
+# documents that a process pool works on in two rounds:
+#
+#   1. every worker lists the lexicon words of its chunk, per column, in the order
+#      they first appear; the merge walks the columns in lexicon.py order and the
+#      chunks in document order, so it hands out exactly the WordIDs a serial
+#      build_lexicon would
+#   2. with the merged lexicon, every worker counts the per-field word frequencies
+#      of its documents; chunks come back in document order and are appended, so
+#      the forward rows and the posting lists match the serial builders
+#
+# The files are written with the same functions as lexicon.py, forwardIndex.py and
+# invertedIndex.py, so the output is byte-identical to running them one by one.
+
+# Columns in the order build_lexicon visits them
+LEXICON_COLUMNS = ['title', 'tags', 'authors', 'text']
+
+# Number of documents handed to a worker at a time
+CHUNK_SIZE = 2000
+
+# Global lexicon of a worker process in the second round (set by _init_worker)
+_lexicon = None
+
+
+# Function to split the dataset into (first DocID, document count, {column: values}) chunks
+def split_into_chunks(dataset, chunk_size):
+    chunks = []
+    columns = [col for col in LEXICON_COLUMNS if col in dataset.columns]
+    for start in range(0, len(dataset), chunk_size):
+        part = dataset.iloc[start:start + chunk_size]
+        chunks.append((start, len(part), {col: part[col].tolist() for col in columns}))
+    return chunks
+
+
+# Function to list the lexicon words of one chunk per column, in first-seen order,
+# as (word, root) pairs
+def partial_lexicon(chunk):
+    _, _, columns = chunk
+    partial = {}
+    for col in LEXICON_COLUMNS:
+        if col in columns:
+            # Only the insertion order of the keys and which words share a root matter
+            # here; the global WordIDs are handed out during the merge
+            words = {}
+            current_id = 1
+            for text in columns[col]:
+                for word in index_terms(text):
+                    current_id = add_to_lexicon(words, word, current_id)
+            roots = {}
+            for word, word_id in words.items():
+                roots.setdefault(word_id, word)  # The root is the first word given its ID
+            partial[col] = [(word, roots[word_id]) for word, word_id in words.items()]
+    return partial
+
+
+# Function to merge the partial lexicons (in chunk order) and assign global WordIDs
+def merge_lexicons(partials):
+    word_dict = {}
+    current_id = 1
+    for col in LEXICON_COLUMNS:
+        for partial in partials:
+            for word, root in partial.get(col, []):
+                if word not in word_dict:
+                    # A surface form gets the WordID of its root, which is listed before it
+                    if root not in word_dict:
+                        word_dict[root] = current_id
+                        current_id += 1
+                    word_dict[word] = word_dict[root]
+    return word_dict
+
+
+def _init_worker(lexicon):
+    global _lexicon
+    _lexicon = lexicon
+
+
+# Function to count the per-field word frequencies of every document in one chunk
+def partial_index(chunk):
+    start, count, columns = chunk
+    documents = []
+    for offset in range(count):
+        title, tags, authors, text = (columns[col][offset] if col in columns else None
+                                      for col in ['title', 'tags', 'authors', 'text'])
+        documents.append(count_field_frequencies(title, tags, authors, text, _lexicon))
+    return start, documents
+
+
+# Function to build the lexicon, forward index and inverted index with a process pool
+def build_index_parallel(dataset_file, lexicon_file, forward_index_file, inverted_index_file, stats_file,
+                         workers=None, chunk_size=CHUNK_SIZE, output_format='csv', compress=False):
+    workers = workers or os.cpu_count()
+
+    print(f"Reading dataset from {dataset_file}...")
+    dataset = read_cleaned_dataset(dataset_file, LEXICON_COLUMNS)
+    total_documents = len(dataset)
+    chunks = split_into_chunks(dataset, chunk_size)
+    del dataset
+    print(f"Dataset split into {len(chunks)} chunks of up to {chunk_size} documents for {workers} workers.")
+
+    # Round 1: partial lexicons, merged into global WordIDs
+    with Pool(workers) as pool:
+        partials = pool.map(partial_lexicon, chunks)
+    lexicon = merge_lexicons(partials)
+    del partials
+    print(f"Lexicon merged with {len(lexicon)} words.")
+    write_lexicon(lexicon, lexicon_file, output_format)
+
+    # Round 2: per-document field frequencies, concatenated in DocID order
+    forward_index = []
+    inverted_index = defaultdict(list)
+    with Pool(workers, initializer=_init_worker, initargs=(lexicon,)) as pool:
+        for start, documents in pool.imap(partial_index, chunks):
+            for offset, frequencies in enumerate(documents):
+                doc_id = start + offset
+                weights = [(word_id, field_weight(counts)) for word_id, counts in frequencies]
+                forward_index.append([doc_id, weights, [counts for _, counts in frequencies]])
+                for word_id, weight in weights:
+                    inverted_index[word_id].append((doc_id, weight))
+            print(f"Indexed {len(forward_index)}/{total_documents} documents...")
+
+    if output_format == 'binary':
+        write_binary_forward_index(forward_index, forward_index_file)
+        write_binary_inverted_index(inverted_index, total_documents, inverted_index_file, compress)
+    else:
+        write_forward_index(forward_index, forward_index_file)
+        write_inverted_index(inverted_index, inverted_index_file)
+        write_index_stats(total_documents, stats_file)
+        build_snapshot(lexicon_file, inverted_index_file, stats_file, snapshot_dir_of(inverted_index_file))
+    print("Parallel index build finished.")
+
+
+dataset_file = 'CleanedDataset.parquet'
+output_format = 'csv'  # Use 'binary' to write the memory-mapped .bin files
+compress = False  # With 'binary', store the posting lists delta + variable-byte compressed
+lexicon_file = 'Lexicon.csv' if output_format == 'csv' else 'Lexicon.bin'
+forward_index_file = 'ForwardIndex.csv' if output_format == 'csv' else 'ForwardIndex.bin'
+inverted_index_file = 'InvertedIndex.csv' if output_format == 'csv' else 'InvertedIndex.bin'
+stats_file = 'IndexStats.csv'
+if __name__ == "__main__":
+    build_index_parallel(dataset_file, lexicon_file, forward_index_file, inverted_index_file, stats_file,
+                         output_format=output_format, compress=compress)
@@ -0,0 +1,177 @@
+import csv
+import heapq
+import os
+import shutil
+import tempfile
+import pandas as pd
+from array import array
+from clean import clean_chunk
+from lexicon import add_to_lexicon, write_lexicon
+from tokenizer import index_terms
+from forwardIndex import field_weight, forward_index_row
+from invertedIndex import write_index_stats
+from docStore import DocumentStoreWriter, STORE_FIELDS
+from instrumentation import start_trace, finish_trace
+from snapshot import build_snapshot, snapshot_dir_of
+
+# Streaming build pipeline: one pass over the raw dataset that cleans it chunk by
+# chunk, tokenizes every document once and emits the lexicon, forward index,
+# inverted index and document store from that single token stream.
+#
+# Only the vocabulary and a bounded buffer of postings stay in memory. Forward
+# index rows and document store rows are written as soon as a document is done;
+# postings are buffered and, whenever the buffer reaches memory_limit, spilled to
+# disk as a run sorted by WordID. The runs are merged into InvertedIndex.csv at the
+# end (each WordID's postings concatenated in run order, which is DocID order).
+#
+# WordIDs are handed out in the order words first appear in the document stream
+# (title, authors, tags, text of each document), so they differ from the IDs of the
+# column-by-column lexicon.py build; the files have the same formats either way.
+
+# Fields counted for the forward index, in the order of the weight counts
+FIELD_COLUMNS = ['title', 'authors', 'tags', 'text']
+
+# Number of dataset rows read and cleaned at a time
+CHUNK_SIZE = 5000
+
+# Approximate memory allowed for buffered postings before a run is spilled (bytes)
+MEMORY_LIMIT = 512 * 1024 * 1024
+
+# Estimated cost of one buffered posting (two array items) and of one buffered word
+POSTING_BYTES = 8
+WORD_BYTES = 250
+
+# Run rows of frequent words hold thousands of postings
+csv.field_size_limit(10000000)
+
+
+# Function to tokenize one (cleaned) document once, growing the lexicon and
+# counting the title/authors/tags/text frequencies of each of its words
+def index_document(record, word_dict, current_id):
+    word_count = {}  # WordID -> per-field counts (surface forms count towards their root)
+    for field, col in enumerate(FIELD_COLUMNS):
+        for word in index_terms(record.get(col)):
+            current_id = add_to_lexicon(word_dict, word, current_id)
+            word_id = word_dict[word]
+            if word_id not in word_count:
+                word_count[word_id] = [0, 0, 0, 0]
+            word_count[word_id][field] += 1
+
+    frequencies = [(word_id, tuple(counts)) for word_id, counts in word_count.items()]
+    return frequencies, current_id
+
+
+# Function to spill the buffered postings to a run file sorted by WordID
+def spill_run(buffer, run_dir, run_number):
+    run_file = os.path.join(run_dir, f"run_{run_number}.csv")
+    with open(run_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        for word_id in sorted(buffer):
+            doc_ids, weights = buffer[word_id]
+            writer.writerow([word_id, max(weights), ",".join(f"{doc_id}:{weight}" for doc_id, weight in zip(doc_ids, weights))])
+    print(f"Spilled run {run_number} with {len(buffer)} words to {run_file}.")
+    return run_file
+
+
+# Function to read a run file as (WordID, run number, MaxWeight, Postings) rows
+def read_run(run_file, run_number):
+    with open(run_file, 'r', encoding='utf-8') as f:
+        for word_id, max_weight, postings in csv.reader(f):
+            yield int(word_id), run_number, int(max_weight), postings
+
+
+# Function to merge the sorted runs into the final inverted index
+def merge_runs(run_files, output_file):
+    print(f"Merging {len(run_files)} runs into {output_file}...")
+    runs = [read_run(run_file, run_number) for run_number, run_file in enumerate(run_files)]
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["WordID", "MaxWeight", "Postings"])  # Header
+        current_id, current_max, current_postings = None, 0, []
+        # Rows come out ordered by WordID and, for equal WordIDs, by run number
+        for word_id, _, max_weight, postings in heapq.merge(*runs):
+            if word_id != current_id:
+                if current_id is not None:
+                    writer.writerow([current_id, current_max, ",".join(current_postings)])
+                current_id, current_max, current_postings = word_id, 0, []
+            current_max = max(current_max, max_weight)
+            current_postings.append(postings)
+        if current_id is not None:
+            writer.writerow([current_id, current_max, ",".join(current_postings)])
+    print(f"Inverted index saved to {output_file}.")
+
+
+# Function to build every index file from the raw dataset in one bounded-memory pass
+def build_index_streaming(dataset_file, lexicon_file, forward_index_file, inverted_index_file, stats_file,
+                          store_file, offsets_file, chunk_size=CHUNK_SIZE, memory_limit=MEMORY_LIMIT,
+                          max_rows=None):
+    trace = start_trace('pipeline')
+    word_dict = {}
+    current_id = 1
+    total_documents = 0
+
+    buffer = {}  # WordID -> (DocIDs, weights)
+    buffered_postings = 0
+    run_dir = tempfile.mkdtemp(prefix='index_runs_', dir=os.path.dirname(os.path.abspath(inverted_index_file)))
+    run_files = []
+
+    # The runs can take gigabytes, so they are removed even if the build fails
+    try:
+        columns = pd.read_csv(dataset_file, nrows=0).columns
+        store = DocumentStoreWriter(store_file, offsets_file, [field for field in STORE_FIELDS if field in columns])
+
+        with open(forward_index_file, 'w', newline='') as forward_file:
+            forward_writer = csv.writer(forward_file)
+            forward_writer.writerow(["DocID", "Details", "FieldFreqs"])  # Header
+
+            for chunk in pd.read_csv(dataset_file, nrows=max_rows, chunksize=chunk_size):
+                chunk = clean_chunk(chunk)
+                for record in chunk.to_dict('records'):
+                    doc_id = total_documents
+                    total_documents += 1
+                    store.add(record)
+
+                    frequencies, current_id = index_document(record, word_dict, current_id)
+                    weights = [(word_id, field_weight(counts)) for word_id, counts in frequencies]
+                    forward_writer.writerow(forward_index_row(doc_id, weights, [counts for _, counts in frequencies]))
+
+                    for word_id, weight in weights:
+                        if word_id not in buffer:
+                            buffer[word_id] = (array('I'), array('I'))
+                        doc_ids, word_weights = buffer[word_id]
+                        doc_ids.append(doc_id)
+                        word_weights.append(weight)
+                    buffered_postings += len(weights)
+
+                    # Spill a sorted run once the buffer reaches the memory limit
+                    if buffered_postings * POSTING_BYTES + len(buffer) * WORD_BYTES >= memory_limit:
+                        run_files.append(spill_run(buffer, run_dir, len(run_files)))
+                        buffer = {}
+                        buffered_postings = 0
+
+                print(f"Processed {total_documents} documents, lexicon has {len(word_dict)} words...")
+
+        if buffer:
+            run_files.append(spill_run(buffer, run_dir, len(run_files)))
+            buffer = {}
+        store.close()
+
+        with trace.timer('merge'):
+            merge_runs(run_files, inverted_index_file)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+    write_lexicon(word_dict, lexicon_file)
+    write_index_stats(total_documents, stats_file)
+    with trace.timer('snapshot'):
+        build_snapshot(lexicon_file, inverted_index_file, stats_file, snapshot_dir_of(inverted_index_file))
+    trace.count('documents', total_documents)
+    trace.count('words', len(word_dict))
+    trace.count('runs', len(run_files))
+    finish_trace(trace)
+    print(f"Streaming build finished: {total_documents} documents, {len(word_dict)} words.")
+
+
+dataset_file = 'Dataset.csv'
+if __name__ == "__main__":
+    build_index_streaming(dataset_file, 'Lexicon.csv', 'ForwardIndex.csv', 'InvertedIndex.csv', 'IndexStats.csv',
+                          'DocStore.csv', 'DocStore.offsets')
@@ -0,0 +1,279 @@
+import heapq
+from bisect import bisect_left
+from itertools import accumulate
+from collections import defaultdict
+from forwardIndex import read_lexicon, read_dataset
+from binaryIndex import HEADER, MAGIC_POSITIONS, FORMAT_VERSION, MappedFile, _align, _write_array
+from postings import encode_varints, decode_varints, read_varints
+from topK import score_candidates
+from tokenizer import tokenize, STOP_WORDS
+from instrumentation import stage, NULL_TRACE
+
+# Positional index for phrase and proximity queries, kept in its own file
+# (Positions.bin) so ordinary bag-of-words queries never read it.
+#
+# A document's positions count every token of its title, authors, tags and text in
+# that order (stop words included, so "state of the art" keeps its gaps), with
+# FIELD_GAP unused positions between fields so a phrase never spans two fields.
+#
+# Blob of one term, all numbers variable-byte encoded (see postings.py):
+#   documents | document section bytes | (DocID gap, position bytes) per document |
+#   positions
+# where the positions of each document are stored as gaps from the previous one.
+# The document section is decoded like a posting list; the positions of a document
+# are only decoded when a phrase or proximity check reaches that document. Most
+# gaps are below 128 and fit one byte, and a section made only of such bytes is
+# decoded with itertools.accumulate instead of the byte-by-byte varint loop.
+
+# Unused positions between two fields of a document
+FIELD_GAP = 100
+
+# Fields in position order
+FIELD_COLUMNS = ['title', 'authors', 'tags', 'text']
+
+# Proximity boost: candidates re-ranked per result and the weight of the boost
+PROXIMITY_CANDIDATES = 10
+PROXIMITY_WEIGHT = 0.5
+
+
+# Function to list the positions of every lexicon word in one document
+def document_positions(fields, lexicon):
+    positions = defaultdict(list)
+    base = 0
+    for text in fields:
+        tokens = tokenize(text)
+        for offset, word in enumerate(tokens):
+            if word not in STOP_WORDS:
+                word_id = lexicon.get(word)
+                if word_id is not None:
+                    positions[word_id].append(base + offset)
+        base += len(tokens) + FIELD_GAP
+    return positions
+
+
+# Function to build Positions.bin from the cleaned dataset (DocIDs are row numbers,
+# as in the forward index)
+def build_positional_index(dataset_file, lexicon_file, output_file):
+    with stage('positionalIndex') as trace:
+        with trace.timer('read'):
+            lexicon = read_lexicon(lexicon_file)
+            dataset = read_dataset(dataset_file)
+        print("Generating positional index...")
+
+        # WordID -> [document count, last DocID, document section, position section]
+        terms = {}
+        positions_stored = 0
+        with trace.timer('index'):
+            for doc_id, row in dataset.iterrows():
+                fields = [row[col] for col in FIELD_COLUMNS]
+                for word_id, positions in document_positions(fields, lexicon).items():
+                    term = terms.get(word_id)
+                    if term is None:
+                        term = terms[word_id] = [0, 0, bytearray(), bytearray()]
+                    encoded = bytearray()
+                    encode_varints([positions[0]] + [b - a for a, b in zip(positions, positions[1:])], encoded)
+                    encode_varints([doc_id - term[1], len(encoded)], term[2])
+                    term[3] += encoded
+                    term[0] += 1
+                    term[1] = doc_id
+                    positions_stored += len(positions)
+                if doc_id % 1000 == 0:
+                    print(f"Processed {doc_id} documents...")
+        trace.count('positions', positions_stored)
+
+        with trace.timer('write'):
+            write_positional_index(terms, len(dataset), output_file)
+
+
+# Function to write the encoded terms to the binary file
+def write_positional_index(terms, total_documents, output_file):
+    word_ids = sorted(terms)
+    offsets = [0]
+    blobs = []
+    for word_id in word_ids:
+        documents, _, document_section, position_section = terms[word_id]
+        blob = bytearray()
+        encode_varints([documents, len(document_section)], blob)
+        blob += document_section
+        blob += position_section
+        blobs.append(blob)
+        offsets.append(offsets[-1] + len(blob))
+
+    with open(output_file, 'wb') as f:
+        f.write(HEADER.pack(MAGIC_POSITIONS, FORMAT_VERSION, 0, 0, len(word_ids), offsets[-1], total_documents))
+        _write_array(f, 'I', word_ids)
+        _write_array(f, 'Q', offsets)
+        for blob in blobs:
+            f.write(blob)
+        _align(f)
+    print(f"Positional index saved to {output_file}.")
+
+
+# Function to decode a section of variable-byte gaps into the running sums
+def _decode_gaps(section):
+    section = bytes(section)
+    if section.isascii():  # Every value fits one byte
+        return list(accumulate(section))
+    return list(accumulate(decode_varints(section)))
+
+
+class TermPositions:
+    """Documents of one term with on-demand access to their position lists."""
+
+    def __init__(self, data, start):
+        (_, size), position = read_varints(data, start, 2)
+        section = bytes(data[position:position + size])
+        values = list(section) if section.isascii() else decode_varints(section)
+        self.doc_ids = list(accumulate(values[0::2]))
+        self._starts = list(accumulate(values[1::2], initial=position + size))
+        self._data = data
+
+    # Function to return the positions of the term in one document (empty if absent)
+    def get(self, doc_id):
+        i = bisect_left(self.doc_ids, doc_id)
+        if i == len(self.doc_ids) or self.doc_ids[i] != doc_id:
+            return []
+        return _decode_gaps(self._data[self._starts[i]:self._starts[i + 1]])
+
+
+class PositionalIndex:
+    """Mapping WordID -> TermPositions over a memory-mapped Positions.bin."""
+
+    def __init__(self, path):
+        self._file = MappedFile(path, MAGIC_POSITIONS)
+        num_terms, blob_size, self.num_documents = self._file.counts
+        self._word_ids = self._file.next_array('I', num_terms)
+        self._offsets = self._file.next_array('Q', num_terms + 1)
+        self._blob = self._file.next_bytes(blob_size)
+        self._num_terms = num_terms
+
+    def get(self, word_id, default=None):
+        i = bisect_left(self._word_ids, word_id)
+        if i == self._num_terms or self._word_ids[i] != word_id:
+            return default
+        return TermPositions(self._blob, self._offsets[i])
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Function to intersect sorted DocID lists, rarest first, with binary-search skips
+def intersect_documents(doc_id_lists):
+    doc_id_lists = sorted(doc_id_lists, key=len)
+    result = []
+    starts = [0] * len(doc_id_lists)
+    for doc_id in doc_id_lists[0]:
+        for i in range(1, len(doc_id_lists)):
+            others = doc_id_lists[i]
+            starts[i] = bisect_left(others, doc_id, starts[i])
+            if starts[i] == len(others) or others[starts[i]] != doc_id:
+                break
+        else:
+            result.append(doc_id)
+    return result
+
+
+# Function to load the terms of a phrase, given as [(offset in phrase, WordID)];
+# returns [(TermPositions, offset)] rarest term first, or None if a word has no positions
+def phrase_terms(phrase, positional_index, loaded):
+    terms = []
+    for offset, word_id in phrase:
+        if word_id not in loaded:
+            loaded[word_id] = positional_index.get(word_id)
+        if loaded[word_id] is None:
+            return None
+        terms.append((loaded[word_id], offset))
+    terms.sort(key=lambda entry: len(entry[0].doc_ids))
+    return terms
+
+
+# Function to check whether a phrase occurs in a document by intersecting the phrase
+# start positions implied by each of its terms
+def phrase_occurs(terms, doc_id):
+    starts = None
+    decoded = {}
+    for term, offset in terms:
+        positions = decoded.get(id(term))
+        if positions is None:
+            positions = decoded[id(term)] = term.get(doc_id)
+        implied = {position - offset for position in positions}
+        starts = implied if starts is None else starts & implied
+        if not starts:
+            return False
+    return True
+
+
+# Function to rank the documents that contain every phrase by the TF-IDF score of
+# all query terms. The documents holding every phrase word are scored first (cheap
+# cursor seeks) and the phrases are then verified in score order until k documents
+# pass, so frequent phrases decode the positions of only a few documents.
+def top_k_phrase(query_terms, phrases, positional_index, k, trace=NULL_TRACE):
+    loaded = {}
+    all_terms = []
+    for phrase in phrases:
+        terms = phrase_terms(phrase, positional_index, loaded)
+        if terms is None:
+            return []
+        all_terms.append(terms)
+    candidates = intersect_documents([term.doc_ids for term in loaded.values()])
+
+    ranked = [(-score, doc_id) for doc_id, score in score_candidates(query_terms, candidates)]
+    heapq.heapify(ranked)
+
+    top = []
+    checked = 0
+    while ranked and len(top) < k:
+        score, doc_id = heapq.heappop(ranked)
+        checked += 1
+        if all(phrase_occurs(terms, doc_id) for terms in all_terms):
+            top.append((doc_id, -score))
+    trace.count('candidates', len(candidates))
+    trace.count('phrase_checks', checked)
+    return top
+
+
+# Function to return the span of the smallest window holding one position of every list
+def minimum_window(position_lists):
+    heap = [(positions[0], i, 0) for i, positions in enumerate(position_lists)]
+    heapq.heapify(heap)
+    high = max(position for position, _, _ in heap)
+    best = high - heap[0][0]
+    while True:
+        low, i, j = heapq.heappop(heap)
+        best = min(best, high - low)
+        if j + 1 == len(position_lists[i]):
+            return best
+        position = position_lists[i][j + 1]
+        high = max(high, position)
+        heapq.heappush(heap, (position, i, j + 1))
+
+
+# Function to re-rank scored documents, boosting those where the query terms occur
+# close together: score * (1 + PROXIMITY_WEIGHT * (terms - 1) / window span), so
+# adjacent terms get the full boost
+def proximity_rerank(query_terms, ranked, positional_index, k):
+    word_ids = list(dict.fromkeys(term.word_id for term in query_terms))
+    terms = [positional_index.get(word_id) for word_id in word_ids]
+    terms = [term for term in terms if term is not None]
+
+    reranked = []
+    for doc_id, score in ranked:
+        position_lists = [positions for positions in (term.get(doc_id) for term in terms) if positions]
+        if len(position_lists) >= 2:
+            span = minimum_window(position_lists)
+            score *= 1 + PROXIMITY_WEIGHT * (len(position_lists) - 1) / max(span, 1)
+        reranked.append((doc_id, score))
+    return heapq.nsmallest(k, reranked, key=lambda x: (-x[1], x[0]))
+
+
+dataset_file = 'CleanedDataset.parquet'
+lexicon_file = 'Lexicon.csv'
+output_file = 'Positions.bin'
+if __name__ == "__main__":
+    build_positional_index(dataset_file, lexicon_file, output_file)
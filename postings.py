@@ -0,0 +1,380 @@
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import accumulate
+
+# A posting list as returned by every inverted index reader: parallel DocID and
+# weight sequences sorted by DocID, plus the largest weight in the list (stored
+# at build time so query evaluation can bound a term's score without scanning it).
+Postings = namedtuple('Postings', ['doc_ids', 'weights', 'max_weight'])
+
+# DocID reported by a cursor that has run past the end of its posting list
+END_OF_POSTINGS = 2 ** 63
+
+
+class PostingCursor:
+    """Forward-only cursor over one posting list with galloping seek."""
+
+    def __init__(self, postings):
+        self.doc_ids = postings.doc_ids
+        self.weights = postings.weights
+        self.size = len(self.doc_ids)
+        self.position = 0
+        self.doc = self.doc_ids[0] if self.size else END_OF_POSTINGS
+
+    def weight(self):
+        return self.weights[self.position]
+
+    # Function to move to the next posting
+    def next(self):
+        self.position += 1
+        self.doc = self.doc_ids[self.position] if self.position < self.size else END_OF_POSTINGS
+        return self.doc
+
+    # Function to move to the first posting with DocID >= target
+    def seek(self, target):
+        if self.doc >= target:
+            return self.doc
+        # Gallop forward to find a window containing the target, then binary search it
+        lo = self.position + 1
+        step = 1
+        hi = lo
+        while hi < self.size and self.doc_ids[hi] < target:
+            lo = hi + 1
+            hi += step
+            step *= 2
+        self.position = bisect_left(self.doc_ids, target, lo, min(hi, self.size))
+        self.doc = self.doc_ids[self.position] if self.position < self.size else END_OF_POSTINGS
+        return self.doc
+
+    # Function to return the DocIDs and weights of the postings before target and
+    # move to the first posting with DocID >= target
+    def take_until(self, target):
+        start = self.position
+        self.seek(target)
+        return self.doc_ids[start:self.position], self.weights[start:self.position]
+
+
+# Compressed posting lists. DocIDs are stored as gaps (delta-encoded) and both the
+# gaps and the weights are written as variable-byte integers, 7 bits per byte with
+# the high bit marking "more bytes follow". The list is cut into blocks of
+# block_size postings; per block the last DocID and the byte offset are kept
+# uncompressed, so a cursor can skip whole blocks without decoding them.
+#
+# Block layout: varint gaps[count] | varint weights[count], where the first gap of
+# a block is taken from the last DocID of the previous block (or from 0).
+#
+# Blocks are decoded in bulk: most gaps and weights are below 128 and take a single
+# byte, and a block made only of such bytes is its own list of values, so it skips
+# the byte-by-byte varint loop; the DocIDs are then summed with itertools.accumulate.
+
+# Default number of postings per compressed block
+BLOCK_SIZE = 128
+
+# Posting lists of up to this many postings are not worth compressing: the blocks
+# cost more than the postings, so parse_postings keeps them as plain tuples
+SMALL_LIST_SIZE = 4
+
+
+# Function to append the variable-byte encoding of non-negative integers to a bytearray
+def encode_varints(values, out):
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+
+# Function to decode every variable-byte integer in a byte sequence
+def decode_varints(data):
+    values = []
+    value = 0
+    shift = 0
+    for byte in data:
+        if byte & 0x80:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        else:
+            values.append(value | (byte << shift))
+            value = 0
+            shift = 0
+    return values
+
+
+# Function to decode count variable-byte integers starting at data[start]; returns
+# (values, offset just past the last one)
+def read_varints(data, start, count):
+    values = []
+    value = 0
+    shift = 0
+    position = start
+    while len(values) < count:
+        byte = data[position]
+        position += 1
+        if byte & 0x80:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        else:
+            values.append(value | (byte << shift))
+            value = 0
+            shift = 0
+    return values, position
+
+
+# Function to encode a posting list; returns (data, last DocID per block, byte
+# offset of each block plus the end offset)
+def encode_postings(doc_ids, weights, block_size=BLOCK_SIZE):
+    data = bytearray()
+    last_docs = array('I')
+    offsets = array('Q', [0])
+    previous = 0
+    for start in range(0, len(doc_ids), block_size):
+        block_docs = doc_ids[start:start + block_size]
+        gaps = []
+        for doc_id in block_docs:
+            gaps.append(doc_id - previous)
+            previous = doc_id
+        encode_varints(gaps, data)
+        encode_varints(weights[start:start + block_size], data)
+        last_docs.append(previous)
+        offsets.append(len(data))
+    return bytes(data), last_docs, offsets
+
+
+class CompressedPostings:
+    """Posting list kept delta + variable-byte encoded and decoded one block at a time.
+
+    data holds the encoded blocks, last_docs the last DocID of each block and
+    offsets the start of each block in data (plus the end of the last block).
+    """
+
+    # Most terms have short lists, so the per-object overhead matters
+    __slots__ = ('data', 'last_docs', 'offsets', 'count', 'max_weight', 'block_size')
+
+    def __init__(self, data, last_docs, offsets, count, max_weight, block_size=BLOCK_SIZE):
+        self.data = data
+        self.last_docs = last_docs
+        self.offsets = offsets
+        self.count = count
+        self.max_weight = max_weight
+        self.block_size = block_size
+
+    @classmethod
+    def from_lists(cls, doc_ids, weights, max_weight, block_size=BLOCK_SIZE):
+        data, last_docs, offsets = encode_postings(doc_ids, weights, block_size)
+        return cls(data, last_docs, offsets, len(doc_ids), max_weight, block_size)
+
+    def __len__(self):
+        return self.count
+
+    def num_blocks(self):
+        return len(self.last_docs)
+
+    # Function to decode one block into (DocIDs, weights)
+    def decode_block(self, block):
+        size = min(self.block_size, self.count - block * self.block_size)
+        encoded = bytes(self.data[self.offsets[block]:self.offsets[block + 1]])
+        values = list(encoded) if encoded.isascii() else decode_varints(encoded)
+        gaps = values[:size]
+        if block > 0:
+            gaps[0] += self.last_docs[block - 1]
+        return list(accumulate(gaps)), values[size:]
+
+    # Full decodes, for code that needs the plain lists
+    @property
+    def doc_ids(self):
+        doc_ids = []
+        for block in range(self.num_blocks()):
+            doc_ids += self.decode_block(block)[0]
+        return doc_ids
+
+    @property
+    def weights(self):
+        weights = []
+        for block in range(self.num_blocks()):
+            weights += self.decode_block(block)[1]
+        return weights
+
+    def cursor(self):
+        return BlockCursor(self)
+
+
+class BlockCursor:
+    """PostingCursor counterpart for compressed lists: decodes a block only when the
+    cursor lands in it, and seek skips blocks using their last DocIDs."""
+
+    def __init__(self, postings):
+        self.postings = postings
+        self.num_blocks = postings.num_blocks()
+        self.block = -1
+        self._load(0)
+
+    def _load(self, block):
+        self.block = block
+        if block < self.num_blocks:
+            self.block_docs, self.block_weights = self.postings.decode_block(block)
+            self.position = 0
+            self.doc = self.block_docs[0]
+        else:
+            self.block_docs, self.block_weights = [], []
+            self.position = 0
+            self.doc = END_OF_POSTINGS
+
+    def weight(self):
+        return self.block_weights[self.position]
+
+    # Function to move to the next posting
+    def next(self):
+        self.position += 1
+        if self.position < len(self.block_docs):
+            self.doc = self.block_docs[self.position]
+        else:
+            self._load(self.block + 1)
+        return self.doc
+
+    # Function to move to the first posting with DocID >= target
+    def seek(self, target):
+        if self.doc >= target:
+            return self.doc
+        if target > self.postings.last_docs[self.block]:
+            # Skip the blocks that end before the target without decoding them
+            self._load(bisect_left(self.postings.last_docs, target, self.block + 1, self.num_blocks))
+            if self.doc >= target:
+                return self.doc
+        self.position = bisect_left(self.block_docs, target, self.position + 1)
+        self.doc = self.block_docs[self.position]
+        return self.doc
+
+    # Function to return the DocIDs and weights of the postings before target and
+    # move to the first posting with DocID >= target
+    def take_until(self, target):
+        doc_ids = []
+        weights = []
+        while self.doc < target:
+            end = bisect_left(self.block_docs, target, self.position)
+            doc_ids += self.block_docs[self.position:end]
+            weights += self.block_weights[self.position:end]
+            if end < len(self.block_docs):
+                self.position = end
+                self.doc = self.block_docs[end]
+            else:
+                self._load(self.block + 1)
+        return doc_ids, weights
+
+
+class ChainedPostings:
+    """Posting list made of parts whose DocID ranges are disjoint and ascending, e.g.
+    the main index list followed by the lists of later index segments.
+
+    The parts are kept as they are (mapped views, compressed blocks), so a cursor
+    gallops within a part and seek skips whole parts using their last DocIDs.
+    """
+
+    __slots__ = ('parts', 'last_docs', 'count', 'max_weight')
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.last_docs = [part.last_docs[-1] if isinstance(part, CompressedPostings) else part.doc_ids[-1]
+                          for part in parts]
+        self.count = sum(posting_count(part) for part in parts)
+        self.max_weight = max(part.max_weight for part in parts)
+
+    def __len__(self):
+        return self.count
+
+    # Full concatenations, for code that needs the plain lists
+    @property
+    def doc_ids(self):
+        doc_ids = []
+        for part in self.parts:
+            doc_ids += part.doc_ids
+        return doc_ids
+
+    @property
+    def weights(self):
+        weights = []
+        for part in self.parts:
+            weights += part.weights
+        return weights
+
+    def cursor(self):
+        return ChainedCursor(self)
+
+
+class ChainedCursor:
+    """Cursor over ChainedPostings: runs the cursor of each part in turn."""
+
+    def __init__(self, postings):
+        self.last_docs = postings.last_docs
+        self.cursors = [open_cursor(part) for part in postings.parts]
+        self.part = 0
+        self.doc = self.cursors[0].doc
+
+    def weight(self):
+        return self.cursors[self.part].weight()
+
+    # Function to move to the next posting
+    def next(self):
+        self.doc = self.cursors[self.part].next()
+        if self.doc == END_OF_POSTINGS and self.part + 1 < len(self.cursors):
+            self.part += 1
+            self.doc = self.cursors[self.part].doc
+        return self.doc
+
+    # Function to move to the first posting with DocID >= target
+    def seek(self, target):
+        if self.doc >= target:
+            return self.doc
+        # Skip the parts that end before the target; the one reached has not moved yet
+        # unless it is the current part
+        self.part = bisect_left(self.last_docs, target, self.part)
+        if self.part == len(self.cursors):
+            self.part -= 1
+            self.doc = END_OF_POSTINGS
+        else:
+            self.doc = self.cursors[self.part].seek(target)
+        return self.doc
+
+    # Function to return the DocIDs and weights of the postings before target and
+    # move to the first posting with DocID >= target
+    def take_until(self, target):
+        doc_ids = []
+        weights = []
+        while self.doc < target:
+            part_docs, part_weights = self.cursors[self.part].take_until(target)
+            doc_ids += part_docs
+            weights += part_weights
+            self.doc = self.cursors[self.part].doc
+            if self.doc == END_OF_POSTINGS and self.part + 1 < len(self.cursors):
+                self.part += 1
+                self.doc = self.cursors[self.part].doc
+        return doc_ids, weights
+
+
+# Function to open the right cursor for plain, compressed or chained postings
+def open_cursor(postings):
+    if isinstance(postings, (CompressedPostings, ChainedPostings)):
+        return postings.cursor()
+    return PostingCursor(postings)
+
+
+# Function to count the documents in plain, compressed or chained postings
+def posting_count(postings):
+    if isinstance(postings, (CompressedPostings, ChainedPostings)):
+        return postings.count
+    return len(postings.doc_ids)
+
+
+# Function to parse the "DocID:Weight,DocID:Weight,..." postings of an InvertedIndex.csv row
+def parse_postings(text, max_weight, compress=False):
+    doc_ids = []
+    weights = []
+    for posting in text.split(','):
+        doc_id, weight = posting.split(':')
+        doc_ids.append(int(doc_id))
+        weights.append(int(weight))
+    if compress:
+        if len(doc_ids) <= SMALL_LIST_SIZE:
+            return Postings(tuple(doc_ids), tuple(weights), max_weight)
+        return CompressedPostings.from_lists(doc_ids, weights, max_weight)
+    return Postings(doc_ids, weights, max_weight)
@@ -1,153 +1,503 @@
 import csv
+import os
+import threading
+import time
+from collections import Counter
 from math import log10
+from binaryIndex import BinaryLexicon, BinaryInvertedIndex, read_compact_lexicon
+from postings import parse_postings, posting_count
+from topK import QueryTerm, top_k_exhaustive, top_k_maxscore, top_k_candidates
+from docStore import DocumentStore
+from queryCache import QueryCache, normalize_query, normalize_phrases, normalize_boolean, index_generation
+from instrumentation import start_trace, finish_trace
+from tokenizer import query_words, query_phrases
+from barrels import BarrelIndex
+from segments import SegmentedIndex
+from positionalIndex import (PositionalIndex, PROXIMITY_CANDIDATES, top_k_phrase,
+                             proximity_rerank)
+from fieldIndex import FieldIndex
+from booleanQuery import (is_boolean_query, parse_boolean_query, expand_words, positive_words,
+                          evaluate_boolean_query)
+from spelling import SpellingIndex
+from snapshot import load_snapshot, build_snapshot_in_background, SNAPSHOT_DIR
 
 # Increase CSV field size limit
 # Increase field size limit to handle large files
 csv.field_size_limit(10000000)  
 
-# List of stop words to filter out
-STOP_WORDS = {
-    "a", "an", "the", "is", "am", "are", "and", "or", "of", "on", "in", "to", 
-    "with", "for", "from", "by", "it", "this", "that", "was", "were", "has", 
-    "have", "had", "be", "not", "as", "at", "but"
-}
+# Index format to load: 'csv' parses the CSV files into dicts, 'binary' memory-maps
+# Lexicon.bin and InvertedIndex.bin so posting lists are read as zero-copy views,
+# 'barrels' loads only the WordID-range barrels that queries touch (see barrels.py),
+# 'lazy' maps a startup snapshot of the CSV index and parses each posting list the
+# first time a query needs it (see snapshot.py), so queries are accepted right away
+# (until an out-of-date snapshot has been rebuilt, the CSV index is loaded instead)
+INDEX_FORMAT = 'csv'
 
-# Function to read the lexicon
+# Queries entered in main are appended to QUERY_LOG_FILE (None to disable). At
+# startup the posting lists of the WARMUP_TERMS most frequent terms of its last
+# WARMUP_LOG_QUERIES queries are loaded in the background (0 disables warm-up).
+# Once the log grows past QUERY_LOG_MAX_BYTES it is cut back to those queries.
+QUERY_LOG_FILE = 'QueryLog.txt'
+WARMUP_TERMS = 1000
+WARMUP_LOG_QUERIES = 10000
+QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+
+# Keep the CSV posting lists delta + variable-byte compressed in memory (see
+# postings.py), at the cost of decoding blocks per query. The saving depends on
+# the list lengths: 164 MB -> 28 MB for 20K synthetic documents, but only about
+# 30% on a small index of mostly one-document words, where per-term overhead dominates.
+# Queries get slower: ranking four lists of 100K, 30K, 5K and 500 postings took
+# 28 ms plain vs 40 ms compressed exhaustively, 7 ms vs 9 ms with MaxScore. So
+# compression stays off unless memory is the constraint
+COMPRESS_POSTINGS = False
+
+# Memory budget for loaded barrels when INDEX_FORMAT is 'barrels' (bytes)
+BARREL_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Memory budget for the posting lists parsed when INDEX_FORMAT is 'lazy' (bytes)
+LAZY_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Number of results returned per query
+TOP_K = 5
+
+# Top-k strategies: 'exhaustive' scores every document of the query terms' posting
+# lists, 'maxscore' skips documents that cannot reach the top k. Both return the same
+# ranking, and MaxScore only prunes lists longer than MAXSCORE_MIN_POSTINGS, so short
+# queries cost the same either way. On benchmark.py's 10K-document corpus MaxScore
+# answers 375 vs 289 head queries/s (p99 7.0 vs 10.0 ms), 13.8K vs 10.3K torso and
+# 24.4K vs 23.3K tail queries/s, so it is the default
+STRATEGIES = ('exhaustive', 'maxscore')
+STRATEGY = 'maxscore'
+
+# Positional index (built by positionalIndex.py) used for quoted phrases and, if
+# PROXIMITY_BOOST is on, to favour documents where the query terms occur close together
+POSITIONS_FILE = 'Positions.bin'
+PROXIMITY_BOOST = True
+PHRASE_WARNING = ("Phrase search needs the positional index, which is not loaded; "
+                  "the quoted words are matched anywhere in the documents.")
+
+# Ranking function: 'tfidf' scores the field-weighted term frequencies of the
+# inverted index, 'bm25f' uses the per-field frequencies and document lengths of
+# FieldIndex.bin (built by fieldIndex.py, boosts and parameters set there)
+RANKING = 'tfidf'
+FIELDS_FILE = 'FieldIndex.bin'
+
+# Spelling index (built by spelling.py) used to correct query words that are not in
+# the lexicon. Each such word is replaced by its FUZZY_EXPANSIONS closest spellings
+# (1 keeps only the best correction, more also searches the next closest words)
+SPELLING_FILE = 'Spelling.bin'
+SPELL_CORRECTION = True
+FUZZY_EXPANSIONS = 1
+
+# Result cache bounds (entries, estimated bytes) and entry lifetime in seconds
+# (None keeps entries until they are evicted or the index changes)
+RESULT_CACHE_ENTRIES = 10000
+RESULT_CACHE_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_TTL = None
+
+# How often (seconds) the index files are checked for a rebuild; when they have
+# changed the index is reloaded and the result cache emptied
+INDEX_CHECK_SECONDS = 5
+
+# Document store fields returned with each result
+RESULT_FIELDS = ('url', 'title', 'authors', 'tags')
+
+
+# Function to read the lexicon into a compact lexicon (see binaryIndex.py)
 def read_lexicon(lexicon_file):
-    lexicon = {}
-    with open(lexicon_file, 'r', encoding='utf-8', errors='ignore') as f:
-        reader = csv.reader(f)
-        next(reader)  # Skip header row
-        for row in reader:
-            if len(row) == 2:
-                word, word_id = row
-                try:
-                    lexicon[word] = int(word_id)
-                except ValueError:
-                    continue  # Skip invalid rows
-    return lexicon
+    return read_compact_lexicon(lexicon_file)
 
 # Function to read the inverted index
-def read_inverted_index(inverted_index_file):
+def read_inverted_index(inverted_index_file, compress=False):
     inverted_index = {}
     with open(inverted_index_file, 'r', encoding='utf-8', errors='ignore') as f:
         reader = csv.reader(f)
         next(reader)  # Skip header row
         for row in reader:
-            if len(row) == 2:
-                word_id, doc_ids = row
-                doc_id_list = list(map(int, doc_ids.split(',')))
-                inverted_index[int(word_id)] = doc_id_list
+            if len(row) == 3:
+                word_id, max_weight, postings = row
+                inverted_index[int(word_id)] = parse_postings(postings, int(max_weight), compress)
     return inverted_index
 
-# Function to read the forward index
-def read_forward_index(forward_index_file):
-    forward_index = {}
-    with open(forward_index_file, 'r', encoding='utf-8', errors='ignore') as f:
+# Function to read the collection statistics written alongside the inverted index
+def read_index_stats(stats_file):
+    stats = {}
+    with open(stats_file, 'r', encoding='utf-8') as f:
         reader = csv.reader(f)
         next(reader)  # Skip header row
         for row in reader:
             if len(row) == 2:
-                doc_id, details = row
-                forward_index[int(doc_id)] = details
-    return forward_index
-
-# Function to fetch the top documents for a multi-word query
-def fetch_top_documents(query, lexicon, inverted_index, forward_index, dataset_file):
-    # Split the query into individual words and remove stop words
-    words = [word.strip().lower() for word in query.split() if word.strip().lower() not in STOP_WORDS]
+                stat, value = row
+                stats[stat] = int(value)
+    return stats
+
+# Function to fetch the top documents for a multi-word query. The lexicon, postings,
+# scoring and document store steps are timed into trace (a new 'query' trace if
+# none is given; see instrumentation.py). With a positional index, quoted phrases
+# must occur in the results and multi-word queries get the proximity boost; with a
+# field index, documents are ranked by BM25F instead of TF-IDF. Queries with AND, OR
+# or NOT are evaluated as boolean queries (see booleanQuery.py); an invalid one
+# raises ValueError. With a spelling index, words missing from the lexicon are corrected.
+def fetch_top_documents(query, lexicon, inverted_index, total_documents, doc_store, k=TOP_K, strategy=STRATEGY,
+                        verbose=True, trace=None, positional_index=None, field_index=None, speller=None):
+    own_trace = trace is None
+    if own_trace:
+        trace = start_trace('query', query=query)
+
+    # Split the query into words the way the documents were tokenized and remove stop words
+    words = query_words(query)
     if not words:
-        print("Your query contains only stop words or is empty.")
+        if verbose:
+            print("Your query contains only stop words or is empty.")
+        if own_trace:
+            finish_trace(trace)
         return []
 
-    # Process each word and calculate cumulative scores for documents
-    doc_scores = {}
-    total_documents = len(forward_index)  # Total number of documents in the dataset
+    # Replace the words that are not in the lexicon by their closest spellings
+    corrections = {}
+    if speller is not None:
+        with trace.timer('spelling'):
+            corrections = speller.correct(words, lexicon, FUZZY_EXPANSIONS)
+        if corrections:
+            if verbose:
+                print(f"Did you mean: {' '.join(corrections.get(word, [word])[0] for word in words)}?")
+            words = [spelling for word in words for spelling in corrections.get(word, [word])]
+        trace.count('corrections', len(corrections))
+
+    # Resolve each word to its posting list and IDF
+    query_terms = []
+    postings_by_word = {}
 
     for word in words:
         # Step 1: Get Word ID from lexicon
-        if word not in lexicon:
-            print(f"The word '{word}' is not in the lexicon. Skipping.")
+        with trace.timer('lexicon'):
+            word_id = lexicon.get(word)
+        if word_id is None:
+            if verbose:
+                print(f"The word '{word}' is not in the lexicon. Skipping.")
             continue
-        word_id = lexicon[word]
 
-        # Step 2: Get document IDs from inverted index
-        if word_id not in inverted_index:
-            print(f"No documents found for the word '{word}'. Skipping.")
+        # Step 2: Get the postings (document IDs, weights and max weight) from the inverted index
+        with trace.timer('postings'):
+            postings = (inverted_index if field_index is None else field_index).get(word_id)
+        if postings is None:
+            if verbose:
+                print(f"No documents found for the word '{word}'. Skipping.")
             continue
-        doc_ids = inverted_index[word_id]
-
-        # Step 3: Get weights (term frequencies) from the forward index
-        for doc_id in doc_ids:
-            details = forward_index.get(doc_id, "")
-            if details:
-                # Split the details string to find the word ID and weight pairs
-                pairs = details.split(',')
-                for pair in pairs:
-                    wid, tf = map(int, pair.split(':'))
-                    if wid == word_id:  # Match the Word ID
-                        # Calculate TF-IDF score
-                        idf = log10(total_documents / len(doc_ids))
-                        tf_idf = tf * idf
-                        if doc_id in doc_scores:
-                            doc_scores[doc_id] += tf_idf
-                        else:
-                            doc_scores[doc_id] = tf_idf
-
-    # Step 4: Sort documents by their cumulative TF-IDF scores in descending order
-    sorted_docs = sorted(doc_scores.items(), key=lambda x: x[1], reverse=True)
-
-    # Step 5: Fetch links from the dataset for the top documents
-    dataset = []
-    with open(dataset_file, 'r', encoding='utf-8', errors='ignore') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            dataset.append(row)
 
+        # Step 3: Compute the IDF once per term
+        postings_by_word[word] = postings
+        df = posting_count(postings)
+        if field_index is None:
+            idf = log10(total_documents / df)
+            query_terms.append(QueryTerm(word_id, postings, idf))
+        else:
+            query_terms.append(field_index.term(word_id, postings, total_documents))
+        trace.count('postings', df)
+    trace.count('terms', len(query_terms))
+
+    # Boolean queries: only the documents matching the operators are ranked, by the
+    # words that are not negated
+    boolean = is_boolean_query(query)
+    if boolean:
+        tree = expand_words(parse_boolean_query(query), corrections)
+        with trace.timer('boolean'):
+            try:
+                candidates = evaluate_boolean_query(tree, postings_by_word)
+            except ValueError:
+                if own_trace:
+                    finish_trace(trace)
+                raise
+        ranking_ids = {lexicon.get(word) for word in positive_words(tree)}
+        query_terms = [term for term in query_terms if term.word_id in ranking_ids]
+
+    # Resolve the words of quoted phrases; a phrase with an unknown word matches nothing
+    phrases = []
+    if positional_index is None and not boolean and verbose and query_phrases(query):
+        print(PHRASE_WARNING)
+    if positional_index is not None and not boolean:
+        with trace.timer('lexicon'):
+            for phrase in query_phrases(query):
+                phrase = [(offset, lexicon.get(corrections.get(word, [word])[0])) for offset, word in phrase]
+                phrases.append(phrase)
+        if any(word_id is None for phrase in phrases for _, word_id in phrase):
+            if verbose:
+                print("A quoted phrase contains a word that is not in the lexicon.")
+            if own_trace:
+                finish_trace(trace)
+            return []
+        trace.count('phrases', len(phrases))
+
+    # Step 4: Keep the k best documents by cumulative TF-IDF (or BM25F) score. 'exhaustive'
+    # scores the whole union; MaxScore skips documents that cannot reach the current
+    # k-th score and returns the same ranking.
+    # Quoted phrases instead restrict the ranking to the documents that contain them,
+    # found by intersecting position lists, and the proximity boost re-ranks the best
+    # k * PROXIMITY_CANDIDATES documents by how close together the query terms occur.
+    # Boolean queries rank their matching documents only.
+    proximity = (positional_index is not None and PROXIMITY_BOOST and not phrases and not boolean
+                 and len({term.word_id for term in query_terms}) > 1)
+    with trace.timer('scoring'):
+        if boolean:
+            sorted_docs = top_k_candidates(query_terms, candidates, k, trace)
+        elif phrases:
+            sorted_docs = top_k_phrase(query_terms, phrases, positional_index, k, trace)
+        elif strategy == 'exhaustive':
+            sorted_docs = top_k_exhaustive(query_terms, k * PROXIMITY_CANDIDATES if proximity else k, trace)
+        else:
+            sorted_docs = top_k_maxscore(query_terms, k * PROXIMITY_CANDIDATES if proximity else k, trace)
+    if proximity:
+        with trace.timer('proximity'):
+            sorted_docs = proximity_rerank(query_terms, sorted_docs, positional_index, k)
+
+    # Step 5: Fetch the display fields of the top documents from the document store
     top_docs = []
-    for doc_id, score in sorted_docs[:5]:  # Limit to top 5 results
-        # Adjusting doc_id to fetch the (doc_id + 2)th row from the dataset
-        row_num = doc_id
-        if row_num < len(dataset):  # Ensure row_num is within bounds
-            link = dataset[row_num]['url']  # Fetch the URL
-            top_docs.append((link, score))
+    bytes_read = doc_store.bytes_read
+    with trace.timer('docstore'):
+        for doc_id, score in sorted_docs:
+            document = doc_store.get(doc_id, RESULT_FIELDS)
+            if document is not None:  # Ensure the DocID is within bounds
+                top_docs.append((document, score))
+    trace.count('results', len(top_docs))
+    trace.count('docstore_bytes', doc_store.bytes_read - bytes_read)
 
+    if own_trace:
+        finish_trace(trace)
     return top_docs
 
+# Function to answer a query from the result cache, computing and caching it on a miss
+def search(query, lexicon, inverted_index, total_documents, doc_store, cache, k=TOP_K, strategy=STRATEGY,
+           verbose=True, positional_index=None, field_index=None, speller=None):
+    terms = normalize_query(query)
+    if not terms:
+        return fetch_top_documents(query, lexicon, inverted_index, total_documents, doc_store, k, strategy,
+                                   verbose, positional_index=positional_index, field_index=field_index, speller=speller)
+
+    trace = start_trace('query', query=query)
+    boolean = normalize_boolean(query)
+    phrases = normalize_phrases(query) if positional_index is not None and not boolean else ()
+    if positional_index is None and not boolean and verbose and normalize_phrases(query):
+        print(PHRASE_WARNING)
+    key = (terms, k, strategy, phrases, boolean, 'tfidf' if field_index is None else 'bm25f')
+    with trace.timer('cache'):
+        results = cache.get(key)
+    if results is None:
+        trace.count('cache_misses')
+        # Score the normalized query so every spelling of it gets the same results
+        # (phrase and boolean queries as written, their word order and operators matter)
+        scored = query if phrases or boolean else " ".join(terms)
+        try:
+            results = fetch_top_documents(scored, lexicon, inverted_index, total_documents, doc_store, k, strategy,
+                                          verbose, trace=trace, positional_index=positional_index,
+                                          field_index=field_index, speller=speller)
+        except ValueError:
+            # Invalid boolean queries are not cached
+            finish_trace(trace)
+            raise
+        cache.put(key, results)
+    else:
+        trace.count('cache_hits')
+    finish_trace(trace)
+    return list(results)
+
+# Index files read by load_index; their sizes and mtimes make up the index generation
+LEXICON_FILE = 'Lexicon.csv'
+INVERTED_INDEX_FILE = 'InvertedIndex.csv'
+STATS_FILE = 'IndexStats.csv'
+STORE_FILE = 'DocStore.csv'
+OFFSETS_FILE = 'DocStore.offsets'
+INDEX_FILES = [LEXICON_FILE, INVERTED_INDEX_FILE, STATS_FILE, 'Lexicon.bin', 'InvertedIndex.bin',
+               os.path.join('Barrels', 'BarrelDirectory.csv'), os.path.join('Segments', 'Segments.csv'), OFFSETS_FILE,
+               POSITIONS_FILE, FIELDS_FILE, os.path.join(SNAPSHOT_DIR, 'Snapshot.csv'), SPELLING_FILE]
+
+# Function to load the index in the configured format; returns
+# (lexicon, inverted_index, total_documents, doc_store)
+def load_index(index_format=INDEX_FORMAT):
+    # An out-of-date snapshot is rebuilt in the background while the CSV index is
+    # loaded; the next reload (see INDEX_CHECK_SECONDS) then maps the new snapshot
+    snapshot = None
+    if index_format == 'lazy':
+        print("Mapping index snapshot...")
+        snapshot = load_snapshot(LEXICON_FILE, INVERTED_INDEX_FILE, STATS_FILE, SNAPSHOT_DIR, COMPRESS_POSTINGS,
+                                 LAZY_MEMORY_BUDGET)
+        if snapshot is None:
+            print("Index snapshot is missing or out of date, rebuilding it in the background...")
+            build_snapshot_in_background(LEXICON_FILE, INVERTED_INDEX_FILE, STATS_FILE, SNAPSHOT_DIR)
+
+    if snapshot is not None:
+        lexicon, inverted_index, total_documents = snapshot
+    elif index_format == 'binary':
+        print("Mapping binary index...")
+        lexicon = BinaryLexicon('Lexicon.bin')
+        inverted_index = BinaryInvertedIndex('InvertedIndex.bin')
+        total_documents = inverted_index.num_documents
+    elif index_format == 'barrels':
+        print("Loading lexicon...")
+        lexicon = read_lexicon(LEXICON_FILE)
+        print("Loading barrel directory...")
+        inverted_index = BarrelIndex('Barrels', BARREL_MEMORY_BUDGET)
+        total_documents = inverted_index.num_documents
+    else:
+        print("Loading lexicon...")
+        lexicon = read_lexicon(LEXICON_FILE)
+        print("Loading inverted index...")
+        inverted_index = read_inverted_index(INVERTED_INDEX_FILE, COMPRESS_POSTINGS)
+        total_documents = read_index_stats(STATS_FILE)['Documents']
+
+    # Search the documents added incrementally (segments.add_documents) as well;
+    # their new words are in the lexicon (Lexicon.csv or Lexicon.bin)
+    if os.path.exists(os.path.join('Segments', 'Segments.csv')):
+        print("Loading index segments...")
+        inverted_index = SegmentedIndex(inverted_index, 'Segments')
+        total_documents += inverted_index.num_documents
+    doc_store = DocumentStore(STORE_FILE, OFFSETS_FILE)
+    return lexicon, inverted_index, total_documents, doc_store
+
+# Function to map the positional index if it has been built (None otherwise). Its
+# DocIDs cover the main index only, so it is left out once segments have been added.
+def load_positional_index():
+    if not os.path.exists(POSITIONS_FILE):
+        return None
+    if os.path.exists(os.path.join('Segments', 'Segments.csv')):
+        print("WARNING: the positional index does not cover the index segments, so it is not loaded: quoted "
+              "phrases are matched as separate words and proximity boosting is off. Rebuild the index from the "
+              "full dataset to restore them.")
+        return None
+    print("Mapping positional index...")
+    return PositionalIndex(POSITIONS_FILE)
+
+# Function to map the BM25F field index when RANKING is 'bm25f' (None for TF-IDF).
+# Like the positional index it covers the main index only, not added segments.
+def load_field_index(ranking=RANKING):
+    if ranking != 'bm25f':
+        return None
+    if os.path.exists(os.path.join('Segments', 'Segments.csv')):
+        print("WARNING: the field index does not cover the index segments, so it is not loaded: ranking with "
+              "TF-IDF instead of BM25F. Rebuild the index from the full dataset to restore it.")
+        return None
+    print("Loading field index...")
+    return FieldIndex(FIELDS_FILE)
+
+# Function to map the spelling index when SPELL_CORRECTION is on and it has been built
+def load_speller():
+    if not SPELL_CORRECTION or not os.path.exists(SPELLING_FILE):
+        return None
+    print("Mapping spelling index...")
+    return SpellingIndex(SPELLING_FILE)
+
+# Function to read the last max_lines lines of a file, reading blocks backwards
+# from its end so the time taken does not grow with the file
+def read_last_lines(path, max_lines, block_size=64 * 1024):
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        data = b''
+        while end > 0 and data.count(b'\n') <= max_lines:
+            start = max(0, end - block_size)
+            f.seek(start)
+            data = f.read(end - start) + data
+            end = start
+    lines = data.decode('utf-8', errors='ignore').splitlines()
+    return lines[-max_lines:] if max_lines > 0 else []
+
+# Function to return the most frequent terms of the most recent logged queries
+def hot_terms(query_log_file, max_terms=WARMUP_TERMS, max_queries=WARMUP_LOG_QUERIES):
+    if not query_log_file or not os.path.exists(query_log_file):
+        return []
+    recent = read_last_lines(query_log_file, max_queries)
+    counts = Counter(word for line in recent for word in query_words(line))
+    return [word for word, _ in counts.most_common(max_terms)]
+
+# Function to append a query to the query log, cutting the log back to its last
+# max_queries queries once it grows past max_bytes
+def log_query(query_log_file, query, max_queries=WARMUP_LOG_QUERIES, max_bytes=QUERY_LOG_MAX_BYTES):
+    with open(query_log_file, 'a', encoding='utf-8') as f:
+        f.write(query.replace('\n', ' ').strip() + '\n')
+    if os.path.getsize(query_log_file) > max_bytes:
+        recent = read_last_lines(query_log_file, max_queries)
+        with open(query_log_file + '.tmp', 'w', encoding='utf-8') as f:
+            f.writelines(line + '\n' for line in recent)
+        os.replace(query_log_file + '.tmp', query_log_file)
+
+# Function to load the posting lists of the hottest logged terms ahead of the
+# queries that need them (parses them with the 'lazy' format, within the free part
+# of its budget, and loads their barrels with 'barrels'); returns the number of
+# terms loaded
+def warm_up(lexicon, inverted_index, query_log_file, max_terms=WARMUP_TERMS):
+    load = getattr(inverted_index, 'prefetch', inverted_index.get)
+    loaded = 0
+    for word in hot_terms(query_log_file, max_terms):
+        word_id = lexicon.get(word)
+        if word_id is not None and load(word_id):
+            loaded += 1
+    return loaded
+
+# Function to load the index with the positional, field and spelling indexes that
+# go with it; returns (lexicon, inverted_index, total_documents, doc_store,
+# positional_index, field_index, speller)
+def load_search_index(index_format=INDEX_FORMAT):
+    return (*load_index(index_format), load_positional_index(), load_field_index(), load_speller())
+
 # Main program
 def main():
-    lexicon_file = 'Lexicon.csv'
-    inverted_index_file = 'InvertedIndex.csv'
-    forward_index_file = 'ForwardIndex.csv'
-    dataset_file = 'CleanedSubDataset.csv'
-
-    # Load data
-    print("Loading lexicon...")
-    lexicon = read_lexicon(lexicon_file)
-    print("Loading inverted index...")
-    inverted_index = read_inverted_index(inverted_index_file)
-    print("Loading forward index...")
-    forward_index = read_forward_index(forward_index_file)
+    if STRATEGY not in STRATEGIES:
+        raise ValueError(f"STRATEGY must be one of {', '.join(STRATEGIES)}, not '{STRATEGY}'")
+
+    # Load data; results are cached per index generation, read before the index so a
+    # rebuild that lands while it loads is noticed at the next check
+    generation = index_generation(INDEX_FILES)
+    lexicon, inverted_index, total_documents, doc_store, positional_index, field_index, speller = load_search_index()
+    cache = QueryCache(RESULT_CACHE_ENTRIES, RESULT_CACHE_BYTES, RESULT_CACHE_TTL, generation)
+    last_check = time.monotonic()
+
+    # Warm the posting lists of recently popular terms while queries are already accepted
+    if QUERY_LOG_FILE and WARMUP_TERMS > 0:
+        threading.Thread(target=warm_up, args=(lexicon, inverted_index, QUERY_LOG_FILE), daemon=True).start()
 
     # Repeated search loop
     while True:
         # User input
         query = input("\nEnter your search query (type 'exit' to quit): ")
         if query.strip().lower() == "exit":
+            print(f"Result cache: {cache.cache_info()}")
             print("Exiting the program. Goodbye!")
             break
 
+        # Log the query for the warm-up of the next start
+        if QUERY_LOG_FILE and query.strip():
+            log_query(QUERY_LOG_FILE, query)
+
+        # Reload the index if it has been rebuilt, so the cache never serves stale results
+        if time.monotonic() - last_check >= INDEX_CHECK_SECONDS:
+            last_check = time.monotonic()
+            generation = index_generation(INDEX_FILES)
+            if generation != cache.generation:
+                print("Index files changed, reloading the index...")
+                try:
+                    loaded = load_search_index()
+                except Exception as e:  # A build still writing the files; retried at the next check
+                    print(f"Reloading the index failed ({e!r}); keeping the loaded index.")
+                else:
+                    doc_store.close()
+                    lexicon, inverted_index, total_documents, doc_store, positional_index, field_index, speller = loaded
+                    cache.set_generation(generation)
+
         # Fetch top documents
         print("Fetching top documents...")
-        top_docs = fetch_top_documents(query, lexicon, inverted_index, forward_index, dataset_file)
+        try:
+            top_docs = search(query, lexicon, inverted_index, total_documents, doc_store, cache, strategy=STRATEGY,
+                              positional_index=positional_index, field_index=field_index, speller=speller)
+        except ValueError as e:
+            print(f"Invalid boolean query: {e}.")
+            continue
 
         # Display results
         if not top_docs:
             print("No results found.")
         else:
             print("Top documents:")
-            for link, score in top_docs:
-                print(f"Link: {link}, TF-IDF Score: {score:.4f}")
+            for document, score in top_docs:
+                print(f"Title: {document['title']}")
+                print(f"Link: {document['url']}, {'TF-IDF' if field_index is None else 'BM25F'} Score: {score:.4f}")
 
 # Run the program
 if __name__ == "__main__":
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from tokenizer import query_words, query_phrases
+from booleanQuery import is_boolean_query, parse_boolean_query, format_boolean_query
+
+# Result cache for query.py. Query traffic is skewed towards a few head queries, so
+# the ranked results of recent queries are kept and served without touching the
+# index again.
+#
+# Keys are normalized queries: lowercased, stop words removed and the remaining
+# terms sorted, so "Deep Learning" and "learning the deep" share an entry (ranking
+# is bag-of-words, repeated terms are kept); quoted phrases are part of the key as
+# they were written, and so is the parsed form of a boolean query. The cache is bounded by entry count and
+# estimated bytes with LRU eviction, entries can expire after a TTL, and every
+# entry belongs to an index generation: query.py and queryServer.py recompute it
+# every INDEX_CHECK_SECONDS and, when the index files have changed, reload the
+# index and move the cache to the new generation, which empties it.
+
+# Default bounds of the cache
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Rough bookkeeping cost of one cached entry (key tuple, list, OrderedDict slot)
+ENTRY_OVERHEAD_BYTES = 400
+
+
+# Function to normalize a query into its cache key terms
+def normalize_query(query):
+    return tuple(sorted(query_words(query)))
+
+
+# Function to normalize the quoted phrases of a query, which word order does matter for
+def normalize_phrases(query):
+    return tuple(tuple(phrase) for phrase in query_phrases(query))
+
+
+# Function to normalize the operators of a boolean query ('' for a plain query)
+def normalize_boolean(query):
+    if not is_boolean_query(query):
+        return ''
+    return format_boolean_query(parse_boolean_query(query))
+
+
+# Function to fingerprint the index files; changes whenever one of them is rebuilt
+def index_generation(paths):
+    fingerprint = hashlib.sha1()
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            fingerprint.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+    return fingerprint.hexdigest()
+
+
+# Function to estimate how much memory a cached result list holds
+def result_size_in_bytes(key, results):
+    size = ENTRY_OVERHEAD_BYTES + sum(len(term) for term in key[0])
+    for document, _ in results:
+        size += 100
+        for value in document.values():
+            size += len(value) if isinstance(value, str) else 8
+    return size
+
+
+class QueryCache:
+    """LRU cache of ranked results bounded by entry count and estimated bytes."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl=None, generation=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation = generation
+        self._entries = OrderedDict()  # key -> (results, size in bytes, time stored)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Function to drop every entry (counters are kept)
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    # Function to switch to a new index generation, emptying the cache if it changed
+    def set_generation(self, generation):
+        if generation != self.generation:
+            if self._entries:
+                self.invalidations += 1
+            self.clear()
+            self.generation = generation
+
+    # Function to return the cached results of a key, or None on a miss
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        results, size, stored = entry
+        if self.ttl is not None and time.monotonic() - stored > self.ttl:
+            del self._entries[key]
+            self._bytes -= size
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return results
+
+    # Function to store the results of a key, evicting the least recently used entries
+    def put(self, key, results):
+        results = tuple(results)
+        size = result_size_in_bytes(key, results)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (results, size, time.monotonic())
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    # Function to report how the cache is doing
+    def cache_info(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'generation': self.generation,
+        }
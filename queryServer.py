@@ -0,0 +1,415 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import query
+from queryCache import QueryCache, normalize_query, normalize_phrases, normalize_boolean, index_generation
+from autocomplete import load_autocomplete, DEFAULT_COMPLETIONS
+from booleanQuery import is_boolean_query, parse_boolean_query, validate_boolean_query
+from shards import load_sharded, SHARD_DIR
+
+# Long-running query service. The index is loaded once per worker process and
+# JSON search requests are served over HTTP by an asyncio front end:
+#
+# GET  /health                 liveness, answers as soon as the server is up
+# GET  /ready                  200 once every worker has loaded the index, 503 before
+# GET  /search?q=...&k=5       top-k results of one query
+# POST /search                 {"query": "...", "k": 5}
+# POST /batch                  {"queries": ["...", ...], "k": 5}
+# GET  /autocomplete?q=ma&n=10 most frequent words starting with the prefix
+#
+# Scoring is CPU-bound pure Python, so it runs in a process pool: a slow query
+# occupies one worker while the others and the event loop keep answering. Results
+# go through the same normalized-query cache as query.py, held by the front end so
+# head queries never leave the event loop. With INDEX_FORMAT = 'binary' in
+# query.py the workers share the mapped index pages instead of each parsing the CSVs.
+# Autocomplete lookups are answered by the front end itself (autocomplete.py).
+# When the index files are rebuilt, a new set of workers loads them and takes over
+# (see watch_index), and the cache is emptied.
+#
+# With index_format 'shards' the front end instead coordinates the shard workers of
+# shards.py: every query is split across all of them, which cuts the latency of
+# heavy queries while concurrent queries still keep every core busy. Shards rank
+# plain TF-IDF queries only: boolean and phrase queries are answered with 400, and
+# the server does not start with RANKING = 'bm25f'.
+
+HOST = '127.0.0.1'
+PORT = 8080
+WORKERS = os.cpu_count()
+
+# Largest accepted request body (bytes) and number of queries in one batch
+MAX_BODY_BYTES = 1024 * 1024
+MAX_BATCH_QUERIES = 100
+
+# Longest a worker waits for the others to load the index (seconds); a worker that
+# crashed or hangs while loading then fails the start instead of blocking it forever
+READY_TIMEOUT = 600
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+# Index, positional index, field index and spelling index loaded by a worker process
+# (set by _init_worker)
+_index = None
+_positions = None
+_fields = None
+_speller = None
+
+# Barrier shared by the workers of one pool, passed by _init_worker
+_ready_barrier = None
+
+
+def _init_worker(index_format, ready_barrier):
+    global _index, _positions, _fields, _speller, _ready_barrier
+    _ready_barrier = ready_barrier
+    _index = query.load_index(index_format)
+    _positions = query.load_positional_index()
+    _fields = query.load_field_index()
+    _speller = query.load_speller()
+    if query.QUERY_LOG_FILE and query.WARMUP_TERMS > 0:
+        # Workers report ready only once the hot posting lists are loaded
+        query.warm_up(_index[0], _index[1], query.QUERY_LOG_FILE)
+
+
+# Function to report that a worker is up, with the size of the index it loaded and
+# whether it can match quoted phrases (has a positional index). A
+# worker runs one call at a time, so the barrier only lets the calls through once as
+# many distinct workers as the pool has are waiting in it, i.e. have loaded the index.
+# If they are not all there within READY_TIMEOUT the barrier breaks and every waiting
+# call raises BrokenBarrierError.
+def _worker_info():
+    _ready_barrier.wait(READY_TIMEOUT)
+    return os.getpid(), _index[2], _positions is not None
+
+
+# Function to score one query in a worker process; returns [(document, score)]
+def _run_query(text, k, strategy):
+    lexicon, inverted_index, total_documents, doc_store = _index
+    return query.fetch_top_documents(text, lexicon, inverted_index, total_documents, doc_store, k, strategy,
+                                     verbose=False, positional_index=_positions, field_index=_fields,
+                                     speller=_speller)
+
+
+# Function to pick the lexicon and inverted index files autocomplete is built from
+def autocomplete_files(index_format):
+    if index_format == 'binary':
+        return 'Lexicon.bin', 'InvertedIndex.bin'
+    return query.LEXICON_FILE, query.INVERTED_INDEX_FILE
+
+
+class QueryServer:
+    """asyncio HTTP front end that hands scoring to a pool of worker processes."""
+
+    def __init__(self, index_format=query.INDEX_FORMAT, workers=WORKERS):
+        self.index_format = index_format
+        self.workers = workers
+        self.pool = None
+        self.sharded = None
+        self.ready = False
+        self.load_error = None
+        self.load_seconds = None
+        self.total_documents = None
+        self.autocomplete = None
+        self.phrase_search = False
+        self.index_files = list(query.INDEX_FILES)
+        if index_format == 'shards':
+            self.index_files.append(os.path.join(SHARD_DIR, 'Shards.csv'))
+        self.cache = QueryCache(query.RESULT_CACHE_ENTRIES, query.RESULT_CACHE_BYTES, query.RESULT_CACHE_TTL,
+                                index_generation(self.index_files))
+        self.requests = 0
+
+    # Function to start a set of workers and wait until each has loaded the index;
+    # returns (pool, sharded, workers, total_documents, phrase_search, autocomplete)
+    async def _start_workers(self):
+        if self.index_format == 'shards' and query.RANKING != 'tfidf':
+            raise ValueError(f"the sharded index ranks with TF-IDF only, not RANKING = '{query.RANKING}'")
+        loop = asyncio.get_running_loop()
+        autocomplete = loop.run_in_executor(None, load_autocomplete, *autocomplete_files(self.index_format))
+        # The front end builds the autocomplete structure while the workers load the index
+        if self.index_format == 'shards':
+            sharded, autocomplete = await asyncio.gather(loop.run_in_executor(None, load_sharded), autocomplete)
+            return None, sharded, len(sharded.pools), sharded.total_documents, False, autocomplete
+        pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                   initargs=(self.index_format, multiprocessing.Barrier(self.workers)))
+        try:
+            infos, autocomplete = await asyncio.gather(
+                asyncio.gather(*(loop.run_in_executor(pool, _worker_info) for _ in range(self.workers))),
+                autocomplete)
+        except threading.BrokenBarrierError as e:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise RuntimeError(f"not all {self.workers} workers loaded the index within {READY_TIMEOUT}s") from e
+        except Exception:
+            pool.shutdown(wait=False)
+            raise
+        return pool, None, self.workers, infos[0][1], all(info[2] for info in infos), autocomplete
+
+    # Function to start the workers and wait until each has loaded the index
+    async def load(self):
+        start = time.perf_counter()
+        try:
+            (self.pool, self.sharded, self.workers, self.total_documents, self.phrase_search,
+             self.autocomplete) = await self._start_workers()
+        except Exception as e:
+            self.load_error = repr(e)
+            print(f"Index loading failed: {self.load_error}")
+            return
+        self.load_seconds = time.perf_counter() - start
+        self.ready = True
+        print(f"Index loaded by {self.workers} workers in {self.load_seconds:.2f}s, {self.total_documents} documents.")
+
+    # Function to load a rebuilt index into new workers, then switch queries over to them
+    # and empty the cache (the old workers finish the queries they already have)
+    async def reload(self, generation):
+        print("Index files changed, reloading the index...")
+        start = time.perf_counter()
+        try:
+            loaded = await self._start_workers()
+        except Exception as e:  # A build still writing the files; retried at the next check
+            print(f"Reloading the index failed ({e!r}); keeping the loaded index.")
+            return
+        pool, sharded = self.pool, self.sharded
+        self.pool, self.sharded, self.workers, self.total_documents, self.phrase_search, self.autocomplete = loaded
+        self.cache.set_generation(generation)
+        if pool is not None:
+            pool.shutdown(wait=False)
+        if sharded is not None:
+            await asyncio.get_running_loop().run_in_executor(None, sharded.close)
+        print(f"Index reloaded in {time.perf_counter() - start:.2f}s, {self.total_documents} documents.")
+
+    # Function to check the index files every INDEX_CHECK_SECONDS and reload them when rebuilt
+    async def watch_index(self):
+        while True:
+            await asyncio.sleep(query.INDEX_CHECK_SECONDS)
+            generation = index_generation(self.index_files)
+            if self.ready and generation != self.cache.generation:
+                await self.reload(generation)
+
+    # Function to return why a query cannot be answered by this server (None if it can).
+    # Shards rank plain TF-IDF queries only, so boolean and phrase queries are refused
+    # rather than answered as if they were a plain query.
+    def unsupported(self, text):
+        if self.sharded is None:
+            return None
+        if normalize_boolean(text):
+            return 'boolean queries are not supported by the sharded index'
+        if normalize_phrases(text):
+            return 'phrase queries are not supported by the sharded index'
+        return None
+
+    # Function to return why a boolean query is invalid (None if it is valid or not
+    # boolean), checked up front so the error is answered with 400 and never cached
+    def invalid(self, text):
+        if not is_boolean_query(text):
+            return None
+        try:
+            validate_boolean_query(parse_boolean_query(text))
+        except ValueError as e:
+            return f"invalid boolean query: {e}"
+        return None
+
+    # Function to return a warning for a query that is only answered in part (None otherwise)
+    def warning(self, text):
+        if not self.phrase_search and not normalize_boolean(text) and normalize_phrases(text):
+            return 'the positional index is not loaded, so quoted words are matched anywhere in the documents'
+        return None
+
+    # Function to answer one query from the cache or a worker, as JSON-ready result dicts
+    async def search(self, text, k, strategy=query.STRATEGY):
+        terms = normalize_query(text)
+        if not terms:
+            return []
+        boolean = normalize_boolean(text)
+        phrases = () if boolean else normalize_phrases(text)
+        key = (terms, k, strategy, phrases, boolean, query.RANKING)
+        results = self.cache.get(key)
+        if results is None:
+            generation = self.cache.generation
+            loop = asyncio.get_running_loop()
+            if self.sharded is not None:
+                results = await loop.run_in_executor(None, self.sharded.search, " ".join(terms), k, strategy)
+            else:
+                scored = text if phrases or boolean else " ".join(terms)
+                results = await loop.run_in_executor(self.pool, _run_query, scored, k, strategy)
+            # Results of the old index that arrive after a reload are not cached
+            if generation == self.cache.generation:
+                self.cache.put(key, results)
+        return [dict(document, score=score) for document, score in results]
+
+    # Function to answer an autocomplete request from its query string
+    def complete(self, query_string):
+        if self.autocomplete is None:
+            return 503, {'error': 'autocomplete is still loading'}
+        params = {name: values[-1] for name, values in parse_qs(query_string).items()}
+        try:
+            n = int(params.get('n', DEFAULT_COMPLETIONS))
+        except ValueError:
+            return 400, {'error': 'n must be an integer'}
+        if n < 0:
+            return 400, {'error': 'n must not be negative'}
+        prefix = params.get('q', '')
+        completions = self.autocomplete.complete(prefix, n)
+        return 200, {'prefix': prefix, 'completions': [{'word': word, 'documents': frequency}
+                                                       for word, frequency in completions]}
+
+    # Function to route one request; returns (status, JSON payload)
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok'}
+        if url.path == '/ready':
+            payload = {'ready': self.ready, 'workers': self.workers, 'documents': self.total_documents,
+                       'load_seconds': self.load_seconds}
+            if self.load_error:
+                payload['error'] = self.load_error
+            return (200 if self.ready else 503), payload
+        if url.path == '/stats':
+            return 200, {'requests': self.requests, 'cache': self.cache.cache_info()}
+        if url.path == '/autocomplete':
+            return self.complete(url.query)
+        if url.path not in ('/search', '/batch'):
+            return 404, {'error': f"unknown path {url.path}"}
+        if not self.ready:
+            return 503, {'error': 'index is still loading'}
+
+        # Read the parameters from the query string (GET) or the JSON body (POST)
+        if method == 'GET':
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        elif method == 'POST':
+            try:
+                params = json.loads(body or b'{}')
+            except ValueError:
+                return 400, {'error': 'request body is not valid JSON'}
+            if not isinstance(params, dict):
+                return 400, {'error': 'request body must be a JSON object'}
+        else:
+            return 405, {'error': f"method {method} not allowed"}
+        try:
+            k = int(params.get('k', query.TOP_K))
+        except (TypeError, ValueError):
+            return 400, {'error': 'k must be an integer'}
+        strategy = params.get('strategy', query.STRATEGY)
+        if strategy not in query.STRATEGIES:
+            return 400, {'error': f"strategy must be one of {', '.join(query.STRATEGIES)}"}
+
+        if url.path == '/search':
+            text = params.get('q', params.get('query'))
+            if not isinstance(text, str):
+                return 400, {'error': 'missing query'}
+            error = self.unsupported(text) or self.invalid(text)
+            if error:
+                return 400, {'error': error}
+            payload = {'query': text, 'results': await self.search(text, k, strategy)}
+            warning = self.warning(text)
+            if warning:
+                payload['warning'] = warning
+            return 200, payload
+
+        queries = params.get('queries')
+        if not isinstance(queries, list) or not all(isinstance(text, str) for text in queries):
+            return 400, {'error': 'queries must be a list of strings'}
+        if len(queries) > MAX_BATCH_QUERIES:
+            return 413, {'error': f"at most {MAX_BATCH_QUERIES} queries per batch"}
+        errors = [(text, self.unsupported(text) or self.invalid(text)) for text in queries]
+        errors = [f"{text}: {error}" for text, error in errors if error]
+        if errors:
+            return 400, {'error': '; '.join(errors)}
+        results = await asyncio.gather(*(self.search(text, k, strategy) for text in queries))
+        answers = []
+        for text, result in zip(queries, results):
+            answer = {'query': text, 'results': result}
+            warning = self.warning(text)
+            if warning:
+                answer['warning'] = warning
+            answers.append(answer)
+        return 200, {'results': answers}
+
+    # Function to serve the HTTP/1.1 requests of one connection (keep-alive supported)
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'malformed request line'}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {'error': 'invalid Content-Length'}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': 'request body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                self.requests += 1
+                try:
+                    status, payload = await self.route(method, target, body)
+                except Exception as e:
+                    status, payload = 500, {'error': repr(e)}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.sharded is not None:
+            self.sharded.close()
+
+
+# Function to run the server until interrupted; the port opens before the index is
+# loaded so /health and /ready can be polled during startup
+async def serve(host=HOST, port=PORT, index_format=query.INDEX_FORMAT, workers=WORKERS):
+    server = QueryServer(index_format, workers)
+    listener = await asyncio.start_server(server.handle_connection, host, port)
+    print(f"Serving on http://{host}:{port} with {workers} workers...")
+    try:
+        async with listener:
+            await server.load()
+            watcher = asyncio.create_task(server.watch_index())
+            try:
+                await listener.serve_forever()
+            finally:
+                watcher.cancel()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("Server stopped.")
@@ -0,0 +1,297 @@
+import csv
+import os
+import shutil
+import pandas as pd
+from array import array
+from clean import clean_chunk
+from forwardIndex import read_lexicon, field_weight, forward_index_row
+from pipeline import index_document
+from docStore import DocumentStoreWriter
+from postings import Postings, ChainedPostings
+from binaryIndex import BinaryInvertedIndex, write_binary_lexicon
+from snapshot import build_snapshot, snapshot_is_current, SNAPSHOT_DIR
+
+# Incremental indexing. New documents are indexed into small immutable segments
+# instead of rebuilding the whole index:
+#
+# Segments/Segments.csv             manifest, one row per live segment in DocID
+#                                   order: SegmentID, Level, FirstDocID,
+#                                   Documents, Postings
+# Segments/segment_<id>/InvertedIndex.csv   postings of the segment's documents
+#                                           (global DocIDs, same format as the
+#                                           main InvertedIndex.csv)
+# Segments/segment_<id>/ForwardIndex.csv    forward rows of those documents
+#
+# Words seen for the first time get new WordIDs and the documents are appended to
+# the document store, so ingest cost follows the size of the new batch. New words
+# are appended to Lexicon.csv; a Lexicon.bin is kept sorted for binary search, so it
+# is rewritten instead. For a binary build, pass Lexicon.bin as lexicon_file and
+# InvertedIndex.bin (whose header holds the document count) as stats_file.
+#
+# The startup snapshot of the 'lazy' format (snapshot.py) holds a copy of
+# Lexicon.csv, so add_documents refreshes it after appending new words; its term
+# directory covers the unchanged InvertedIndex.csv and is kept.
+#
+# A segment created by add_documents starts at level 0; when MERGE_FACTOR segments
+# share a level they are merged into one segment of the next level, which keeps the
+# number of live segments logarithmic in the documents added.
+#
+# Positions.bin and FieldIndex.bin are not extended: once segments exist, query.py
+# stops using them (no phrase search, proximity boost or BM25F) until the index is
+# rebuilt from the full dataset.
+
+# Number of same-level segments that triggers a merge
+MERGE_FACTOR = 10
+
+MANIFEST_HEADER = ["SegmentID", "Level", "FirstDocID", "Documents", "Postings"]
+
+csv.field_size_limit(10000000)
+
+
+# Function to read the segment manifest as a list of dicts (empty if there are no segments)
+def read_manifest(segment_dir):
+    manifest_file = os.path.join(segment_dir, 'Segments.csv')
+    if not os.path.exists(manifest_file):
+        return []
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        return [{key: int(value) for key, value in row.items()} for row in csv.DictReader(f)]
+
+
+# Function to replace the manifest (written to a temporary file first, so readers
+# never see a half-written manifest)
+def write_manifest(segment_dir, manifest):
+    manifest_file = os.path.join(segment_dir, 'Segments.csv')
+    with open(manifest_file + '.tmp', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_HEADER)
+        writer.writeheader()
+        writer.writerows(manifest)
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+
+# Function to return the directory holding one segment
+def segment_path(segment_dir, segment_id):
+    return os.path.join(segment_dir, f"segment_{segment_id}")
+
+
+# Function to read the postings of one segment as WordID -> Postings
+def read_segment_postings(segment_dir, segment_id):
+    postings = {}
+    with open(os.path.join(segment_path(segment_dir, segment_id), 'InvertedIndex.csv'), 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header row
+        for row in reader:
+            if len(row) == 3:
+                word_id, max_weight, pairs = row
+                doc_ids = array('I')
+                weights = array('I')
+                for pair in pairs.split(','):
+                    doc_id, weight = pair.split(':')
+                    doc_ids.append(int(doc_id))
+                    weights.append(int(weight))
+                postings[int(word_id)] = Postings(doc_ids, weights, int(max_weight))
+    return postings
+
+
+# Function to write one segment's inverted index (WordID -> Postings) sorted by WordID
+def write_segment_postings(path, postings):
+    with open(os.path.join(path, 'InvertedIndex.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["WordID", "MaxWeight", "Postings"])  # Header
+        for word_id in sorted(postings):
+            doc_ids, weights, max_weight = postings[word_id]
+            writer.writerow([word_id, max_weight, ",".join(f"{doc_id}:{weight}" for doc_id, weight in zip(doc_ids, weights))])
+
+
+# Function to read the number of documents in the main index, from IndexStats.csv or
+# from the header of InvertedIndex.bin
+def read_document_count(stats_file):
+    if stats_file.endswith('.bin'):
+        with BinaryInvertedIndex(stats_file) as inverted_index:
+            return inverted_index.num_documents
+    with open(stats_file, 'r', encoding='utf-8') as f:
+        return int({row[0]: row[1] for row in csv.reader(f) if len(row) == 2}['Documents'])
+
+
+# Function to add the words seen for the first time to the lexicon file
+def update_lexicon(lexicon_file, word_dict, new_words):
+    if lexicon_file.endswith('.bin'):
+        # Written next to the old file and swapped in, so readers never map a partial file
+        write_binary_lexicon(word_dict, lexicon_file + '.tmp')
+        os.replace(lexicon_file + '.tmp', lexicon_file)
+    else:
+        with open(lexicon_file, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f, lineterminator='\n').writerows(new_words)
+
+
+# Function to index a batch of raw documents (dicts with title, tags, authors, text,
+# url, ...) as a new segment and return its SegmentID
+def add_documents(records, lexicon_file='Lexicon.csv', stats_file='IndexStats.csv', segment_dir='Segments',
+                  store_file='DocStore.csv', offsets_file='DocStore.offsets', merge_factor=MERGE_FACTOR,
+                  inverted_index_file='InvertedIndex.csv', snapshot_dir=SNAPSHOT_DIR):
+    if not records:
+        return None
+    os.makedirs(segment_dir, exist_ok=True)
+    manifest = read_manifest(segment_dir)
+
+    # New documents continue the DocIDs after the main index and the existing segments
+    first_doc_id = read_document_count(stats_file) + sum(segment['Documents'] for segment in manifest)
+
+    with read_lexicon(lexicon_file) as lexicon:
+        word_dict = dict(lexicon.items())  # New words are added to it
+    known_words = len(word_dict)
+    current_id = max(word_dict.values(), default=0) + 1
+
+    # Clean and tokenize the new documents
+    dataset = clean_chunk(pd.DataFrame(records))
+    store = DocumentStoreWriter(store_file, offsets_file, [], append=True)
+    forward_rows = []
+    buffer = {}  # WordID -> (DocIDs, weights)
+    for offset, record in enumerate(dataset.to_dict('records')):
+        doc_id = first_doc_id + offset
+        store.add(record)
+        frequencies, current_id = index_document(record, word_dict, current_id)
+        weights = [(word_id, field_weight(counts)) for word_id, counts in frequencies]
+        forward_rows.append(forward_index_row(doc_id, weights, [counts for _, counts in frequencies]))
+        for word_id, weight in weights:
+            if word_id not in buffer:
+                buffer[word_id] = (array('I'), array('I'))
+            buffer[word_id][0].append(doc_id)
+            buffer[word_id][1].append(weight)
+    postings = {word_id: Postings(doc_ids, weights, max(weights)) for word_id, (doc_ids, weights) in buffer.items()}
+
+    # Write the segment
+    segment_id = max((segment['SegmentID'] for segment in manifest), default=0) + 1
+    path = segment_path(segment_dir, segment_id)
+    os.makedirs(path)
+    write_segment_postings(path, postings)
+    with open(os.path.join(path, 'ForwardIndex.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["DocID", "Details", "FieldFreqs"])  # Header
+        writer.writerows(forward_rows)
+
+    # Append the new words to the lexicon and the documents to the document store
+    new_words = list(word_dict.items())[known_words:]
+    if new_words:
+        snapshot_was_current = (not lexicon_file.endswith('.bin')
+                                and snapshot_is_current(lexicon_file, inverted_index_file, stats_file, snapshot_dir))
+        update_lexicon(lexicon_file, word_dict, new_words)
+        if snapshot_was_current:
+            build_snapshot(lexicon_file, inverted_index_file, stats_file, snapshot_dir)
+    store.close()
+
+    # Publish the segment, then let the merge policy compact small segments
+    manifest.append({
+        'SegmentID': segment_id,
+        'Level': 0,
+        'FirstDocID': first_doc_id,
+        'Documents': len(forward_rows),
+        'Postings': sum(len(p.doc_ids) for p in postings.values()),
+    })
+    write_manifest(segment_dir, manifest)
+    print(f"Segment {segment_id} added with {len(forward_rows)} documents and {len(new_words)} new words.")
+    if len(manifest) == 1:
+        print("WARNING: the positional and field indexes do not cover segments, so phrase search, proximity "
+              "boosting and BM25F ranking are off until the index is rebuilt from the full dataset.")
+
+    maybe_merge_segments(segment_dir, merge_factor)
+    return segment_id
+
+
+# Function to merge consecutive segments into one new segment one level up
+def merge_segments(segment_dir, segment_ids):
+    manifest = read_manifest(segment_dir)
+    merging = [segment for segment in manifest if segment['SegmentID'] in segment_ids]
+    if len(merging) < 2:
+        return None
+
+    # Concatenate the posting lists in segment (and therefore DocID) order
+    buffer = {}  # WordID -> (DocIDs, weights)
+    for segment in merging:
+        for word_id, postings in read_segment_postings(segment_dir, segment['SegmentID']).items():
+            if word_id not in buffer:
+                buffer[word_id] = (array('I'), array('I'))
+            buffer[word_id][0].extend(postings.doc_ids)
+            buffer[word_id][1].extend(postings.weights)
+    merged = {word_id: Postings(doc_ids, weights, max(weights)) for word_id, (doc_ids, weights) in buffer.items()}
+
+    segment_id = max(segment['SegmentID'] for segment in manifest) + 1
+    path = segment_path(segment_dir, segment_id)
+    os.makedirs(path)
+    write_segment_postings(path, merged)
+    with open(os.path.join(path, 'ForwardIndex.csv'), 'w', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(["DocID", "Details", "FieldFreqs"])  # Header
+        for segment in merging:
+            with open(os.path.join(segment_path(segment_dir, segment['SegmentID']), 'ForwardIndex.csv'), 'r', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader)  # Skip header row
+                writer.writerows(reader)
+
+    # Swap the merged segment in for its inputs, then drop the old files
+    merged_entry = {
+        'SegmentID': segment_id,
+        'Level': max(segment['Level'] for segment in merging) + 1,
+        'FirstDocID': merging[0]['FirstDocID'],
+        'Documents': sum(segment['Documents'] for segment in merging),
+        'Postings': sum(segment['Postings'] for segment in merging),
+    }
+    position = manifest.index(merging[0])
+    manifest = [segment for segment in manifest if segment not in merging]
+    manifest.insert(position, merged_entry)
+    write_manifest(segment_dir, manifest)
+    for segment in merging:
+        shutil.rmtree(segment_path(segment_dir, segment['SegmentID']))
+    print(f"Merged segments {[segment['SegmentID'] for segment in merging]} into segment {segment_id}.")
+    return segment_id
+
+
+# Function to apply the merge policy: merge_factor segments on one level become one
+# segment on the next level, repeated until no level is full
+def maybe_merge_segments(segment_dir, merge_factor=MERGE_FACTOR):
+    while True:
+        manifest = read_manifest(segment_dir)
+        levels = {}
+        for segment in manifest:
+            levels.setdefault(segment['Level'], []).append(segment['SegmentID'])
+        full = [level for level, ids in levels.items() if len(ids) >= merge_factor]
+        if not full:
+            return
+        merge_segments(segment_dir, levels[min(full)][:merge_factor])
+
+
+# Function to merge every live segment into one (on-demand compaction)
+def compact_segments(segment_dir='Segments'):
+    return merge_segments(segment_dir, [segment['SegmentID'] for segment in read_manifest(segment_dir)])
+
+
+class SegmentedIndex:
+    """Inverted index that searches the main index and every live segment.
+
+    Segment DocIDs come after the main index's, so a word's postings are the main
+    posting list followed by each segment's list, still sorted by DocID. They are
+    chained rather than copied, so the main list stays a mapped or compressed list
+    that cursors can skip through.
+    """
+
+    def __init__(self, base_index, segment_dir='Segments'):
+        self.base_index = base_index
+        manifest = read_manifest(segment_dir)
+        self.segments = [read_segment_postings(segment_dir, segment['SegmentID']) for segment in manifest]
+        self.num_documents = sum(segment['Documents'] for segment in manifest)
+
+    def __contains__(self, word_id):
+        return word_id in self.base_index or any(word_id in segment for segment in self.segments)
+
+    def __getitem__(self, word_id):
+        parts = []
+        if word_id in self.base_index:
+            parts.append(self.base_index[word_id])
+        parts.extend(segment[word_id] for segment in self.segments if word_id in segment)
+        if not parts:
+            raise KeyError(word_id)
+        if len(parts) == 1:
+            return parts[0]
+        return ChainedPostings(parts)
+
+    def get(self, word_id, default=None):
+        return self[word_id] if word_id in self else default
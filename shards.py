@@ -0,0 +1,271 @@
+import csv
+import heapq
+import os
+import shutil
+import threading
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from math import log10
+from binaryIndex import (HEADER, MAGIC_TERMS, FORMAT_VERSION, MappedFile, _write_array, BinaryLexicon,
+                         BinaryInvertedIndex, write_binary_inverted_index)
+from postings import Postings
+from topK import QueryTerm, top_k_exhaustive, top_k_maxscore
+from docStore import DocumentStore
+from tokenizer import query_words
+from segments import read_manifest as read_segment_manifest, read_segment_postings
+import query
+
+# Document-partitioned query execution. The inverted index is split into shards of
+# consecutive DocIDs, each stored as a memory-mapped InvertedIndex.bin, and every
+# shard is served by its own worker process:
+#
+# Shards/Shards.csv               manifest: ShardID, FirstDocID, Documents, Postings
+# Shards/ShardInfo.csv            the lexicon file the shards' WordIDs come from and
+#                                 the index segments (segments.py) they include
+# Shards/Terms.bin                global document frequency of every WordID and the
+#                                 number of documents (see binaryIndex.py)
+# Shards/shard_<id>/InvertedIndex.bin   postings of the shard's documents (global DocIDs)
+#
+# A query is resolved once by the coordinator (lexicon lookup and IDF from the
+# global statistics, after the same spelling correction), scattered to every shard, ranked there with the same top-k
+# strategies as query.py, and the per-shard top k lists are merged. Each shard
+# scores its documents exactly as the unsharded index would, so the merged ranking
+# is identical to fetch_top_documents. Phrase queries, boolean operators and BM25F
+# are not sharded; queryServer.py refuses them rather than rank the bare words.
+# Documents added as segments after the shards were built are not in them, so the
+# shards refuse to load until they are rebuilt.
+
+SHARD_DIR = 'Shards'
+NUM_SHARDS = os.cpu_count()
+COMPRESS_SHARDS = False
+
+MANIFEST_HEADER = ["ShardID", "FirstDocID", "Documents", "Postings"]
+
+# Shard index loaded by a shard worker process (set by _init_shard)
+_shard = None
+
+
+# Function to return the directory holding one shard
+def shard_path(shard_dir, shard_id):
+    return os.path.join(shard_dir, f"shard_{shard_id}")
+
+
+# Function to read the shard manifest as a list of dicts
+def read_manifest(shard_dir):
+    with open(os.path.join(shard_dir, 'Shards.csv'), 'r', encoding='utf-8') as f:
+        return [{key: int(value) for key, value in row.items()} for row in csv.DictReader(f)]
+
+
+# Function to read the shard build information as {setting: value}
+def read_shard_info(shard_dir):
+    info_file = os.path.join(shard_dir, 'ShardInfo.csv')
+    if not os.path.exists(info_file):
+        raise ValueError(f"{shard_dir} has no ShardInfo.csv, rebuild the shards with shards.py")
+    with open(info_file, 'r', encoding='utf-8') as f:
+        info = {row[0]: row[1] for row in csv.reader(f) if len(row) == 2}
+    info['Segments'] = [int(segment_id) for segment_id in info['Segments'].split()]
+    return info
+
+
+# Function to split the inverted index into num_shards DocID ranges of equal size.
+# lexicon_file names the lexicon the WordIDs come from and segment_ids the index
+# segments included in inverted_index; both are recorded for load_sharded.
+def build_shards(inverted_index, total_documents, num_shards=NUM_SHARDS, shard_dir=SHARD_DIR,
+                 compress=COMPRESS_SHARDS, lexicon_file=query.LEXICON_FILE, segment_ids=()):
+    if os.path.exists(shard_dir):
+        shutil.rmtree(shard_dir)
+    os.makedirs(shard_dir)
+    bounds = [total_documents * shard_id // num_shards for shard_id in range(num_shards + 1)]
+    print(f"Splitting the index into {num_shards} shards...")
+
+    # Global statistics: the IDF of a term depends on all shards
+    word_ids = sorted(inverted_index)
+    with open(os.path.join(shard_dir, 'Terms.bin'), 'wb') as f:
+        f.write(HEADER.pack(MAGIC_TERMS, FORMAT_VERSION, 0, 0, len(word_ids), total_documents, 0))
+        _write_array(f, 'I', word_ids)
+        _write_array(f, 'I', (len(inverted_index[word_id].doc_ids) for word_id in word_ids))
+
+    manifest = []
+    for shard_id in range(num_shards):
+        first, end = bounds[shard_id], bounds[shard_id + 1]
+        shard_index = {}
+        for word_id in word_ids:
+            postings = inverted_index[word_id]
+            lo = bisect_left(postings.doc_ids, first)
+            hi = bisect_left(postings.doc_ids, end, lo)
+            if lo < hi:
+                shard_index[word_id] = list(zip(postings.doc_ids[lo:hi], postings.weights[lo:hi]))
+        os.makedirs(shard_path(shard_dir, shard_id))
+        write_binary_inverted_index(shard_index, total_documents,
+                                    os.path.join(shard_path(shard_dir, shard_id), 'InvertedIndex.bin'), compress)
+        manifest.append({'ShardID': shard_id, 'FirstDocID': first, 'Documents': end - first,
+                         'Postings': sum(len(postings) for postings in shard_index.values())})
+
+    with open(os.path.join(shard_dir, 'Shards.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_HEADER)
+        writer.writeheader()
+        writer.writerows(manifest)
+    with open(os.path.join(shard_dir, 'ShardInfo.csv'), 'w', newline='') as f:
+        csv.writer(f).writerows([['Lexicon', lexicon_file],
+                                 ['Segments', " ".join(str(segment_id) for segment_id in segment_ids)]])
+    print(f"{num_shards} shards saved to {shard_dir}.")
+
+
+# Function to read the CSV inverted index with the postings of every live index
+# segment appended; returns (inverted_index, total_documents, segment_ids)
+def read_segmented_index(inverted_index_file, stats_file, segment_dir='Segments'):
+    inverted_index = query.read_inverted_index(inverted_index_file)
+    total_documents = query.read_index_stats(stats_file)['Documents']
+    segments = read_segment_manifest(segment_dir)
+    for segment in segments:
+        print(f"Adding index segment {segment['SegmentID']}...")
+        for word_id, postings in read_segment_postings(segment_dir, segment['SegmentID']).items():
+            if word_id in inverted_index:
+                base = inverted_index[word_id]
+                postings = Postings(list(base.doc_ids) + list(postings.doc_ids),
+                                    list(base.weights) + list(postings.weights),
+                                    max(base.max_weight, postings.max_weight))
+            inverted_index[word_id] = postings
+        total_documents += segment['Documents']
+    return inverted_index, total_documents, [segment['SegmentID'] for segment in segments]
+
+
+class TermStatistics:
+    """Global document frequency of every WordID, over a memory-mapped Terms.bin."""
+
+    def __init__(self, path):
+        self._file = MappedFile(path, MAGIC_TERMS)
+        num_terms, self.num_documents, _ = self._file.counts
+        self._word_ids = self._file.next_array('I', num_terms)
+        self._frequencies = self._file.next_array('I', num_terms)
+        self._num_terms = num_terms
+
+    def get(self, word_id, default=None):
+        i = bisect_left(self._word_ids, word_id)
+        if i < self._num_terms and self._word_ids[i] == word_id:
+            return self._frequencies[i]
+        return default
+
+    def close(self):
+        self._file.close()
+
+
+def _init_shard(path):
+    global _shard
+    _shard = BinaryInvertedIndex(path)
+
+
+# Function to report that a shard worker is up, with the number of terms it mapped
+def _shard_info():
+    return os.getpid(), len(_shard)
+
+
+# Function to rank one shard's documents for a query given as [(WordID, IDF)] in
+# query order; returns the shard's top k (DocID, score) pairs
+def _shard_top_k(terms, k, strategy):
+    query_terms = []
+    for word_id, idf in terms:
+        postings = _shard.get(word_id)
+        if postings is not None:
+            query_terms.append(QueryTerm(word_id, postings, idf))
+    if strategy == 'exhaustive':
+        return top_k_exhaustive(query_terms, k)
+    return top_k_maxscore(query_terms, k)
+
+
+class ShardedSearcher:
+    """Coordinator that scatters queries to one worker process per shard and merges
+    their top k lists."""
+
+    def __init__(self, lexicon, doc_store, shard_dir=SHARD_DIR, speller=None):
+        self.lexicon = lexicon
+        self.doc_store = doc_store
+        self.speller = speller
+        self._store_lock = threading.Lock()  # Queries may come from several threads (queryServer.py)
+        self.statistics = TermStatistics(os.path.join(shard_dir, 'Terms.bin'))
+        self.total_documents = self.statistics.num_documents
+        self.manifest = read_manifest(shard_dir)
+
+        # One single-process pool per shard, so every shard is always answered by the
+        # process that has it mapped
+        self.pools = []
+        for shard in self.manifest:
+            path = os.path.join(shard_path(shard_dir, shard['ShardID']), 'InvertedIndex.bin')
+            self.pools.append(ProcessPoolExecutor(1, initializer=_init_shard, initargs=(path,)))
+
+    # Function to wait until every shard worker has mapped its shard
+    def wait_ready(self):
+        return [future.result() for future in [pool.submit(_shard_info) for pool in self.pools]]
+
+    # Function to resolve the words of a query to [(WordID, IDF)] in query order,
+    # replacing words missing from the lexicon by their closest spellings like
+    # query.fetch_top_documents
+    def query_terms(self, text):
+        words = query_words(text)
+        if self.speller is not None:
+            corrections = self.speller.correct(words, self.lexicon, query.FUZZY_EXPANSIONS)
+            words = [spelling for word in words for spelling in corrections.get(word, [word])]
+        terms = []
+        for word in words:
+            word_id = self.lexicon.get(word)
+            if word_id is None:
+                continue
+            df = self.statistics.get(word_id)
+            if df:
+                terms.append((word_id, log10(self.total_documents / df)))
+        return terms
+
+    # Function to rank a query on every shard; returns the global top k (DocID, score) pairs
+    def top_k(self, text, k=query.TOP_K, strategy=query.STRATEGY):
+        terms = self.query_terms(text)
+        if not terms or k <= 0:
+            return []
+        futures = [pool.submit(_shard_top_k, terms, k, strategy) for pool in self.pools]
+        ranked = [entry for future in futures for entry in future.result()]
+        return heapq.nsmallest(k, ranked, key=lambda x: (-x[1], x[0]))
+
+    # Function to answer a query like query.fetch_top_documents; returns [(document, score)]
+    def search(self, text, k=query.TOP_K, strategy=query.STRATEGY):
+        top_docs = []
+        ranked = self.top_k(text, k, strategy)
+        with self._store_lock:
+            for doc_id, score in ranked:
+                document = self.doc_store.get(doc_id, query.RESULT_FIELDS)
+                if document is not None:
+                    top_docs.append((document, score))
+        return top_docs
+
+    def close(self):
+        for pool in self.pools:
+            pool.shutdown()
+        self.statistics.close()
+
+
+# Function to start the shard workers with the lexicon the shards were built from
+# and the document store; raises ValueError if index segments were added since
+def load_sharded(shard_dir=SHARD_DIR, segment_dir='Segments'):
+    info = read_shard_info(shard_dir)
+    missing = [segment['SegmentID'] for segment in read_segment_manifest(segment_dir)
+               if segment['SegmentID'] not in info['Segments']]
+    if missing:
+        raise ValueError(f"the shards do not contain index segments {missing}, rebuild them with shards.py")
+    print("Loading lexicon...")
+    if info['Lexicon'].endswith('.bin'):
+        lexicon = BinaryLexicon(info['Lexicon'])
+    else:
+        lexicon = query.read_lexicon(info['Lexicon'])
+    doc_store = DocumentStore(query.STORE_FILE, query.OFFSETS_FILE)
+    speller = query.load_speller()
+    print(f"Starting shard workers for {shard_dir}...")
+    searcher = ShardedSearcher(lexicon, doc_store, shard_dir, speller)
+    searcher.wait_ready()
+    print(f"{len(searcher.pools)} shards ready, {searcher.total_documents} documents.")
+    return searcher
+
+
+inverted_index_file = 'InvertedIndex.csv'
+stats_file = 'IndexStats.csv'
+if __name__ == "__main__":
+    print("Loading inverted index...")
+    inverted_index, total_documents, segment_ids = read_segmented_index(inverted_index_file, stats_file)
+    build_shards(inverted_index, total_documents, segment_ids=segment_ids)
@@ -0,0 +1,285 @@
+import csv
+import mmap
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from binaryIndex import (HEADER, MAGIC_DIRECTORY, FORMAT_VERSION, MappedFile, _write_array, write_binary_lexicon,
+                         BinaryLexicon)
+from postings import parse_postings, CompressedPostings
+from queryCache import index_generation
+
+# Startup snapshot for fast cold starts of the CSV index (INDEX_FORMAT = 'lazy' in
+# query.py). Parsing every posting list of InvertedIndex.csv before the first query
+# takes minutes on the full corpus; instead the query side maps two small files and
+# parses a posting list the first time a query touches it.
+#
+# Snapshot/Lexicon.bin       the lexicon in the binary format (binary search, no parsing)
+# Snapshot/Directory.bin     term directory of InvertedIndex.csv (see binaryIndex.py):
+#                            where the row of every WordID starts and ends
+# Snapshot/Snapshot.csv      documents in the index and the generation (sizes and
+#                            mtimes) of the CSV files the snapshot was built from
+#
+# The CSV builds (invertedIndex.py, pipeline.py, parallelBuild.py) write the snapshot
+# when they finish, and segments.add_documents refreshes it when it appends words
+# to Lexicon.csv (only the lexicon is rewritten, the term directory is kept). A
+# snapshot that is still out of date at startup is not waited for: query.py loads
+# the CSV index and rebuilds the snapshot in the background.
+
+SNAPSHOT_DIR = 'Snapshot'
+
+# Default memory budget for the parsed posting lists kept by LazyInvertedIndex (bytes)
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Rough memory cost of a parsed posting list: per-list bookkeeping, and per posting
+# the list slots and int objects of its DocID and weight
+TERM_OVERHEAD_BYTES = 300
+POSTING_BYTES = 72
+
+csv.field_size_limit(10000000)
+
+
+# Function to return the snapshot directory that goes with the index files next to index_file
+def snapshot_dir_of(index_file):
+    return os.path.join(os.path.dirname(index_file), SNAPSHOT_DIR)
+
+
+# Function to return the paths of the snapshot files
+def snapshot_files(snapshot_dir):
+    return (os.path.join(snapshot_dir, 'Lexicon.bin'), os.path.join(snapshot_dir, 'Directory.bin'),
+            os.path.join(snapshot_dir, 'Snapshot.csv'))
+
+
+# Function to record where each row of InvertedIndex.csv starts and ends, without
+# parsing the postings; returns (WordIDs, row offsets, row ends) sorted by WordID
+def scan_inverted_index(inverted_index_file):
+    rows = []
+    with open(inverted_index_file, 'rb') as f:
+        f.readline()  # Skip header row
+        offset = f.tell()
+        for line in f:
+            end = offset + len(line)
+            word_id = line[:line.find(b',')]
+            if word_id.isdigit():
+                rows.append((int(word_id), offset, end))
+            offset = end
+    rows.sort()
+    return [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
+
+
+# Function to read the snapshot manifest as {stat: value} (empty if there is none)
+def read_snapshot_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return dict(row for row in csv.reader(f) if len(row) == 2)
+
+
+# Function to tell whether the snapshot was built from the current CSV files
+def snapshot_is_current(lexicon_file, inverted_index_file, stats_file, snapshot_dir=SNAPSHOT_DIR):
+    manifest = read_snapshot_manifest(snapshot_files(snapshot_dir)[2])
+    return manifest.get('Generation') == index_generation([lexicon_file, inverted_index_file, stats_file])
+
+
+# Function to build the snapshot of the CSV index files. The term directory is kept
+# if the inverted index has not changed since it was written (e.g. only new words
+# were appended to the lexicon). Every file is written under a name of its own and
+# swapped in, so concurrent builds and readers never see a partial file.
+def build_snapshot(lexicon_file, inverted_index_file, stats_file, snapshot_dir=SNAPSHOT_DIR):
+    start = time.perf_counter()
+    lexicon_path, directory_path, manifest_path = snapshot_files(snapshot_dir)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    generation = index_generation([lexicon_file, inverted_index_file, stats_file])
+    index_files_generation = index_generation([inverted_index_file, stats_file])
+    manifest = read_snapshot_manifest(manifest_path)
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+    print("Writing lexicon snapshot...")
+    lexicon = {}
+    with open(lexicon_file, 'r', encoding='utf-8', errors='ignore') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header row
+        for row in reader:
+            if len(row) == 2 and row[1].isdigit():
+                lexicon[row[0]] = int(row[1])
+    write_binary_lexicon(lexicon, lexicon_path + suffix)
+    os.replace(lexicon_path + suffix, lexicon_path)
+
+    if manifest.get('IndexGeneration') == index_files_generation and os.path.exists(directory_path):
+        total_documents = int(manifest['Documents'])
+    else:
+        print("Writing term directory...")
+        word_ids, offsets, ends = scan_inverted_index(inverted_index_file)
+        with open(stats_file, 'r', encoding='utf-8') as f:
+            total_documents = int(dict(row for row in csv.reader(f) if len(row) == 2)['Documents'])
+        with open(directory_path + suffix, 'wb') as f:
+            f.write(HEADER.pack(MAGIC_DIRECTORY, FORMAT_VERSION, 0, 0, len(word_ids), total_documents, 0))
+            _write_array(f, 'I', word_ids)
+            _write_array(f, 'Q', offsets)
+            _write_array(f, 'Q', ends)
+        os.replace(directory_path + suffix, directory_path)
+
+    # The manifest is written last, so an interrupted build is never taken as current
+    with open(manifest_path + suffix, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Stat", "Value"])  # Header
+        writer.writerow(["Documents", total_documents])
+        writer.writerow(["Generation", generation])
+        writer.writerow(["IndexGeneration", index_files_generation])
+    os.replace(manifest_path + suffix, manifest_path)
+    print(f"Index snapshot saved to {snapshot_dir} in {time.perf_counter() - start:.2f}s.")
+
+
+# Function to rebuild the snapshot in a background thread; returns the thread
+def build_snapshot_in_background(lexicon_file, inverted_index_file, stats_file, snapshot_dir=SNAPSHOT_DIR):
+    thread = threading.Thread(target=build_snapshot, args=(lexicon_file, inverted_index_file, stats_file, snapshot_dir),
+                              daemon=True)
+    thread.start()
+    return thread
+
+
+# Function to estimate how much memory a parsed posting list holds
+def postings_size_in_bytes(postings):
+    if isinstance(postings, CompressedPostings):
+        return (TERM_OVERHEAD_BYTES + len(postings.data) + postings.last_docs.itemsize * len(postings.last_docs)
+                + postings.offsets.itemsize * len(postings.offsets))
+    return TERM_OVERHEAD_BYTES + POSTING_BYTES * len(postings.doc_ids)
+
+
+class LazyInvertedIndex:
+    """Mapping WordID -> Postings that parses a row of the mapped InvertedIndex.csv
+    the first time its WordID is looked up.
+
+    Parsed lists are kept in an LRU cache whose estimated size stays within
+    memory_budget bytes (the most recently used list is always kept), so a
+    long-running process does not grow back to the full in-memory index. Lists
+    loaded by prefetch (the warm-up) only fill free room and never evict others.
+    """
+
+    def __init__(self, inverted_index_file, directory_file, compress=False, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self._directory = MappedFile(directory_file, MAGIC_DIRECTORY)
+        num_terms, self.num_documents, _ = self._directory.counts
+        self._word_ids = self._directory.next_array('I', num_terms)
+        self._offsets = self._directory.next_array('Q', num_terms)
+        self._ends = self._directory.next_array('Q', num_terms)
+        self._num_terms = num_terms
+        self._file = open(inverted_index_file, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._compress = compress
+        self.memory_budget = memory_budget
+        self._loaded = OrderedDict()  # WordID -> (postings, size in bytes)
+        self._loaded_bytes = 0
+        self._lock = threading.Lock()  # query.py warms posting lists in a background thread
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _find(self, word_id):
+        i = bisect_left(self._word_ids, word_id)
+        if i < self._num_terms and self._word_ids[i] == word_id:
+            return i
+        return -1
+
+    # Function to parse the posting list of the directory entry at position i
+    def _parse(self, i):
+        line = self._mm[self._offsets[i]:self._ends[i]].decode('utf-8', errors='ignore')
+        _, max_weight, text = next(csv.reader([line]))
+        return parse_postings(text, int(max_weight), self._compress)
+
+    def __getitem__(self, word_id):
+        with self._lock:
+            if word_id in self._loaded:
+                self.hits += 1
+                self._loaded.move_to_end(word_id)
+                return self._loaded[word_id][0]
+            self.misses += 1
+        i = self._find(word_id)
+        if i < 0:
+            raise KeyError(word_id)
+
+        # Parsed outside the lock; if two threads parse the same list, the first one stored wins
+        postings = self._parse(i)
+        size = postings_size_in_bytes(postings)
+        with self._lock:
+            if word_id in self._loaded:
+                self._loaded.move_to_end(word_id)
+                return self._loaded[word_id][0]
+            self._loaded[word_id] = (postings, size)
+            self._loaded_bytes += size
+            while self._loaded_bytes > self.memory_budget and len(self._loaded) > 1:
+                _, (_, evicted_size) = self._loaded.popitem(last=False)
+                self._loaded_bytes -= evicted_size
+                self.evictions += 1
+            return postings
+
+    def get(self, word_id, default=None):
+        try:
+            return self[word_id]
+        except KeyError:
+            return default
+
+    # Function to parse a posting list ahead of the queries that need it, if it fits
+    # in the free part of the budget; returns whether the list is loaded
+    def prefetch(self, word_id):
+        with self._lock:
+            if word_id in self._loaded:
+                return True
+        i = self._find(word_id)
+        if i < 0:
+            return False
+        postings = self._parse(i)
+        size = postings_size_in_bytes(postings)
+        with self._lock:
+            if word_id in self._loaded:
+                return True
+            if self._loaded_bytes + size > self.memory_budget:
+                return False
+            # Stored as the least recently used list, so queries evict warm-up lists first
+            self._loaded[word_id] = (postings, size)
+            self._loaded.move_to_end(word_id, last=False)
+            self._loaded_bytes += size
+            return True
+
+    def __contains__(self, word_id):
+        return self._find(word_id) >= 0
+
+    def __len__(self):
+        return self._num_terms
+
+    def __iter__(self):
+        return iter(self._word_ids)
+
+    # Function to report how many parsed posting lists are kept
+    def loaded_terms(self):
+        return len(self._loaded)
+
+    # Function to report the cache statistics
+    def cache_info(self):
+        with self._lock:
+            return {'terms': len(self._loaded), 'bytes': self._loaded_bytes, 'budget': self.memory_budget,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+        self._directory.close()
+
+
+# Function to map the snapshot of the CSV index; returns (lexicon, inverted_index,
+# total_documents), or None if the snapshot is missing or older than the CSV files
+def load_snapshot(lexicon_file, inverted_index_file, stats_file, snapshot_dir=SNAPSHOT_DIR, compress=False,
+                  memory_budget=DEFAULT_MEMORY_BUDGET):
+    if not snapshot_is_current(lexicon_file, inverted_index_file, stats_file, snapshot_dir):
+        return None
+    lexicon_path, directory_path, _ = snapshot_files(snapshot_dir)
+    lexicon = BinaryLexicon(lexicon_path)
+    inverted_index = LazyInvertedIndex(inverted_index_file, directory_path, compress, memory_budget)
+    return lexicon, inverted_index, inverted_index.num_documents
+
+
+lexicon_file = 'Lexicon.csv'
+inverted_index_file = 'InvertedIndex.csv'
+stats_file = 'IndexStats.csv'
+if __name__ == "__main__":
+    build_snapshot(lexicon_file, inverted_index_file, stats_file)
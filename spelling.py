@@ -0,0 +1,188 @@
+import time
+from bisect import bisect_left
+from zlib import crc32
+from binaryIndex import HEADER, MAGIC_SPELLING, FORMAT_VERSION, MappedFile, _write_array
+from autocomplete import read_document_frequencies
+
+# Spelling correction for query words that are not in the lexicon, with a
+# SymSpell-style deletion index (Spelling.bin) built next to Lexicon.csv.
+#
+# The words offered as corrections are those autocomplete offers, one per WordID
+# (see autocomplete.read_document_frequencies), so a correction is a word that
+# occurs in the documents. Every such word is stored under all the strings obtained
+# by deleting up to MAX_EDIT_DISTANCE characters from its first PREFIX_LENGTH
+# characters. Two words within that edit distance share one of these deletion keys,
+# so the candidates of a misspelt word are found by generating its own (few)
+# deletions and looking them up, instead of comparing it with the whole lexicon.
+# The candidates are then checked with the real edit distance (adjacent
+# transpositions count as one edit) and ranked by distance, then by document
+# frequency.
+#
+# Keys are stored as CRC-32 hashes sorted for binary search; a hash collision
+# only adds a candidate that the distance check rejects.
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+
+# Edits allowed by word length: short words are within two edits of too many
+# words for a correction to be meaningful (words of up to 2 characters are never
+# corrected, up to 5 characters get one edit, longer words MAX_EDIT_DISTANCE)
+MIN_WORD_LENGTH = 3
+ONE_EDIT_MAX_LENGTH = 5
+
+
+# Function to return the number of edits allowed when correcting a word
+def allowed_distance(word, max_distance=MAX_EDIT_DISTANCE):
+    if len(word) < MIN_WORD_LENGTH:
+        return 0
+    if len(word) <= ONE_EDIT_MAX_LENGTH:
+        return min(1, max_distance)
+    return max_distance
+
+
+# Function to return the strings obtained by deleting up to max_distance characters from word
+def deletions(word, max_distance=MAX_EDIT_DISTANCE):
+    keys = {word}
+    level = {word}
+    for _ in range(max_distance):
+        level = {variant[:i] + variant[i + 1:] for variant in level for i in range(len(variant))}
+        keys.update(level)
+    return keys
+
+
+# Function to compute the edit distance between two words (insertions, deletions,
+# substitutions and adjacent transpositions); returns max_distance + 1 as soon as
+# the distance is known to exceed max_distance
+def edit_distance(source, target, max_distance=MAX_EDIT_DISTANCE):
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+    # Skip the common prefix and suffix, which cost nothing
+    start = 0
+    while start < len(source) and start < len(target) and source[start] == target[start]:
+        start += 1
+    source, target = source[start:], target[start:]
+    while source and target and source[-1] == target[-1]:
+        source, target = source[:-1], target[:-1]
+    if not source or not target:
+        return len(source) + len(target)
+
+    # Only cells within max_distance of the diagonal can stay within max_distance
+    too_far = max_distance + 1
+    previous2 = None
+    previous = [j if j <= max_distance else too_far for j in range(len(target) + 1)]
+    for i in range(1, len(source) + 1):
+        current = [i if i <= max_distance else too_far] + [too_far] * len(target)
+        for j in range(max(1, i - max_distance), min(len(target), i + max_distance) + 1):
+            cost = source[i - 1] != target[j - 1]
+            distance = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (cost and previous2 is not None and j > 1 and source[i - 1] == target[j - 2]
+                    and source[i - 2] == target[j - 1] and previous2[j - 2] + 1 < distance):
+                distance = previous2[j - 2] + 1
+            current[j] = distance
+        if min(current) > max_distance:
+            return too_far
+        previous2, previous = previous, current
+    return min(previous[-1], too_far)
+
+
+# Function to build Spelling.bin from the document frequency of every correction word
+def build_spelling_index(frequencies, output_file, max_distance=MAX_EDIT_DISTANCE, prefix_length=PREFIX_LENGTH):
+    start = time.perf_counter()
+    words = sorted(frequencies)
+    print(f"Generating deletion keys for {len(words)} words...")
+
+    # (key hash << 32 | word number), sorted so the words of a key are contiguous
+    keys = []
+    for number, word in enumerate(words):
+        keys.extend(crc32(key.encode('utf-8')) << 32 | number for key in deletions(word[:prefix_length], max_distance))
+        if number % 100000 == 0:
+            print(f"Processed {number} words...")
+    keys.sort()
+
+    blob = [word.encode('utf-8') for word in words]
+    offsets = [0]
+    for word in blob:
+        offsets.append(offsets[-1] + len(word))
+
+    with open(output_file, 'wb') as f:
+        f.write(HEADER.pack(MAGIC_SPELLING, FORMAT_VERSION, 0, max_distance << 16 | prefix_length,
+                            len(words), len(keys), offsets[-1]))
+        _write_array(f, 'I', offsets)
+        _write_array(f, 'I', (frequencies[word] for word in words))
+        _write_array(f, 'I', (key >> 32 for key in keys))
+        _write_array(f, 'I', (key & 0xFFFFFFFF for key in keys))
+        f.write(b''.join(blob))
+    print(f"Spelling index of {len(keys)} keys saved to {output_file} in {time.perf_counter() - start:.2f}s.")
+
+
+class SpellingIndex:
+    """Correction candidates of a word over a memory-mapped Spelling.bin."""
+
+    def __init__(self, path):
+        self._file = MappedFile(path, MAGIC_SPELLING)
+        num_words, num_keys, blob_size = self._file.counts
+        self.max_distance = self._file.reserved >> 16
+        self.prefix_length = self._file.reserved & 0xFFFF
+        self._offsets = self._file.next_array('I', num_words + 1)
+        self._frequencies = self._file.next_array('I', num_words)
+        self._key_hashes = self._file.next_array('I', num_keys)
+        self._key_words = self._file.next_array('I', num_keys)
+        self._blob = self._file.next_bytes(blob_size)
+        self._num_words = num_words
+        self._num_keys = num_keys
+
+    def __len__(self):
+        return self._num_words
+
+    def _word_at(self, i):
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes().decode('utf-8')
+
+    # Function to return up to n (word, edit distance, document frequency) candidates
+    # for a word, closest first and most frequent first among equally close ones
+    def lookup(self, word, n=1, max_distance=None):
+        if max_distance is None:
+            max_distance = allowed_distance(word, self.max_distance)
+        max_distance = min(max_distance, self.max_distance)
+        numbers = set()
+        for key in deletions(word[:self.prefix_length], max_distance):
+            key_hash = crc32(key.encode('utf-8'))
+            i = bisect_left(self._key_hashes, key_hash)
+            while i < self._num_keys and self._key_hashes[i] == key_hash:
+                numbers.add(self._key_words[i])
+                i += 1
+
+        candidates = []
+        for number in numbers:
+            candidate = self._word_at(number)
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                candidates.append((distance, -self._frequencies[number], candidate))
+        return [(candidate, distance, -frequency) for distance, frequency, candidate in sorted(candidates)[:n]]
+
+    # Function to map each query word missing from the lexicon to up to n corrections
+    # (words without a close enough lexicon word are left out)
+    def correct(self, words, lexicon, n=1):
+        corrections = {}
+        for word in words:
+            if word in corrections or allowed_distance(word, self.max_distance) == 0 or lexicon.get(word) is not None:
+                continue
+            candidates = self.lookup(word, n)
+            if candidates:
+                corrections[word] = [candidate for candidate, _, _ in candidates]
+        return corrections
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+lexicon_file = 'Lexicon.csv'
+inverted_index_file = 'InvertedIndex.csv'
+output_file = 'Spelling.bin'
+if __name__ == "__main__":
+    build_spelling_index(read_document_frequencies(lexicon_file, inverted_index_file), output_file)
@@ -0,0 +1,73 @@
+import csv
+import random
+from itertools import accumulate
+
+# Deterministic synthetic corpus in the layout of the Medium dataset (title, text,
+# url, authors, timestamp, tags), so the build and query benchmarks run offline at
+# any size without the Kaggle download.
+#
+# Words are made-up syllable strings ranked by a Zipfian distribution (the r-th
+# most common word has probability proportional to 1 / r^s), which gives the
+# skewed posting list lengths of real text: a few huge lists and a long tail of
+# rare words. The same seed and sizes always produce the same file.
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'po', 'da', 'fi', 'gu', 'he', 'ja',
+             'bo', 'cu', 'ly', 'qu', 'wa', 'xe', 'yo', 'ar', 'en', 'is', 'on', 'ur', 'st', 'tr', 'pl']
+
+# Default corpus shape
+VOCABULARY_SIZE = 50000
+TAG_VOCABULARY_SIZE = 2000
+AUTHOR_COUNT = 5000
+ZIPF_EXPONENT = 1.1
+
+
+# Function to make the n-th distinct pseudo-word (shorter words for common ranks)
+def make_word(n):
+    syllables = []
+    n += 1
+    while n:
+        n, digit = divmod(n - 1, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+    return ''.join(syllables)
+
+
+# Function to return cumulative Zipfian weights for ranks 1..size
+def zipf_weights(size, exponent=ZIPF_EXPONENT):
+    return list(accumulate(1.0 / rank ** exponent for rank in range(1, size + 1)))
+
+
+# Function to write a synthetic dataset with num_documents rows
+def generate_corpus(output_file, num_documents, vocabulary_size=VOCABULARY_SIZE, exponent=ZIPF_EXPONENT, seed=42,
+                    mean_text_words=300):
+    rng = random.Random(seed)
+    vocabulary = [make_word(n) for n in range(vocabulary_size)]
+    weights = zipf_weights(vocabulary_size, exponent)
+    tags = vocabulary[:TAG_VOCABULARY_SIZE]
+    tag_weights = zipf_weights(len(tags), exponent)
+    authors = [f"{make_word(rng.randrange(vocabulary_size)).title()} {make_word(rng.randrange(vocabulary_size)).title()}"
+               for _ in range(AUTHOR_COUNT)]
+
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['title', 'text', 'url', 'authors', 'timestamp', 'tags'])  # Header
+        for doc_id in range(num_documents):
+            title = ' '.join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(3, 10)))
+            words = rng.choices(vocabulary, cum_weights=weights, k=max(1, int(rng.expovariate(1 / mean_text_words))))
+            # Break the text into sentences and paragraphs so cleaning has punctuation to strip
+            sentences = [' '.join(words[i:i + 15]).capitalize() for i in range(0, len(words), 15)]
+            text = '.\n\n'.join('. '.join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)) + '.'
+            writer.writerow([
+                title.title(),
+                text,
+                f"https://medium.com/p/synthetic-{doc_id}",
+                str(rng.sample(authors, rng.randint(1, 2))),
+                f"2021-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 00:00:00+00:00",
+                str(rng.choices(tags, cum_weights=tag_weights, k=rng.randint(1, 5))),
+            ])
+    print(f"Synthetic corpus with {num_documents} documents saved to {output_file}.")
+
+
+output_file = 'Dataset.csv'
+num_documents = 50000
+if __name__ == "__main__":
+    generate_corpus(output_file, num_documents)
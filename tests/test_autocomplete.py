@@ -0,0 +1,62 @@
+import csv
+from lexicon import add_to_lexicon, write_lexicon
+from tokenizer import index_terms
+from autocomplete import read_document_frequencies, Autocomplete
+from spelling import build_spelling_index, SpellingIndex
+
+DOCUMENTS = [
+    'neural networks',
+    'networks of graphs',
+    'a graph and graphs',
+    'graph data',
+]
+
+
+# Function to write Lexicon.csv and InvertedIndex.csv for the documents the way the
+# builders do (every surface form mapped to its root's WordID)
+def write_index(tmp_path):
+    lexicon = {}
+    current_id = 1
+    postings = {}
+    for doc_id, text in enumerate(DOCUMENTS):
+        for word in index_terms(text):
+            current_id = add_to_lexicon(lexicon, word, current_id)
+            postings.setdefault(lexicon[word], set()).add(doc_id)
+    write_lexicon(lexicon, str(tmp_path / 'Lexicon.csv'))
+    with open(tmp_path / 'InvertedIndex.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["WordID", "MaxWeight", "Postings"])
+        for word_id in sorted(postings):
+            writer.writerow([word_id, 1, ",".join(f"{doc_id}:1" for doc_id in sorted(postings[word_id]))])
+    return lexicon
+
+
+def test_unseen_inflection_is_not_suggested(tmp_path):
+    lexicon = write_index(tmp_path)
+    # The root 'network' is in the lexicon although only 'networks' occurs
+    assert lexicon['network'] == lexicon['networks']
+    frequencies = read_document_frequencies(str(tmp_path / 'Lexicon.csv'), str(tmp_path / 'InvertedIndex.csv'))
+    assert 'network' not in frequencies
+    assert frequencies['networks'] == 2
+
+    # One suggestion per WordID: 'graph' and 'graphs' share theirs
+    assert len([word for word in frequencies if word.startswith('graph')]) == 1
+    assert len(frequencies) == len(set(lexicon[word] for word in frequencies))
+
+    autocomplete = Autocomplete(frequencies)
+    assert autocomplete.complete('netw') == [('networks', 2)]
+    assert autocomplete.complete('gr') == [('graphs', 3)]
+
+    build_spelling_index(frequencies, str(tmp_path / 'Spelling.bin'))
+    with SpellingIndex(str(tmp_path / 'Spelling.bin')) as speller:
+        assert speller.lookup('network', 3) == [('networks', 1, 2)]
+
+
+def test_negative_count_returns_nothing():
+    frequencies = {f"word{i:03d}": i for i in range(40)}
+    autocomplete = Autocomplete(frequencies, scan_limit=10)
+    assert autocomplete.complete('word', 3) == [('word039', 39), ('word038', 38), ('word037', 37)]
+    assert 'word' in autocomplete._top and 'word03' not in autocomplete._top
+    # Precomputed and scanned prefixes alike
+    assert autocomplete.complete('word', -3) == []
+    assert autocomplete.complete('word03', -3) == []
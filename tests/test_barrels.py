@@ -0,0 +1,67 @@
+import csv
+import os
+import random
+import threading
+from barrels import create_barrels, BarrelIndex
+
+
+def write_forward_index(path, rng, total_documents=300, vocabulary=400):
+    expected = {}
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["DocID", "Details", "FieldFreqs"])
+        for doc_id in range(total_documents):
+            word_ids = sorted(rng.sample(range(1, vocabulary + 1), rng.randint(0, 20)))
+            counts = [tuple(rng.randint(0, 3) for _ in range(4)) for _ in word_ids]
+            weights = [rng.randint(1, 40) for _ in word_ids]
+            writer.writerow([doc_id, ",".join(f"{w}:{weight}" for w, weight in zip(word_ids, weights)),
+                             ",".join(":".join(map(str, c)) for c in counts)])
+            for word_id, weight, c in zip(word_ids, weights, counts):
+                expected.setdefault(word_id, []).append((doc_id, weight, c))
+    return expected
+
+
+def test_barrels_built_in_passes_match_single_pass(tmp_path):
+    rng = random.Random(8)
+    forward_index_file = str(tmp_path / 'ForwardIndex.csv')
+    expected = write_forward_index(forward_index_file, rng)
+
+    create_barrels(forward_index_file, str(tmp_path / 'one'), barrel_size=50)
+    create_barrels(forward_index_file, str(tmp_path / 'passes'), barrel_size=50, memory_limit=1)
+    for file_name in sorted(os.listdir(tmp_path / 'one')):
+        with open(tmp_path / 'one' / file_name, 'rb') as one, open(tmp_path / 'passes' / file_name, 'rb') as passes:
+            assert one.read() == passes.read(), file_name
+
+    index = BarrelIndex(str(tmp_path / 'passes'))
+    assert index.num_documents == 300
+    for word_id, postings in expected.items():
+        assert list(index[word_id].doc_ids) == [doc_id for doc_id, _, _ in postings]
+        assert list(index[word_id].weights) == [weight for _, weight, _ in postings]
+        assert list(index.field_frequencies(word_id)) == [count for _, _, c in postings for count in c]
+    assert 401 not in index
+
+
+def test_concurrent_lookups_share_one_barrel(tmp_path):
+    rng = random.Random(9)
+    forward_index_file = str(tmp_path / 'ForwardIndex.csv')
+    expected = write_forward_index(forward_index_file, rng)
+    create_barrels(forward_index_file, str(tmp_path / 'barrels'), barrel_size=50)
+
+    index = BarrelIndex(str(tmp_path / 'barrels'))
+    word_ids = sorted(expected)
+    errors = []
+
+    def lookups():
+        for word_id in word_ids:
+            if list(index[word_id].doc_ids) != [doc_id for doc_id, _, _ in expected[word_id]]:
+                errors.append(word_id)
+
+    threads = [threading.Thread(target=lookups) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    info = index.cache_info()
+    assert info['loaded'] == info['barrels'] == 8
+    assert info['bytes'] == sum(size for _, size in index._cache.values())
@@ -0,0 +1,62 @@
+import csv
+import random
+from math import log10
+import pytest
+from postings import Postings
+from topK import QueryTerm, top_k_exhaustive
+from tokenizer import query_words
+from batchScoring import BatchScorer
+
+
+def test_batch_scores_equal_exhaustive_ranking(tmp_path):
+    rng = random.Random(14)
+    total_documents = 400
+    num_words = 15
+    # Few distinct weights, so many documents tie
+    documents = [{word_id: rng.randint(1, 3) for word_id in rng.sample(range(1, num_words + 1), rng.randint(0, 5))}
+                 for _ in range(total_documents)]
+    # A word in every document has IDF 0, so its documents score exactly 0
+    everywhere = num_words + 2
+    for weights in documents:
+        weights[everywhere] = 1
+    forward_index_file = str(tmp_path / 'ForwardIndex.csv')
+    with open(forward_index_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["DocID", "Details", "FieldFreqs"])
+        for doc_id, weights in enumerate(documents):
+            word_ids = sorted(weights)
+            writer.writerow([doc_id, ",".join(f"{w}:{weights[w]}" for w in word_ids),
+                             ",".join("0:0:0:1" for _ in word_ids)])
+
+    inverted_index = {}
+    for doc_id, weights in enumerate(documents):
+        for word_id, weight in weights.items():
+            inverted_index.setdefault(word_id, ([], []))
+            inverted_index[word_id][0].append(doc_id)
+            inverted_index[word_id][1].append(weight)
+    # Lexicon keys go through the query tokenizer, as the words of a query do; WordID
+    # num_words + 1 has no postings
+    words = {word_id: query_words(f"term{word_id}")[0] for word_id in range(1, num_words + 3)}
+    lexicon = {word: word_id for word_id, word in words.items()}
+
+    scorer = BatchScorer(forward_index_file, lexicon)
+    queries = []
+    expected = []
+    for _ in range(300):
+        query = [rng.randint(1, num_words + 2) for _ in range(rng.randint(1, 3))]  # Repeats included
+        queries.append(" ".join(words[word_id] for word_id in query))
+        terms = [QueryTerm(word_id, Postings(*inverted_index[word_id], max(inverted_index[word_id][1])),
+                           log10(total_documents / len(inverted_index[word_id][0])))
+                 for word_id in query if word_id in inverted_index]
+        expected.append(terms)
+    queries.append("the of")  # Only stop words
+    expected.append([])
+
+    for k in (1, 5, 50):
+        # Small batches, so queries are split over several products
+        results = scorer.score(queries, k, batch_size=64)
+        assert len(results) == len(queries)
+        for query, terms, ranking in zip(queries, expected, results):
+            reference = top_k_exhaustive(terms, k)
+            assert [doc_id for doc_id, _ in ranking] == [doc_id for doc_id, _ in reference], query
+            assert [score for _, score in ranking] == pytest.approx([score for _, score in reference]), query
@@ -0,0 +1,106 @@
+import random
+import pytest
+from postings import Postings, CompressedPostings
+from booleanQuery import (parse_boolean_query, evaluate_boolean_query, intersect, format_boolean_query,
+                          is_boolean_query)
+from query import fetch_top_documents
+
+WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'echo']
+
+
+# Function to evaluate a tree with Python sets, the reference semantics
+def evaluate_sets(node, documents):
+    if node[0] == 'term':
+        return documents.get(node[1], set())
+    if node[0] == 'or':
+        return set().union(*(evaluate_sets(child, documents) for child in node[1]))
+    positives = [evaluate_sets(child, documents) for child in node[1] if child[0] != 'not']
+    negatives = [evaluate_sets(child[1], documents) for child in node[1] if child[0] == 'not']
+    return set.intersection(*positives) - set().union(*negatives)
+
+
+def random_query(rng, depth=0):
+    parts = []
+    for i in range(rng.randint(1, 3)):
+        if i:
+            parts.append(rng.choice(['AND', 'OR', '']))
+        if rng.random() < 0.2:
+            parts.append('NOT')
+        if depth < 2 and rng.random() < 0.3:
+            parts.append(f"({random_query(rng, depth + 1)})")
+        else:
+            parts.append(rng.choice(WORDS))
+    return ' '.join(part for part in parts if part)
+
+
+def terms_of(node):
+    if node[0] == 'term':
+        return {node[1]}
+    if node[0] == 'not':
+        return terms_of(node[1])
+    return set().union(*(terms_of(child) for child in node[1]))
+
+
+def test_boolean_evaluation_equals_set_semantics():
+    rng = random.Random(4)
+    evaluated = 0
+    for trial in range(500):
+        tree = parse_boolean_query(random_query(rng))
+        if tree is None:
+            continue
+        # Words are normalized by the parser, so the postings are keyed by the parsed words
+        documents = {word: set(rng.sample(range(300), rng.choice([0, 3, 30, 150, 290]))) for word in terms_of(tree)}
+        postings_by_word = {}
+        for word, doc_ids in documents.items():
+            doc_ids = sorted(doc_ids)
+            if trial % 2 and doc_ids:
+                postings_by_word[word] = CompressedPostings.from_lists(doc_ids, [1] * len(doc_ids), 1, 8)
+            else:
+                postings_by_word[word] = Postings(doc_ids, [1] * len(doc_ids), 1)
+        try:
+            result = evaluate_boolean_query(tree, postings_by_word)
+        except ValueError:
+            # Only NOT clauses with nothing to subtract them from are rejected
+            assert 'NOT' in format_boolean_query(tree)
+            continue
+        assert result == sorted(evaluate_sets(tree, documents))
+        evaluated += 1
+    assert evaluated > 300
+
+
+def test_intersect_with_negation():
+    a = Postings([1, 3, 5, 7, 9, 11], None, 0)
+    b = Postings([3, 4, 5, 9, 11, 20], None, 0)
+    c = Postings([5, 11], None, 0)
+    assert intersect([a, b]) == [3, 5, 9, 11]
+    assert intersect([a, b], [c]) == [3, 9]
+    assert intersect([a, Postings([], None, 0)]) == []
+
+
+def test_not_only_query_is_rejected():
+    tree = parse_boolean_query('NOT alpha')
+    with pytest.raises(ValueError):
+        evaluate_boolean_query(tree, {})
+
+
+class ListStore:
+    """Document store stand-in returning the DocID as the document."""
+
+    bytes_read = 0
+
+    def get(self, doc_id, fields=None):
+        return {'url': str(doc_id)}
+
+
+def test_parentheses_without_operator_rank_like_plain_query():
+    assert not is_boolean_query('python (programming) tutorial')
+    assert is_boolean_query('python AND (programming OR tutorial)')
+    lexicon = {'python': 1, 'programming': 2, 'tutorial': 3}
+    inverted_index = {1: Postings([0, 1, 2], [3, 1, 2], 3), 2: Postings([1, 3], [2, 5], 5),
+                      3: Postings([2, 4], [1, 1], 1)}
+    plain = fetch_top_documents('python programming tutorial', lexicon, inverted_index, 5, ListStore(), 5,
+                                verbose=False)
+    # Ranked over the union like the plain query, not intersected
+    assert len(plain) == 5
+    assert fetch_top_documents('python (programming) tutorial', lexicon, inverted_index, 5, ListStore(), 5,
+                               verbose=False) == plain
@@ -0,0 +1,58 @@
+import random
+import numpy as np
+import pandas as pd
+from clean import clean_chunk, clean_text_column, clean_list_column
+
+PIECES = ['Deep', 'LEARNING', 'naïve', 'Ünïcode', 'snake_case', "O'Brien", 'e-mail', '3.14', '—', '...',
+          '  ', '\t', '\n', 'C++', '日本語', '½', '[', ']', '"', "'", ',', 'α-β', 'x²', '']
+
+
+def random_text(rng):
+    return ''.join(rng.choice(PIECES + [' ']) for _ in range(rng.randint(0, 12)))
+
+
+def random_list(rng):
+    items = [random_text(rng) for _ in range(rng.randint(0, 4))]
+    return '[' + ', '.join(repr(item) for item in items) + ']'
+
+
+def values(rng, generate):
+    return [np.nan if rng.random() < 0.15 else generate(rng) for _ in range(300)]
+
+
+def assert_same(cleaned, expected):
+    assert len(cleaned) == len(expected)
+    for value, reference in zip(cleaned, expected):
+        if pd.isnull(reference):
+            assert pd.isnull(value)
+        else:
+            assert value == reference, (value, reference)
+
+
+def test_clean_chunk_matches_legacy_cleaners():
+    rng = random.Random(11)
+    raw = pd.DataFrame({
+        'title': values(rng, random_text),
+        'text': values(rng, random_text),
+        'tags': values(rng, random_list),
+        'authors': values(rng, random_list),
+        'url': values(rng, random_text),
+    })
+    # Empty lists, empty strings and all-missing rows
+    raw.loc[len(raw)] = ['', '', '[]', '[]', 'u']
+    raw.loc[len(raw)] = [np.nan, np.nan, "['']", '[ ]', np.nan]
+    raw.loc[len(raw)] = ['', '', '', '', '']
+
+    cleaned = clean_chunk(raw.copy())
+    for col in ('title', 'text'):
+        assert_same(cleaned[col].tolist(), raw[col].map(clean_text_column).tolist())
+    for col in ('tags', 'authors'):
+        assert_same(cleaned[col].tolist(), raw[col].map(clean_list_column).tolist())
+    assert_same(cleaned['url'].tolist(), raw['url'].tolist())
+
+
+def test_clean_chunk_handles_missing_columns_and_all_missing_values():
+    raw = pd.DataFrame({'title': [np.nan, np.nan], 'tags': [None, np.nan]})
+    cleaned = clean_chunk(raw.copy())
+    assert list(cleaned.columns) == ['title', 'tags']
+    assert cleaned.isnull().all().all()
@@ -0,0 +1,62 @@
+import random
+from array import array
+import topK
+from fieldIndex import FieldIndex, write_field_index, NUM_FIELDS, FIELDS
+from topK import top_k_exhaustive, top_k_maxscore
+
+
+def write_random_field_index(rng, path, num_documents=400, num_terms=12):
+    terms = {}
+    field_lengths = array('I')
+    for word_id in range(1, num_terms + 1):
+        size = rng.choice([1, 5, 40, num_documents // 2, num_documents])
+        doc_ids = sorted(rng.sample(range(num_documents), size))
+        counts = array('H')
+        for _ in doc_ids:
+            # Some fields empty, small counts so tied scores happen
+            posting = [rng.choice([0, 0, 1, 2, 5]) for _ in range(NUM_FIELDS)]
+            if not any(posting):
+                posting[3] = 1
+            counts.extend(posting)
+        terms[word_id] = (array('I', doc_ids), counts)
+    for _ in range(num_documents):
+        field_lengths.extend(rng.choice([0, 1, 3, 10, 200]) for _ in range(NUM_FIELDS))
+    # A field length is at least the count of every term in it
+    for doc_ids, counts in terms.values():
+        for posting, doc_id in enumerate(doc_ids):
+            for field in range(NUM_FIELDS):
+                j = doc_id * NUM_FIELDS + field
+                field_lengths[j] = max(field_lengths[j], counts[posting * NUM_FIELDS + field])
+    write_field_index(terms, field_lengths, num_documents, path)
+    return terms
+
+
+def test_bm25f_maxscore_equals_exhaustive(tmp_path, monkeypatch):
+    # Prune from the first documents on, rather than handing these short lists to
+    # top_k_exhaustive
+    monkeypatch.setattr(topK, 'MAXSCORE_MIN_POSTINGS', 0)
+    monkeypatch.setattr(topK, 'MAXSCORE_WINDOW', 1)
+    monkeypatch.setattr(topK, 'MAXSCORE_ESSENTIAL_SHARE', 1.0)
+    rng = random.Random(12)
+    path = str(tmp_path / 'FieldIndex.bin')
+    terms = write_random_field_index(rng, path)
+    settings = [
+        ({'title': 4.0, 'authors': 3.0, 'tags': 2.0, 'text': 1.0}, {field: 0.75 for field in FIELDS}),
+        ({field: 1.0 for field in FIELDS}, {field: 0.0 for field in FIELDS}),
+        ({'title': 10.0, 'authors': 0.5, 'tags': 2.0, 'text': 1.0}, {'title': 1.0, 'authors': 0.3, 'tags': 0.0,
+                                                                      'text': 0.9}),
+    ]
+    for boosts, b in settings:
+        with FieldIndex(path, boosts, b) as field_index:
+            query_terms = {word_id: field_index.term(word_id, field_index.get(word_id), field_index.num_documents)
+                           for word_id in terms}
+            # The stored bounds hold for every posting of the term
+            for term in query_terms.values():
+                assert max(term.score(posting) for posting in term.postings.weights) <= term.upper_bound()
+
+            for _ in range(150):
+                query = [query_terms[rng.choice(list(terms))] for _ in range(rng.randint(1, 5))]
+                for k in (1, 5, 20):
+                    assert top_k_maxscore(query, k) == top_k_exhaustive(query, k)
+            # The postings are views of the mapped file, released before it is closed
+            del query_terms, query, term
@@ -0,0 +1,46 @@
+import random
+import pandas as pd
+import forwardIndex
+import invertedIndex
+from lexicon import build_lexicon
+from parallelBuild import build_index_parallel
+
+WORDS = ['learning', 'learned', 'learns', 'deep', 'network', 'networks', 'python', 'data', 'science',
+         'running', 'runs', 'ran', 'model', 'models', 'graph', 'the', 'of', 'and', 'vision', 'robot']
+
+
+def random_text(rng, max_words):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, max_words)))
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_parallel_build_matches_serial_build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rng = random.Random(10)
+    dataset = pd.DataFrame({
+        'title': [random_text(rng, 6) for _ in range(60)],
+        'tags': [random_text(rng, 3) for _ in range(60)],
+        'authors': [random_text(rng, 2) for _ in range(60)],
+        'text': [random_text(rng, 40) for _ in range(60)],
+    })
+    dataset.to_csv('CleanedDataset.csv', index=False)
+
+    for output_format, extension in (('csv', 'csv'), ('binary', 'bin')):
+        build_lexicon('CleanedDataset.csv', f'Lexicon.{extension}', output_format)
+        forwardIndex.main(f'Lexicon.{extension}', 'CleanedDataset.csv', f'ForwardIndex.{extension}', output_format)
+        invertedIndex.main(f'Lexicon.{extension}', 'CleanedDataset.csv', f'InvertedIndex.{extension}',
+                           'IndexStats.csv', output_format)
+        # Chunks much smaller than the corpus, so the merge of several partial lexicons is exercised
+        build_index_parallel('CleanedDataset.csv', f'ParallelLexicon.{extension}', f'ParallelForward.{extension}',
+                             f'ParallelInverted.{extension}', 'ParallelStats.csv', workers=2, chunk_size=7,
+                             output_format=output_format)
+
+        assert read_bytes(f'ParallelLexicon.{extension}') == read_bytes(f'Lexicon.{extension}')
+        assert read_bytes(f'ParallelForward.{extension}') == read_bytes(f'ForwardIndex.{extension}')
+        assert read_bytes(f'ParallelInverted.{extension}') == read_bytes(f'InvertedIndex.{extension}')
+        if output_format == 'csv':
+            assert read_bytes('ParallelStats.csv') == read_bytes('IndexStats.csv')
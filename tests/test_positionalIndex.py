@@ -0,0 +1,138 @@
+import random
+import pandas as pd
+from lexicon import add_to_lexicon, write_lexicon
+from postings import Postings
+from topK import QueryTerm
+from tokenizer import tokenize, query_phrases, STOP_WORDS
+from positionalIndex import (build_positional_index, PositionalIndex, top_k_phrase, proximity_rerank,
+                             FIELD_COLUMNS, FIELD_GAP, PROXIMITY_WEIGHT)
+
+WORDS = ['deep', 'learning', 'state', 'art', 'graph', 'robot', 'vision', 'data']
+FILLERS = ['of', 'the', 'and', 'a']
+
+
+# Function to write the documents as a cleaned dataset with its lexicon and build
+# Positions.bin from them; returns the lexicon
+def build_index(tmp_path, documents):
+    lexicon = {}
+    current_id = 1
+    for document in documents:
+        for col in FIELD_COLUMNS:
+            for word in tokenize(document.get(col)):
+                if word not in STOP_WORDS:
+                    current_id = add_to_lexicon(lexicon, word, current_id)
+    pd.DataFrame(documents, columns=FIELD_COLUMNS).to_csv(tmp_path / 'CleanedDataset.csv', index=False)
+    write_lexicon(lexicon, str(tmp_path / 'Lexicon.csv'))
+    build_positional_index(str(tmp_path / 'CleanedDataset.csv'), str(tmp_path / 'Lexicon.csv'),
+                           str(tmp_path / 'Positions.bin'))
+    return lexicon
+
+
+# Function to resolve the quoted phrases of a query the way query.py does
+def resolve_phrases(query, lexicon):
+    return [[(offset, lexicon[word]) for offset, word in phrase] for phrase in query_phrases(query)]
+
+
+# Function to rank the phrase matches with postings of weight 1 for every word
+def phrase_matches(documents, lexicon, index, query, k=1000):
+    phrases = resolve_phrases(query, lexicon)
+    word_ids = list(dict.fromkeys(word_id for phrase in phrases for _, word_id in phrase))
+    terms = []
+    for word_id in word_ids:
+        doc_ids = [doc_id for doc_id, document in enumerate(documents)
+                   if any(lexicon.get(word) == word_id for col in FIELD_COLUMNS for word in tokenize(document.get(col)))]
+        terms.append(QueryTerm(word_id, Postings(doc_ids, [1] * len(doc_ids), 1), 1.0))
+    return [doc_id for doc_id, _ in top_k_phrase(terms, phrases, index, k)]
+
+
+def test_phrase_does_not_span_fields(tmp_path):
+    documents = [
+        {'title': 'deep', 'authors': 'learning', 'tags': 'graph', 'text': 'robot'},
+        {'title': 'deep learning', 'authors': 'vision', 'tags': 'graph', 'text': 'robot'},
+        {'title': 'vision', 'authors': 'graph', 'tags': 'robot deep', 'text': 'learning data'},
+    ]
+    lexicon = build_index(tmp_path, documents)
+    with PositionalIndex(str(tmp_path / 'Positions.bin')) as index:
+        assert phrase_matches(documents, lexicon, index, '"deep learning"') == [1]
+        assert phrase_matches(documents, lexicon, index, '"robot deep"') == [2]
+        assert phrase_matches(documents, lexicon, index, '"graph robot"') == []
+        # Positions of the second field start FIELD_GAP after the end of the first
+        deep, learning = index.get(lexicon['deep']), index.get(lexicon['learning'])
+        assert deep.get(0) == [0] and learning.get(0) == [1 + FIELD_GAP]
+
+
+def test_phrase_keeps_stop_word_gaps(tmp_path):
+    documents = [
+        {'text': 'state of the art'},
+        {'text': 'state art'},
+        {'text': 'state of art'},
+        {'text': 'state and the art robot'},
+    ]
+    lexicon = build_index(tmp_path, documents)
+    with PositionalIndex(str(tmp_path / 'Positions.bin')) as index:
+        # Stop words are not indexed, so any two words fill the gap
+        assert phrase_matches(documents, lexicon, index, '"state of the art"') == [0, 3]
+        assert phrase_matches(documents, lexicon, index, '"state art"') == [1]
+        assert phrase_matches(documents, lexicon, index, '"state of art"') == [2]
+
+
+def test_proximity_rerank_formula(tmp_path):
+    documents = [
+        {'text': 'deep learning'},
+        {'text': 'deep data data learning'},
+        {'title': 'deep', 'text': 'vision learning'},
+        {'text': 'deep'},
+    ]
+    lexicon = build_index(tmp_path, documents)
+    terms = [QueryTerm(lexicon['deep'], Postings([0, 1, 2, 3], [1, 1, 1, 1], 1), 1.0),
+             QueryTerm(lexicon['learning'], Postings([0, 1, 2], [1, 1, 1], 1), 1.0)]
+    ranked = [(3, 3.0), (2, 2.0), (1, 2.0), (0, 2.0)]
+    with PositionalIndex(str(tmp_path / 'Positions.bin')) as index:
+        reranked = proximity_rerank(terms, ranked, index, 4)
+    # Title 'deep' at 0; the empty authors and tags fields still add their gaps, so text
+    # 'vision learning' starts at 1 + 3 * FIELD_GAP
+    span_2 = 1 + 3 * FIELD_GAP + 1
+    assert reranked == sorted([
+        (0, 2.0 * (1 + PROXIMITY_WEIGHT * 1 / 1)),
+        (1, 2.0 * (1 + PROXIMITY_WEIGHT * 1 / 3)),
+        (2, 2.0 * (1 + PROXIMITY_WEIGHT * 1 / span_2)),
+        (3, 3.0),  # A document holding one of the terms keeps its score
+    ], key=lambda x: (-x[1], x[0]))
+
+
+# Function to check a phrase against the tokens of each field, the reference for the
+# position intersection: every indexed word of the phrase at its offset in one field
+def phrase_in_document(phrase, document, lexicon):
+    for col in FIELD_COLUMNS:
+        word_ids = [lexicon.get(word) if word not in STOP_WORDS else None for word in tokenize(document.get(col))]
+        for start in range(len(word_ids)):
+            if all(start + offset < len(word_ids) and word_ids[start + offset] == word_id
+                   for offset, word_id in phrase):
+                return True
+    return False
+
+
+def random_field(rng, max_words):
+    return ' '.join(rng.choice(WORDS + FILLERS) for _ in range(rng.randint(0, max_words)))
+
+
+def test_phrase_search_matches_brute_force(tmp_path):
+    rng = random.Random(13)
+    documents = [{col: random_field(rng, 12 if col == 'text' else 3) for col in FIELD_COLUMNS} for _ in range(200)]
+    lexicon = build_index(tmp_path, documents)
+    matched = 0
+    with PositionalIndex(str(tmp_path / 'Positions.bin')) as index:
+        for _ in range(300):
+            phrases = ['"' + ' '.join(rng.choice(WORDS + FILLERS) for _ in range(rng.randint(2, 4))) + '"'
+                       for _ in range(rng.randint(1, 2))]
+            query = ' '.join(phrases)
+            resolved = resolve_phrases(query, lexicon)
+            if not resolved or any(word_id is None for phrase in resolved for _, word_id in phrase):
+                continue
+            expected = [doc_id for doc_id, document in enumerate(documents)
+                        if all(phrase_in_document(phrase, document, lexicon) for phrase in resolved)]
+            # Matches hold every phrase word and every word has weight 1, so they tie and
+            # come out by DocID
+            assert phrase_matches(documents, lexicon, index, query) == expected, query
+            matched += bool(expected)
+    assert matched > 20
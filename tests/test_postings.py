@@ -0,0 +1,126 @@
+import random
+from postings import (Postings, CompressedPostings, ChainedPostings, PostingCursor, BlockCursor, open_cursor,
+                      encode_varints, decode_varints, read_varints, parse_postings, posting_count, END_OF_POSTINGS, BLOCK_SIZE, SMALL_LIST_SIZE)
+
+
+def random_postings(rng, count, max_gap=50):
+    doc_ids = []
+    doc_id = -1
+    for _ in range(count):
+        doc_id += rng.randint(1, max_gap)
+        doc_ids.append(doc_id)
+    weights = [rng.randint(1, 300) for _ in range(count)]
+    return doc_ids, weights
+
+
+def test_varints_round_trip():
+    values = [0, 1, 127, 128, 255, 16383, 16384, 2 ** 32 - 1, 2 ** 63 - 1] + list(range(0, 100000, 997))
+    data = bytearray()
+    encode_varints(values, data)
+    assert decode_varints(data) == values
+    assert read_varints(data, 0, len(values)) == (values, len(data))
+
+
+def test_read_varints_stops_after_count():
+    data = bytearray()
+    encode_varints([300, 5, 70000], data)
+    values, position = read_varints(data, 0, 2)
+    assert values == [300, 5]
+    assert decode_varints(data[position:]) == [70000]
+
+
+def test_block_codec_round_trip():
+    rng = random.Random(1)
+    for count in (1, 2, BLOCK_SIZE - 1, BLOCK_SIZE, BLOCK_SIZE + 1, 3 * BLOCK_SIZE + 17):
+        doc_ids, weights = random_postings(rng, count, max_gap=rng.choice([1, 50, 100000]))
+        for block_size in (1, 7, BLOCK_SIZE):
+            postings = CompressedPostings.from_lists(doc_ids, weights, max(weights), block_size)
+            assert len(postings) == count
+            assert postings.num_blocks() == -(-count // block_size)
+            assert postings.doc_ids == doc_ids
+            assert postings.weights == weights
+
+
+def test_single_byte_blocks_round_trip():
+    # Gaps and weights below 128 take the bulk decoding path
+    rng = random.Random(4)
+    doc_ids, _ = random_postings(rng, 3 * BLOCK_SIZE + 5, max_gap=127)
+    weights = [rng.randint(0, 127) for _ in doc_ids]
+    postings = CompressedPostings.from_lists(doc_ids, weights, max(weights))
+    assert all(bytes(postings.data[postings.offsets[block]:postings.offsets[block + 1]]).isascii()
+               for block in range(postings.num_blocks()))
+    assert postings.doc_ids == doc_ids
+    assert postings.weights == weights
+
+
+def test_block_cursor_matches_plain_cursor():
+    rng = random.Random(2)
+    doc_ids, weights = random_postings(rng, 1000)
+    plain = PostingCursor(Postings(doc_ids, weights, max(weights)))
+    compressed = BlockCursor(CompressedPostings.from_lists(doc_ids, weights, max(weights), 16))
+    target = 0
+    while plain.doc != END_OF_POSTINGS:
+        if rng.random() < 0.5:
+            assert plain.next() == compressed.next()
+        else:
+            target = max(target, plain.doc) + rng.randint(0, 400)
+            assert plain.seek(target) == compressed.seek(target)
+        if plain.doc != END_OF_POSTINGS:
+            assert plain.weight() == compressed.weight()
+    assert compressed.doc == END_OF_POSTINGS
+
+
+
+def test_chained_cursor_matches_plain_cursor():
+    rng = random.Random(3)
+    for trial in range(20):
+        doc_ids, weights = random_postings(rng, 1000)
+        # Cut the list into a main part and segment parts, compressing some of them
+        cuts = sorted(rng.sample(range(1, 1000), rng.randint(1, 4)))
+        parts = []
+        for start, end in zip([0] + cuts, cuts + [1000]):
+            part_docs, part_weights = doc_ids[start:end], weights[start:end]
+            if rng.random() < 0.5:
+                parts.append(CompressedPostings.from_lists(part_docs, part_weights, max(part_weights), 16))
+            else:
+                parts.append(Postings(part_docs, part_weights, max(part_weights)))
+        chained_postings = ChainedPostings(parts)
+        assert posting_count(chained_postings) == 1000 and chained_postings.max_weight == max(weights)
+        assert chained_postings.doc_ids == doc_ids and chained_postings.weights == weights
+
+        plain = PostingCursor(Postings(doc_ids, weights, max(weights)))
+        chained = open_cursor(chained_postings)
+        target = 0
+        while plain.doc != END_OF_POSTINGS:
+            action = rng.random()
+            if action < 0.4:
+                assert plain.next() == chained.next()
+            elif action < 0.8:
+                target = max(target, plain.doc) + rng.randint(0, 800)
+                assert plain.seek(target) == chained.seek(target)
+            else:
+                target = max(target, plain.doc) + rng.randint(0, 800)
+                taken = plain.take_until(target)
+                assert chained.take_until(target) == (list(taken[0]), list(taken[1]))
+                assert plain.doc == chained.doc
+            if plain.doc != END_OF_POSTINGS:
+                assert plain.weight() == chained.weight()
+        assert chained.doc == END_OF_POSTINGS and chained.seek(END_OF_POSTINGS - 1) == END_OF_POSTINGS
+
+
+def test_parse_postings():
+    text = ",".join(f"{doc_id}:{doc_id % 7 + 1}" for doc_id in range(0, 3000, 3))
+    plain = parse_postings(text, 7)
+    compressed = parse_postings(text, 7, compress=True)
+    assert isinstance(compressed, CompressedPostings)
+    assert posting_count(compressed) == posting_count(plain) == 1000
+    assert compressed.doc_ids == plain.doc_ids
+    assert compressed.weights == plain.weights
+    assert compressed.max_weight == plain.max_weight == 7
+
+    # Short lists are kept uncompressed
+    short = parse_postings(",".join(f"{doc_id}:1" for doc_id in range(SMALL_LIST_SIZE)), 1, compress=True)
+    assert not isinstance(short, CompressedPostings)
+    assert list(short.doc_ids) == list(range(SMALL_LIST_SIZE)) and list(short.weights) == [1] * SMALL_LIST_SIZE
+    short = parse_postings("4:2,9:1", 2, compress=True)
+    assert list(short.doc_ids) == [4, 9] and list(short.weights) == [2, 1]
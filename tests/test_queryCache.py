@@ -0,0 +1,79 @@
+import queryCache
+from queryCache import QueryCache, result_size_in_bytes
+
+
+def results(n, title_length=10):
+    return [({'title': 'x' * title_length, 'url': str(i)}, float(i)) for i in range(n)]
+
+
+def key(word):
+    return ((word,), 5, 'maxscore', (), '', 'tfidf')
+
+
+def test_evicts_least_recently_used_by_bytes():
+    entry_size = result_size_in_bytes(key('a'), tuple(results(3)))
+    cache = QueryCache(max_entries=100, max_bytes=3 * entry_size)
+    for word in 'abc':
+        cache.put(key(word), results(3))
+    assert cache.get(key('a')) is not None  # 'a' becomes the most recently used entry
+    cache.put(key('d'), results(3))
+    assert cache.get(key('b')) is None
+    assert all(cache.get(key(word)) is not None for word in 'acd')
+    assert cache.cache_info()['bytes'] == 3 * entry_size
+    assert cache.evictions == 1
+
+    # A larger entry pushes out as many of the oldest entries as its size needs
+    cache.put(key('e'), results(2, title_length=entry_size // 2))
+    assert entry_size < result_size_in_bytes(key('e'), tuple(results(2, title_length=entry_size // 2))) < 2 * entry_size
+    assert cache.get(key('a')) is None and cache.get(key('c')) is None
+    assert cache.get(key('d')) is not None and cache.get(key('e')) is not None
+    assert cache.evictions == 3
+
+
+def test_entry_larger_than_cache_is_not_stored():
+    cache = QueryCache(max_entries=10, max_bytes=1000)
+    cache.put(key('a'), results(1))
+    cache.put(key('b'), results(1, title_length=5000))
+    assert cache.get(key('b')) is None
+    assert cache.get(key('a')) is not None
+
+
+def test_evicts_by_entry_count():
+    cache = QueryCache(max_entries=2)
+    for word in 'abc':
+        cache.put(key(word), results(1))
+    assert len(cache) == 2
+    assert cache.get(key('a')) is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(queryCache.time, 'monotonic', lambda: now[0])
+    cache = QueryCache(ttl=10)
+    cache.put(key('a'), results(2))
+    now[0] += 9
+    assert cache.get(key('a')) is not None
+    now[0] += 2
+    assert cache.get(key('a')) is None
+    assert cache.expirations == 1
+    assert len(cache) == 0 and cache.cache_info()['bytes'] == 0
+
+
+def test_new_generation_empties_cache(tmp_path):
+    index_file = tmp_path / 'InvertedIndex.csv'
+    index_file.write_text('WordID,MaxWeight,Postings\n')
+    generation = queryCache.index_generation([str(index_file)])
+    cache = QueryCache(generation=generation)
+    cache.put(key('a'), results(2))
+
+    # The same files keep the generation and the entries
+    cache.set_generation(queryCache.index_generation([str(index_file)]))
+    assert cache.get(key('a')) is not None
+
+    index_file.write_text('WordID,MaxWeight,Postings\n1,1,0:1\n')
+    new_generation = queryCache.index_generation([str(index_file)])
+    assert new_generation != generation
+    cache.set_generation(new_generation)
+    assert cache.get(key('a')) is None
+    assert cache.invalidations == 1
+    assert cache.cache_info()['bytes'] == 0
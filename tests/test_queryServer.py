@@ -0,0 +1,189 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import query
+import queryServer
+from autocomplete import Autocomplete
+from postings import Postings
+from queryServer import QueryServer
+from test_segments import build_main_index
+
+
+class ListStore:
+    """Document store stand-in returning the DocID as the document."""
+
+    bytes_read = 0
+
+    def get(self, doc_id, fields=None):
+        return {'url': str(doc_id)}
+
+
+class BufferWriter:
+    """Stream writer stand-in collecting the response bytes."""
+
+    def __init__(self):
+        self.data = b''
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def ready_server():
+    server = QueryServer('csv', workers=1)
+    server.ready = True  # Invalid queries are answered before any worker is needed
+    return server
+
+
+def test_invalid_boolean_query_is_answered_with_400():
+    server = ready_server()
+    status, payload = asyncio.run(server.route('GET', '/search?q=NOT+neural', b''))
+    assert status == 400
+    assert 'NOT clauses only' in payload['error']
+
+    status, payload = asyncio.run(server.route('POST', '/search', json.dumps({'query': 'neural OR NOT python'}).encode()))
+    assert status == 400
+    assert 'inside an OR' in payload['error']
+    assert len(server.cache) == 0
+
+
+def test_invalid_boolean_query_in_batch_is_answered_with_400():
+    server = ready_server()
+    body = json.dumps({'queries': ['neural AND python', 'NOT neural']}).encode()
+    status, payload = asyncio.run(server.route('POST', '/batch', body))
+    assert status == 400
+    assert payload['error'].startswith('NOT neural: invalid boolean query')
+    assert len(server.cache) == 0
+
+
+def test_negative_completion_count_is_answered_with_400():
+    server = QueryServer('csv', workers=1)
+    server.autocomplete = Autocomplete({'neural': 3, 'networks': 2})
+    status, payload = server.complete('q=ne&n=-3')
+    assert status == 400 and 'negative' in payload['error']
+    status, payload = server.complete('q=ne&n=1')
+    assert status == 200 and payload['completions'] == [{'word': 'neural', 'documents': 3}]
+
+
+# Function to make a server whose queries are scored in a thread over a small
+# in-memory index, in place of the worker processes
+def searching_server(monkeypatch):
+    lexicon = {'neural': 1, 'networks': 2}
+    inverted_index = {1: Postings([0, 1, 2], [3, 1, 2], 3), 2: Postings([1, 3], [2, 5], 5)}
+    monkeypatch.setattr(queryServer, '_index', (lexicon, inverted_index, 4, ListStore()))
+    server = ready_server()
+    server.pool = ThreadPoolExecutor(1)
+    return server
+
+
+def test_search_and_batch_payloads(monkeypatch):
+    server = searching_server(monkeypatch)
+    try:
+        status, payload = asyncio.run(server.route('GET', '/search?q=neural+networks&k=2', b''))
+        assert status == 200
+        assert payload['query'] == 'neural networks'
+        assert [result['url'] for result in payload['results']] == ['3', '1']
+        assert all(isinstance(result['score'], float) for result in payload['results'])
+
+        # The same terms in another order are answered from the cache
+        status, again = asyncio.run(server.route('POST', '/search', json.dumps({'query': 'networks neural',
+                                                                                 'k': 2}).encode()))
+        assert status == 200 and again['results'] == payload['results']
+        assert server.cache.cache_info()['hits'] == 1
+
+        body = json.dumps({'queries': ['neural', 'networks', 'unknown'], 'k': 1, 'strategy': 'maxscore'}).encode()
+        status, payload = asyncio.run(server.route('POST', '/batch', body))
+        assert status == 200
+        assert [answer['query'] for answer in payload['results']] == ['neural', 'networks', 'unknown']
+        assert [[result['url'] for result in answer['results']] for answer in payload['results']] == [['0'], ['3'], []]
+    finally:
+        server.close()
+
+
+def test_bad_parameters_are_answered_with_400():
+    server = ready_server()
+    status, payload = asyncio.run(server.route('GET', '/search?q=neural&strategy=wand', b''))
+    assert status == 400 and 'strategy must be one of' in payload['error']
+    status, payload = asyncio.run(server.route('POST', '/batch', json.dumps({'queries': ['neural'],
+                                                                             'strategy': 'wand'}).encode()))
+    assert status == 400 and 'strategy must be one of' in payload['error']
+    status, payload = asyncio.run(server.route('GET', '/search?q=neural&k=five', b''))
+    assert status == 400 and payload['error'] == 'k must be an integer'
+    status, payload = asyncio.run(server.route('POST', '/search', b'{not json'))
+    assert status == 400
+
+
+# Function to serve one raw request on a connection; returns the response bytes
+async def serve_request(server, request):
+    reader = asyncio.StreamReader()
+    reader.feed_data(request)
+    reader.feed_eof()
+    writer = BufferWriter()
+    await server.handle_connection(reader, writer)
+    return writer.data
+
+
+def test_invalid_content_length_is_answered_with_400():
+    server = QueryServer('csv', workers=1)
+    for length in ('abc', '-5'):
+        request = f"POST /search HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode('latin-1')
+        head, _, body = asyncio.run(serve_request(server, request)).partition(b'\r\n\r\n')
+        assert head.startswith(b'HTTP/1.1 400 ')
+        assert json.loads(body) == {'error': 'invalid Content-Length'}
+
+
+def test_ready_once_every_worker_has_loaded_the_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    build_main_index('csv')
+    monkeypatch.setattr(query, 'QUERY_LOG_FILE', None)
+    server = QueryServer('csv', workers=2)
+    try:
+        status, payload = asyncio.run(server.route('GET', '/ready', b''))
+        assert status == 503 and payload['ready'] is False
+        status, _ = asyncio.run(server.route('GET', '/search?q=deep', b''))
+        assert status == 503
+
+        asyncio.run(server.load())
+        status, payload = asyncio.run(server.route('GET', '/ready', b''))
+        assert status == 200
+        assert payload['ready'] is True and payload['workers'] == 2 and payload['documents'] == 2
+    finally:
+        server.close()
+
+
+def test_worker_waits_for_the_others_until_the_timeout(monkeypatch):
+    monkeypatch.setattr(queryServer, 'READY_TIMEOUT', 0.2)
+    monkeypatch.setattr(queryServer, '_index', (None, None, 7, None))
+    monkeypatch.setattr(queryServer, '_positions', None)
+    monkeypatch.setattr(queryServer, '_ready_barrier', threading.Barrier(2))
+    with ThreadPoolExecutor(2) as pool:
+        infos = list(pool.map(lambda _: queryServer._worker_info(), range(2)))
+    assert [info[1:] for info in infos] == [(7, False), (7, False)]
+
+    # A worker that never loads the index breaks the barrier instead of blocking the start
+    monkeypatch.setattr(queryServer, '_ready_barrier', threading.Barrier(2))
+    with pytest.raises(threading.BrokenBarrierError):
+        queryServer._worker_info()
+
+
+def test_start_fails_when_a_worker_does_not_report_ready(monkeypatch):
+    barrier = queryServer.multiprocessing.Barrier
+    # One party more than the pool has workers, so the barrier can never fill up
+    monkeypatch.setattr(queryServer.multiprocessing, 'Barrier', lambda parties: barrier(parties + 1))
+    monkeypatch.setattr(queryServer, 'READY_TIMEOUT', 0.5)
+    monkeypatch.setattr(queryServer, '_init_worker', lambda index_format, ready_barrier: setattr(
+        queryServer, '_ready_barrier', ready_barrier))
+    monkeypatch.setattr(queryServer, 'load_autocomplete', lambda *files: None)
+    server = QueryServer('csv', workers=2)
+    asyncio.run(server.load())
+    assert not server.ready
+    assert 'not all 2 workers loaded the index' in server.load_error
+    status, payload = asyncio.run(server.route('GET', '/ready', b''))
+    assert status == 503 and 'error' in payload
@@ -0,0 +1,59 @@
+import os
+import pandas as pd
+import pytest
+import query
+from pipeline import build_index_streaming
+from binaryIndex import read_compact_lexicon, write_binary_lexicon, write_binary_inverted_index
+from segments import add_documents, compact_segments, read_manifest
+
+DOCUMENTS = [
+    {'title': 'deep learning', 'authors': "['ann']", 'tags': "['ai']", 'text': 'neural networks learn', 'url': 'a'},
+    {'title': 'graph theory', 'authors': "['bob']", 'tags': "['math']", 'text': 'vertices and edges', 'url': 'b'},
+]
+NEW_DOCUMENTS = [
+    {'title': 'quantum graph', 'authors': "['cy']", 'tags': "['physics']", 'text': 'qubits entangle', 'url': 'c'},
+    {'title': 'deep qubits', 'authors': "['di']", 'tags': "['physics']", 'text': 'error correction', 'url': 'd'},
+]
+
+
+# Function to build the main index of DOCUMENTS in the current directory, as the CSV
+# files or (converted from them) the binary ones
+def build_main_index(index_format):
+    pd.DataFrame(DOCUMENTS).to_csv('Dataset.csv', index=False)
+    build_index_streaming('Dataset.csv', 'Lexicon.csv', 'ForwardIndex.csv', 'InvertedIndex.csv', 'IndexStats.csv',
+                          'DocStore.csv', 'DocStore.offsets')
+    if index_format == 'binary':
+        with read_compact_lexicon('Lexicon.csv') as lexicon:
+            write_binary_lexicon(dict(lexicon.items()), 'Lexicon.bin')
+        inverted_index = query.read_inverted_index('InvertedIndex.csv')
+        write_binary_inverted_index({word_id: list(zip(postings.doc_ids, postings.weights))
+                                     for word_id, postings in inverted_index.items()}, len(DOCUMENTS),
+                                    'InvertedIndex.bin')
+        # The binary build has no CSV lexicon or statistics to fall back on
+        os.remove('Lexicon.csv')
+        os.remove('IndexStats.csv')
+
+
+@pytest.mark.parametrize('index_format', ['csv', 'binary'])
+def test_segments_extend_the_main_index(tmp_path, monkeypatch, index_format):
+    monkeypatch.chdir(tmp_path)
+    build_main_index(index_format)
+    lexicon_file, stats_file = (('Lexicon.bin', 'InvertedIndex.bin') if index_format == 'binary'
+                                else ('Lexicon.csv', 'IndexStats.csv'))
+    add_documents(NEW_DOCUMENTS[:1], lexicon_file, stats_file)
+    add_documents(NEW_DOCUMENTS[1:], lexicon_file, stats_file)
+    assert [segment['FirstDocID'] for segment in read_manifest('Segments')] == [2, 3]
+
+    for _ in range(2):
+        lexicon, inverted_index, total_documents, doc_store = query.load_index(index_format)
+        assert total_documents == 4
+        # A new word, and words of the main index that new documents contain
+        assert list(inverted_index[lexicon['qubits']].doc_ids) == [2, 3]
+        assert list(inverted_index[lexicon['graph']].doc_ids) == [1, 2]
+        assert list(inverted_index[lexicon['deep']].doc_ids) == [0, 3]
+        assert list(inverted_index[lexicon['vertices']].doc_ids) == [1]
+        assert doc_store.get(3)['url'] == 'd'
+        doc_store.close()
+        lexicon.close()
+        compact_segments('Segments')
+    assert len(read_manifest('Segments')) == 1
@@ -0,0 +1,80 @@
+import os
+import random
+import pytest
+from math import log10
+from postings import Postings
+from topK import QueryTerm, top_k_exhaustive
+from tokenizer import query_words
+from segments import write_manifest
+from shards import build_shards, ShardedSearcher, read_shard_info, load_sharded
+from spelling import build_spelling_index, SpellingIndex
+from query import fetch_top_documents
+
+
+class ListStore:
+    """Document store stand-in returning the DocID as the document."""
+
+    bytes_read = 0
+
+    def get(self, doc_id, fields=None):
+        return {'url': str(doc_id)}
+
+
+def test_sharded_ranking_equals_unsharded(tmp_path):
+    rng = random.Random(7)
+    total_documents = 1000
+    inverted_index = {}
+    for word_id in range(1, 41):
+        doc_ids = sorted(rng.sample(range(total_documents), rng.choice([1, 10, 100, 600])))
+        weights = [rng.randint(1, 9) for _ in doc_ids]
+        inverted_index[word_id] = Postings(doc_ids, weights, max(weights))
+    # Lexicon keys go through the query tokenizer, as the words of a query do
+    words = {word_id: query_words(f"term{word_id}")[0] for word_id in inverted_index}
+    lexicon = {word: word_id for word_id, word in words.items()}
+    build_spelling_index({word: len(inverted_index[word_id].doc_ids) for word_id, word in words.items()},
+                         str(tmp_path / 'Spelling.bin'))
+    speller = SpellingIndex(str(tmp_path / 'Spelling.bin'))
+
+    for compress in (False, True):
+        shard_dir = str(tmp_path / f"shards_{compress}")
+        build_shards(inverted_index, total_documents, num_shards=3, shard_dir=shard_dir, compress=compress)
+        searcher = ShardedSearcher(lexicon, ListStore(), shard_dir, speller)
+        try:
+            searcher.wait_ready()
+            for _ in range(100):
+                query = [rng.choice(list(inverted_index)) for _ in range(rng.randint(1, 4))]
+                terms = [QueryTerm(word_id, inverted_index[word_id],
+                                   log10(total_documents / len(inverted_index[word_id].doc_ids)))
+                         for word_id in query]
+                text = " ".join(words[word_id] for word_id in query)
+                for k in (1, 10):
+                    expected = top_k_exhaustive(terms, k)
+                    assert searcher.top_k(text, k, 'maxscore') == expected
+                    assert searcher.top_k(text, k, 'exhaustive') == expected
+
+            # Misspelt words are corrected as by the unsharded search
+            for word_id in rng.sample(list(inverted_index), 10):
+                word = words[word_id]
+                text = f"{word[:2]}{word[3:]} {words[rng.choice(list(inverted_index))]}"
+                expected = fetch_top_documents(text, lexicon, inverted_index, total_documents, ListStore(), 10,
+                                               verbose=False, speller=speller)
+                assert expected
+                assert searcher.search(text, 10) == expected
+        finally:
+            searcher.close()
+    speller.close()
+
+
+def test_shards_refuse_to_load_without_added_segments(tmp_path):
+    inverted_index = {1: Postings([0, 2], [1, 3], 3), 2: Postings([1], [2], 2)}
+    shard_dir = str(tmp_path / 'Shards')
+    segment_dir = str(tmp_path / 'Segments')
+    build_shards(inverted_index, 3, num_shards=2, shard_dir=shard_dir, lexicon_file='Lexicon.bin', segment_ids=[4])
+    assert read_shard_info(shard_dir) == {'Lexicon': 'Lexicon.bin', 'Segments': [4]}
+
+    # Segment 5 was added after the shards were built
+    os.makedirs(segment_dir)
+    write_manifest(segment_dir, [{'SegmentID': 4, 'Level': 0, 'FirstDocID': 2, 'Documents': 1, 'Postings': 1},
+                                 {'SegmentID': 5, 'Level': 0, 'FirstDocID': 3, 'Documents': 1, 'Postings': 1}])
+    with pytest.raises(ValueError, match=r"segments \[5\]"):
+        load_sharded(shard_dir, segment_dir)
@@ -0,0 +1,78 @@
+import csv
+import os
+import query
+from segments import add_documents
+from snapshot import build_snapshot, load_snapshot, postings_size_in_bytes, snapshot_files
+from test_segments import build_main_index, NEW_DOCUMENTS
+
+
+# Function to write a small CSV index with one posting list of `length` postings per word
+def write_csv_index(tmp_path, lengths):
+    with open(tmp_path / 'Lexicon.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Word', 'WordID'])
+        writer.writerows([f"word{word_id}", word_id] for word_id in range(1, len(lengths) + 1))
+    with open(tmp_path / 'InvertedIndex.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['WordID', 'MaxWeight', 'Postings'])
+        for word_id, length in enumerate(lengths, 1):
+            writer.writerow([word_id, 1, ",".join(f"{doc_id}:1" for doc_id in range(length))])
+    with open(tmp_path / 'IndexStats.csv', 'w', newline='') as f:
+        csv.writer(f).writerows([['Stat', 'Value'], ['Documents', max(lengths)]])
+    return [str(tmp_path / name) for name in ('Lexicon.csv', 'InvertedIndex.csv', 'IndexStats.csv')]
+
+
+def test_lazy_index_stays_within_budget_and_prefetch_never_evicts(tmp_path):
+    files = write_csv_index(tmp_path, [10] * 6)
+    assert load_snapshot(*files, str(tmp_path / 'Snapshot')) is None
+    build_snapshot(*files, str(tmp_path / 'Snapshot'))
+    _, inverted_index, total_documents = load_snapshot(*files, str(tmp_path / 'Snapshot'))
+    list_size = postings_size_in_bytes(inverted_index[1])
+    inverted_index.close()
+
+    _, inverted_index, _ = load_snapshot(*files, str(tmp_path / 'Snapshot'), memory_budget=3 * list_size)
+    try:
+        assert total_documents == 10
+        for word_id in (1, 2, 3):
+            assert list(inverted_index[word_id].doc_ids) == list(range(10))
+        inverted_index[1]  # 1 becomes the most recently used list
+        inverted_index[4]
+        assert inverted_index.cache_info()['bytes'] == 3 * list_size
+        assert inverted_index.cache_info()['evictions'] == 1
+        assert inverted_index.cache_info()['terms'] == 3
+
+        # The cache is full, so the warm-up loads nothing and keeps the hot lists
+        assert not inverted_index.prefetch(5)
+        assert inverted_index.prefetch(4)
+        hits = inverted_index.hits
+        inverted_index[1], inverted_index[3], inverted_index[4]
+        assert inverted_index.hits == hits + 3
+        assert inverted_index.get(99) is None
+    finally:
+        inverted_index.close()
+
+
+def test_build_writes_snapshot_and_stale_snapshot_is_rebuilt_in_background(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    build_main_index('csv')
+    files = ['Lexicon.csv', 'InvertedIndex.csv', 'IndexStats.csv']
+    snapshot = load_snapshot(*files)
+    assert snapshot is not None
+    snapshot[1].close()
+
+    # New words refresh the lexicon snapshot and keep the term directory
+    directory_mtime = os.stat(snapshot_files('Snapshot')[1]).st_mtime_ns
+    add_documents(NEW_DOCUMENTS[:1])
+    lexicon, inverted_index, _ = load_snapshot(*files)
+    assert lexicon.get('qubits') is not None
+    assert os.stat(snapshot_files('Snapshot')[1]).st_mtime_ns == directory_mtime
+    inverted_index.close()
+
+    # An out-of-date snapshot is not waited for: the CSV index is loaded instead
+    os.remove(snapshot_files('Snapshot')[2])
+    threads = []
+    monkeypatch.setattr(query, 'build_snapshot_in_background', lambda *args: threads.append(args))
+    lexicon, inverted_index, total_documents, doc_store = query.load_index('lazy')
+    doc_store.close()
+    assert isinstance(inverted_index.base_index, dict) and total_documents == 3
+    assert threads == [('Lexicon.csv', 'InvertedIndex.csv', 'IndexStats.csv', 'Snapshot')]
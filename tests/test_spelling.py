@@ -0,0 +1,86 @@
+import random
+from spelling import edit_distance, build_spelling_index, SpellingIndex, allowed_distance
+
+
+# Function to compute the optimal string alignment distance with the full table,
+# the reference for the banded, early-exit edit_distance
+def reference_distance(source, target):
+    rows, columns = len(source) + 1, len(target) + 1
+    table = [[0] * columns for _ in range(rows)]
+    for i in range(rows):
+        table[i][0] = i
+    for j in range(columns):
+        table[0][j] = j
+    for i in range(1, rows):
+        for j in range(1, columns):
+            cost = source[i - 1] != target[j - 1]
+            table[i][j] = min(table[i - 1][j] + 1, table[i][j - 1] + 1, table[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]:
+                table[i][j] = min(table[i][j], table[i - 2][j - 2] + 1)
+    return table[-1][-1]
+
+
+def random_word(rng, alphabet='abcde', max_length=9):
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length)))
+
+
+def mutate(rng, word, edits):
+    for _ in range(edits):
+        i = rng.randint(0, len(word))
+        kind = rng.choice(['insert', 'delete', 'substitute', 'transpose'])
+        if kind == 'insert':
+            word = word[:i] + rng.choice('abcdef') + word[i:]
+        elif kind == 'delete' and i < len(word):
+            word = word[:i] + word[i + 1:]
+        elif kind == 'substitute' and i < len(word):
+            word = word[:i] + rng.choice('abcdef') + word[i + 1:]
+        elif kind == 'transpose' and i + 1 < len(word):
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+def test_edit_distance_matches_reference():
+    rng = random.Random(5)
+    for _ in range(5000):
+        source = random_word(rng)
+        target = mutate(rng, source, rng.randint(0, 4)) if rng.random() < 0.7 else random_word(rng)
+        expected = reference_distance(source, target)
+        for max_distance in range(4):
+            assert edit_distance(source, target, max_distance) == min(expected, max_distance + 1), \
+                (source, target, max_distance)
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert edit_distance('form', 'from') == 1
+    assert edit_distance('ca', 'abc') == 3  # Optimal string alignment, not full Damerau-Levenshtein
+
+
+def test_lookup_matches_brute_force(tmp_path):
+    rng = random.Random(6)
+    frequencies = {}
+    while len(frequencies) < 1000:
+        frequencies[random_word(rng, 'abcdefgh', 10)] = rng.randint(1, 50)
+    frequencies.pop('', None)
+    path = str(tmp_path / 'Spelling.bin')
+    build_spelling_index(frequencies, path)
+
+    words = sorted(frequencies)
+    with SpellingIndex(path) as speller:
+        for _ in range(150):
+            word = mutate(rng, rng.choice(words), rng.randint(1, 2))
+            max_distance = allowed_distance(word)
+            matches = [(reference_distance(word, candidate), -frequency, candidate)
+                       for candidate, frequency in frequencies.items()]
+            expected = [(candidate, distance, -frequency) for distance, frequency, candidate in sorted(matches)
+                        if distance <= max_distance][:3]
+            assert speller.lookup(word, 3) == expected, word
+
+
+def test_correct_uses_the_index_distance(tmp_path):
+    path = str(tmp_path / 'Spelling.bin')
+    build_spelling_index({'learning': 5, 'networks': 3}, path, max_distance=0)
+    with SpellingIndex(path) as speller:
+        assert speller.correct(['learnng', 'networks'], {}) == {}
+    build_spelling_index({'learning': 5, 'networks': 3}, path)
+    with SpellingIndex(path) as speller:
+        assert speller.correct(['learnng', 'networks'], {'networks': 2}) == {'learnng': ['learning']}
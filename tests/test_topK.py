@@ -0,0 +1,43 @@
+import random
+import pytest
+import topK
+from postings import Postings, CompressedPostings
+from topK import QueryTerm, top_k_exhaustive, top_k_maxscore
+
+
+def random_terms(rng, num_terms, num_documents, compress=False):
+    terms = []
+    for word_id in range(num_terms):
+        size = rng.choice([1, 5, 50, num_documents // 2, num_documents])
+        doc_ids = sorted(rng.sample(range(num_documents), size))
+        # Few distinct weights, so tied scores are common
+        weights = [rng.randint(1, 4) for _ in doc_ids]
+        if compress:
+            postings = CompressedPostings.from_lists(doc_ids, weights, max(weights), 16)
+        else:
+            postings = Postings(doc_ids, weights, max(weights))
+        terms.append(QueryTerm(word_id, postings, rng.choice([0.5, 1.0, rng.uniform(0.1, 3)])))
+    return terms
+
+
+# Small windows and a share of 1 make MaxScore start pruning after a few documents
+@pytest.mark.parametrize('window, share', [(topK.MAXSCORE_WINDOW, topK.MAXSCORE_ESSENTIAL_SHARE), (8, 0.25), (1, 1.0)])
+def test_maxscore_equals_exhaustive(monkeypatch, window, share):
+    # Lists this short would otherwise be handed to top_k_exhaustive
+    monkeypatch.setattr(topK, 'MAXSCORE_MIN_POSTINGS', 0)
+    monkeypatch.setattr(topK, 'MAXSCORE_WINDOW', window)
+    monkeypatch.setattr(topK, 'MAXSCORE_ESSENTIAL_SHARE', share)
+    rng = random.Random(3)
+    for trial in range(300):
+        terms = random_terms(rng, rng.randint(1, 5), 500, compress=trial % 2 == 1)
+        query = [rng.choice(terms) for _ in range(rng.randint(1, 6))]  # Repeated words included
+        for k in (1, 5, 10, 1000):
+            assert top_k_maxscore(query, k) == top_k_exhaustive(query, k)
+
+
+def test_maxscore_edge_cases():
+    postings = Postings([1, 2, 3], [1, 1, 1], 1)
+    assert top_k_maxscore([], 5) == []
+    assert top_k_maxscore([QueryTerm(1, postings, 1.0)], 0) == []
+    # Equal scores are ranked by DocID
+    assert top_k_maxscore([QueryTerm(1, postings, 1.0)], 2) == [(1, 1.0), (2, 1.0)]
@@ -0,0 +1,81 @@
+import re
+from functools import lru_cache
+from nltk.stem import WordNetLemmatizer
+from nltk.corpus import stopwords
+
+# Tokenization shared by every index stage and the query side, so a word is split,
+# normalized and filtered the same way when it is indexed and when it is searched.
+#
+#   clean_text      the clean.py normalization: runs of punctuation become one
+#                   space and the text is lowercased
+#   tokenize        splits (cleaned) text into tokens, dropping stray dots and
+#                   leftover punctuation the way the lexicon always has
+#   index_terms     tokenize + stop word removal, the words that get postings
+#   lemmatize       WordNet root of a token, memoized
+#   query_words     clean_text + index_terms for raw query strings
+#   query_phrases   the quoted phrases of a query as (offset, word) pairs
+#
+# Word frequencies follow Zipf's law, so a bounded memo keyed on the surface form
+# answers almost every lemmatize call after the first few thousand documents.
+
+# Stop words dropped by the lexicon and by queries (NLTK's English list)
+STOP_WORDS = frozenset(stopwords.words('english'))
+
+# Number of distinct surface forms whose lemma is memoized
+LEMMA_CACHE_SIZE = 500000
+
+NON_WORD = re.compile(r'[\W_]+')
+LIST_MARKUP = re.compile(r'[\[\]\'"\s]+')
+STRAY_DOT = re.compile(r'(?<!\S)\.(?!\S)')
+PUNCTUATION = re.compile(r'["!?,;:\[\]{}()<>]')
+PHRASE = re.compile(r'"([^"]*)"')
+
+_lemmatizer = WordNetLemmatizer()
+
+
+# Function to normalize raw text: punctuation runs become spaces, letters lowercase
+def clean_text(text):
+    return NON_WORD.sub(' ', text).lower()
+
+
+# Function to normalize a list column stored as a string ("['a', 'b']")
+def clean_list(text):
+    return NON_WORD.sub(' ', LIST_MARKUP.sub(' ', text)).lower()
+
+
+# Function to split text into lowercase tokens (non-strings such as NaN give none)
+def tokenize(text):
+    if not isinstance(text, str):
+        return []
+    text = STRAY_DOT.sub(' ', text)
+    text = PUNCTUATION.sub('', text)
+    return text.lower().split()
+
+
+# Function to return the tokens of (cleaned) text that are indexed, i.e. not stop words
+def index_terms(text):
+    return [word for word in tokenize(text) if word not in STOP_WORDS]
+
+
+# Function to return the root form of a token, memoized on the surface form
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(word):
+    return _lemmatizer.lemmatize(word)
+
+
+# Function to turn a query string into its search terms, in query order
+def query_words(query):
+    return index_terms(clean_text(query))
+
+
+# Function to extract the quoted phrases of a query; each phrase is a list of
+# (offset, word) pairs, offsets counted from its first indexed word so that stop
+# words inside the phrase keep their gaps ("state of the art" -> state@0, art@3)
+def query_phrases(query):
+    phrases = []
+    for text in PHRASE.findall(query):
+        words = [(offset, word) for offset, word in enumerate(tokenize(clean_text(text))) if word not in STOP_WORDS]
+        if words:
+            first = words[0][0]
+            phrases.append([(offset - first, word) for offset, word in words])
+    return phrases
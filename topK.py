@@ -0,0 +1,236 @@
+import heapq
+from postings import open_cursor, posting_count, END_OF_POSTINGS
+from instrumentation import NULL_TRACE
+
+# Upper bounds are inflated by this relative amount so that floating point
+# rounding in the bound sums can never prune a document that belongs in the top k
+BOUND_SLACK = 1e-9
+
+# DocIDs scored term-at-a-time before MaxScore first checks whether it can prune
+MAXSCORE_WINDOW = 1024
+
+# MaxScore visits the essential lists one document at a time, which costs about four
+# times as much per posting as scoring term-at-a-time, so it only starts pruning once
+# the essential lists hold at most this share of the postings
+MAXSCORE_ESSENTIAL_SHARE = 0.25
+
+# Queries with at most this many postings are scored exhaustively: setting up the
+# bounds and cursors costs more than pruning could save
+MAXSCORE_MIN_POSTINGS = 1024
+
+
+class QueryTerm:
+    """One query word resolved to its posting list and TF-IDF weight."""
+
+    def __init__(self, word_id, postings, idf):
+        self.word_id = word_id
+        self.postings = postings
+        self.idf = idf
+
+    # Function to compute the term's score contribution for one posting
+    def score(self, weight):
+        return weight * self.idf
+
+    # Function to bound the contribution of any posting in the list
+    def upper_bound(self):
+        return self.postings.max_weight * self.idf
+
+
+# Function to rank documents by scoring the full union of the posting lists
+def top_k_exhaustive(query_terms, k, trace=NULL_TRACE):
+    doc_scores = {}
+    postings_scanned = 0
+    for term in query_terms:
+        doc_ids = term.postings.doc_ids
+        postings_scanned += len(doc_ids)
+        for doc_id, weight in zip(doc_ids, term.postings.weights):
+            contribution = term.score(weight)
+            if doc_id in doc_scores:
+                doc_scores[doc_id] += contribution
+            else:
+                doc_scores[doc_id] = contribution
+
+    trace.count('postings_scanned', postings_scanned)
+    trace.count('documents_scored', len(doc_scores))
+
+    # Highest score first, ties broken by the lower DocID
+    return heapq.nsmallest(k, doc_scores.items(), key=lambda x: (-x[1], x[0]))
+
+
+# Function to rank documents with MaxScore dynamic pruning.
+#
+# Terms are ordered by their score upper bound. Once the heap holds k documents,
+# the terms whose bounds add up to no more than the current threshold become
+# "non-essential": a document that appears only in them cannot enter the top k,
+# so candidates are drawn from the essential lists alone and the non-essential
+# lists are only probed (with galloping seeks) while the document can still make it.
+# Until enough lists are non-essential the skipping does not pay for itself, so the
+# documents are scored term-at-a-time like top_k_exhaustive, one DocID window at a
+# time, and the pruning loop only starts at the first window boundary where it pays.
+# Documents are visited in increasing DocID order, so a newcomer that only ties the
+# threshold loses to the lower DocIDs already in the heap, exactly as in
+# top_k_exhaustive.
+def top_k_maxscore(query_terms, k, trace=NULL_TRACE):
+    if k <= 0 or not query_terms:
+        return []
+    if sum(posting_count(term.postings) for term in query_terms) <= MAXSCORE_MIN_POSTINGS:
+        return top_k_exhaustive(query_terms, k, trace)
+
+    # Merge repeated query words into one list visited once, weighted by its count
+    unique_terms = {}
+    for term in query_terms:
+        if term.word_id in unique_terms:
+            unique_terms[term.word_id][1] += 1
+        else:
+            unique_terms[term.word_id] = [term, 1]
+
+    entries = sorted(unique_terms.values(), key=lambda entry: entry[0].upper_bound() * entry[1])
+    terms = [term for term, _ in entries]
+    counts = [count for _, count in entries]
+    cursors = [open_cursor(term.postings) for term in terms]
+
+    # prefix_bounds[i] bounds the combined contribution of terms[0..i]
+    prefix_bounds = []
+    total = 0.0
+    for term, count in entries:
+        total += term.upper_bound() * count
+        prefix_bounds.append(total * (1 + BOUND_SLACK))
+
+    # essential_postings[i] counts the postings of terms[i..]
+    essential_postings = [0]
+    for term in reversed(terms):
+        essential_postings.append(essential_postings[-1] + posting_count(term.postings))
+    essential_postings.reverse()
+
+    # order[j] is the position in terms of the j-th query word; scores are added up in
+    # this order so they are bit-identical to those of top_k_exhaustive
+    position = {term.word_id: i for i, term in enumerate(terms)}
+    order = [position[term.word_id] for term in query_terms]
+
+    heap = []  # (score, -doc_id); the root is the weakest document kept so far
+    threshold = float('-inf')
+    first_essential = 0
+    num_terms = len(terms)
+    candidates = 0
+    documents_scored = 0
+
+    # Phase 1: Score DocID windows term-at-a-time while pruning would not pay; the
+    # window doubles each time, so a query that never prunes costs a few extra slices
+    window = MAXSCORE_WINDOW
+    while essential_postings[first_essential] > MAXSCORE_ESSENTIAL_SHARE * essential_postings[0]:
+        window_start = min(cursor.doc for cursor in cursors)
+        if window_start == END_OF_POSTINGS:
+            break
+        window_postings = [cursor.take_until(window_start + window) for cursor in cursors]
+        window *= 2
+
+        doc_scores = {}
+        for i in order:
+            term = terms[i]
+            doc_ids, weights = window_postings[i]
+            for doc_id, weight in zip(doc_ids, weights):
+                contribution = term.score(weight)
+                if doc_id in doc_scores:
+                    doc_scores[doc_id] += contribution
+                else:
+                    doc_scores[doc_id] = contribution
+        candidates += len(doc_scores)
+        documents_scored += len(doc_scores)
+
+        for doc_id, score in doc_scores.items():
+            entry = (score, -doc_id)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+        if len(heap) == k:
+            threshold = heap[0][0]
+            while first_essential < num_terms and prefix_bounds[first_essential] <= threshold:
+                first_essential += 1
+
+    # Phase 2: Document-at-a-time with pruning. contributions[i] holds the candidate's
+    # score from terms[i]; two additions commute exactly, so with at most two query
+    # words the partial sum already is the query-order score
+    contributions = [0.0] * num_terms
+    partial_is_exact = len(order) <= 2
+    while first_essential < num_terms:
+        # Step 1: The next candidate is the smallest DocID among the essential lists
+        doc_id = min(cursors[i].doc for i in range(first_essential, num_terms))
+        if doc_id == END_OF_POSTINGS:
+            break
+        candidates += 1
+
+        # Step 2: Score the essential lists and advance them past the candidate
+        partial = 0.0
+        for i in range(first_essential, num_terms):
+            cursor = cursors[i]
+            if cursor.doc == doc_id:
+                contribution = terms[i].score(cursor.weight())
+                contributions[i] = contribution
+                partial += contribution * counts[i]
+                cursor.next()
+            else:
+                contributions[i] = 0.0
+
+        # Step 3: Probe the non-essential lists, strongest first, while the candidate
+        # can still beat the threshold
+        competitive = True
+        for i in range(first_essential - 1, -1, -1):
+            if partial + prefix_bounds[i] <= threshold:
+                competitive = False
+                break
+            cursor = cursors[i]
+            if cursor.seek(doc_id) == doc_id:
+                contribution = terms[i].score(cursor.weight())
+                contributions[i] = contribution
+                partial += contribution * counts[i]
+            else:
+                contributions[i] = 0.0
+        if not competitive:
+            continue
+
+        # Step 4: Offer the candidate to the heap and raise the threshold
+        documents_scored += 1
+        if partial_is_exact:
+            score = partial
+        else:
+            score = 0.0
+            for i in order:
+                score += contributions[i]
+        entry = (score, -doc_id)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+        else:
+            continue
+
+        if len(heap) == k:
+            threshold = heap[0][0]
+            while first_essential < num_terms and prefix_bounds[first_essential] <= threshold:
+                first_essential += 1
+
+    trace.count('candidates', candidates)
+    trace.count('documents_scored', documents_scored)
+    return [(-neg_doc_id, score) for score, neg_doc_id in sorted(heap, reverse=True)]
+
+
+# Function to score a sorted list of candidate documents by every query term, adding
+# the contributions in query order; returns [(DocID, score)]
+def score_candidates(query_terms, candidates):
+    cursors = [open_cursor(term.postings) for term in query_terms]
+    scored = []
+    for doc_id in candidates:
+        score = 0.0
+        for term, cursor in zip(query_terms, cursors):
+            if cursor.seek(doc_id) == doc_id:
+                score += term.score(cursor.weight())
+        scored.append((doc_id, score))
+    return scored
+
+
+# Function to rank only the given candidate documents (e.g. those matching a
+# boolean query)
+def top_k_candidates(query_terms, candidates, k, trace=NULL_TRACE):
+    trace.count('candidates', len(candidates))
+    return heapq.nsmallest(k, score_candidates(query_terms, candidates), key=lambda x: (-x[1], x[0]))